@@ -9,7 +9,14 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import streamlit as st
 import time
-from app.services.rag_pipeline import load_graph, extract_schema_info, generate_sparql, execute_sparql, generate_answer, generate_explanation
+from app.services.rag_pipeline import sparql_cache_stats
+from app.services.chat_pipeline import answer_question
+from app.services.graph_store import get_graph_store
+from app.services import tracing
+from config import METRICS_PORT, TRACE_JSONL_PATH
+
+# Exporters are process-wide; configure() only acts on the first run
+tracing.configure(METRICS_PORT, TRACE_JSONL_PATH)
 
 # Page Config
 st.set_page_config(page_title="SNU Dining Graph RAG", layout="wide")
@@ -21,12 +28,26 @@ st.markdown("서울대 학식 온톨로지를 기반으로 질문에 답변합
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "graph" not in st.session_state:
+# The graph and schema summary are loaded once per process and shared by all sessions
+graph_store = get_graph_store()
+if not graph_store.is_loaded():
     with st.spinner("Loading Knowledge Graph..."):
-        st.session_state.graph = load_graph()
-        st.session_state.schema = extract_schema_info(st.session_state.graph)
+        graph_store.current()
     st.success("Graph Loaded!")
 
+# Pin one version for this whole run so a concurrent swap cannot mix graphs mid-answer
+active_graph = graph_store.maybe_refresh()
+
+with st.sidebar:
+    cache_stats = sparql_cache_stats()
+    st.caption(f"Graph version `{active_graph.version[:12]}`")
+    st.caption(f"SPARQL cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['entries']} entries)")
+    stage_latency = tracing.metrics.summary()
+    if stage_latency:
+        st.caption("Stage latency (p50 / p95)")
+        for stage, stats in sorted(stage_latency.items()):
+            st.caption(f"`{stage}` {stats['p50']:.2f}s / {stats['p95']:.2f}s (n={stats['count']})")
+
 # Display Chat History
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -56,24 +77,37 @@ if prompt := st.chat_input("질문을 입력하세요 (예: 301동 식당 메뉴
         message_placeholder = st.empty()
         
         try:
-            # 1. Generate SPARQL
+            # SPARQL first, then query execution and the explanation side by side,
+            # then the answer once the data is in
             with st.status("Thinking (generating SPARQL)...", expanded=False) as status:
-                sparql_query = generate_sparql(prompt, st.session_state.schema)
-                status.write("SPARQL Generated.")
-                status.update(label="Thinking (executing Query)...", state="running")
-                
-                # 2. Execute SPARQL
-                raw_data = execute_sparql(sparql_query, st.session_state.graph)
-                status.write(f"Data Retrieved: {len(raw_data)} items.")
-                status.update(label="Thinking (generating Answer)...", state="running")
+                def on_stage_done(name, value, timing):
+                    if name == "sparql":
+                        status.write(f"SPARQL Generated. ({timing.seconds:.2f}s)")
+                        status.update(label="Thinking (executing Query)...", state="running")
+                    elif name == "raw_data":
+                        status.write(f"Data Retrieved: {len(value)} items. ({timing.seconds:.2f}s)")
+                        status.update(label="Thinking (generating Answer)...", state="running")
+                    elif name == "explanation":
+                        status.write(f"Query explained. ({timing.seconds:.2f}s)")
 
-                # 3. Generate Answer
-                answer_text = generate_answer(prompt, raw_data)
-                
-                # 4. Generate Explanation
-                explanation_text = generate_explanation(prompt, sparql_query)
-                
-                status.update(label="Complete!", state="complete", expanded=False)
+                # The answer is rendered as it streams in instead of after the last token
+                streamed = []
+
+                def on_chunk(name, chunk):
+                    if name == "answer":
+                        streamed.append(chunk)
+                        message_placeholder.markdown("".join(streamed) + "▌")
+
+                result = answer_question(prompt, active_graph, on_stage_done, on_chunk)
+                sparql_query = result.results["sparql"]
+                raw_data = result.results["raw_data"]
+                answer_text = result.results["answer"]
+                explanation_text = result.results["explanation"]
+                answer_timing = result.stream_timings.get("answer", {})
+                if answer_timing.get("ttft") is not None:
+                    status.write(f"Answer: first token {answer_timing['ttft']:.2f}s, total {answer_timing['total']:.2f}s")
+
+                status.update(label=f"Complete! ({result.total:.1f}s)", state="complete", expanded=False)
 
             # Display Answer
             message_placeholder.markdown(answer_text)
@@ -0,0 +1,196 @@
+import time
+import queue
+import contextvars
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app.services.rag_pipeline import generate_sparql, execute_sparql, remember_sparql, generate_answer, generate_explanation
+from app.services.rag_pipeline import generate_answer_stream, generate_explanation_stream
+from app.services.tracing import span, annotate
+from app.services.graph_store import scoped_graph
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline DAG. fn receives the results of its dependencies
+    as keyword arguments named after them.
+    """
+    name: str
+    fn: object
+    deps: tuple = ()
+
+
+@dataclass
+class StageTiming:
+    name: str
+    start: float
+    end: float
+
+    @property
+    def seconds(self):
+        return self.end - self.start
+
+
+@dataclass
+class PipelineResult:
+    results: dict
+    timings: dict = field(default_factory=dict)
+    total: float = 0.0
+    # Streamed stages only: {"ttft": seconds, "total": seconds}
+    stream_timings: dict = field(default_factory=dict)
+
+    def critical_path(self, stages):
+        """
+        Longest dependency chain by stage duration, i.e. the wall time a perfect
+        scheduler could achieve. Returns (seconds, [stage names]).
+        """
+        best = {}
+        for stage in stages:  # stages are given in dependency order
+            prev = max((best[d] for d in stage.deps), default=(0.0, []), key=lambda b: b[0])
+            best[stage.name] = (prev[0] + self.timings[stage.name].seconds, prev[1] + [stage.name])
+        return max(best.values(), key=lambda b: b[0])
+
+
+# Stage work is almost entirely network-bound model calls plus one SPARQL
+# execution, so a small shared pool is enough for every session.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chat-pipeline")
+
+
+def run_dag(stages, on_stage_done=None, executor=None, on_tick=None, tick_seconds=0.05):
+    """
+    Runs the stages, starting each as soon as all of its dependencies finished.
+    on_stage_done(name, result, timing) is called on the calling thread, which
+    keeps Streamlit element updates off the worker threads. on_tick(), if given,
+    is also called there every tick_seconds while stages run.
+    Raises the first stage exception after cancelling stages not yet started.
+    """
+    executor = executor or _executor
+    pending = {stage.name: stage for stage in stages}
+    results = {}
+    timings = {}
+    running = {}
+    started = time.perf_counter()
+
+    def call(stage, kwargs):
+        start = time.perf_counter()
+        value = stage.fn(**kwargs)
+        return value, StageTiming(stage.name, start - started, time.perf_counter() - started)
+
+    while pending or running:
+        for name, stage in list(pending.items()):
+            if all(dep in results for dep in stage.deps):
+                del pending[name]
+                kwargs = {dep: results[dep] for dep in stage.deps}
+                # Run in a copy of the caller's context so stage spans nest under the caller's span
+                context = contextvars.copy_context()
+                running[executor.submit(context.run, call, stage, kwargs)] = name
+        if not running:
+            raise ValueError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+
+        done, _ = wait(running, timeout=tick_seconds if on_tick else None, return_when=FIRST_COMPLETED)
+        if on_tick is not None:
+            on_tick()
+        for future in done:
+            name = running.pop(future)
+            try:
+                value, timing = future.result()
+            except Exception:
+                for other in running:
+                    other.cancel()
+                raise
+            results[name] = value
+            timings[name] = timing
+            if on_stage_done is not None:
+                on_stage_done(name, value, timing)
+
+    return PipelineResult(results, timings, time.perf_counter() - started)
+
+
+def chat_stages(question, graph_version, emit=None, stream_timings=None):
+    """
+    sparql -> (execute || explanation) -> answer.
+    The explanation only needs the query, so it overlaps with execution and the answer.
+    A query that returns rows is promoted into the question cache for the graph version.
+
+    With emit(stage, chunk), the answer and explanation are streamed and each
+    chunk is handed to emit from the worker thread as it arrives.
+    """
+    if emit is None:
+        explain = lambda sparql: generate_explanation(question, sparql)
+        answer = lambda raw_data: generate_answer(question, raw_data)
+    else:
+        def streamed(name, chunks):
+            parts = []
+            for chunk in chunks:
+                parts.append(chunk)
+                emit(name, chunk)
+            return "".join(parts).strip()
+
+        explain = lambda sparql: streamed("explanation", generate_explanation_stream(
+            question, sparql, stream_timings.setdefault("explanation", {})))
+        answer = lambda raw_data: streamed("answer", generate_answer_stream(
+            question, raw_data, stream_timings.setdefault("answer", {})))
+
+    version = getattr(graph_version, "version", None)
+
+    def run_query(sparql):
+        rows = execute_sparql(sparql, scoped_graph(graph_version, question))
+        # Only queries that answered on this graph version are reused for the question
+        remember_sparql(question, sparql, rows, version)
+        return rows
+
+    return [
+        Stage("sparql", lambda: generate_sparql(question, graph_version.schema, version)),
+        Stage("raw_data", run_query, ("sparql",)),
+        Stage("explanation", explain, ("sparql",)),
+        Stage("answer", answer, ("raw_data",)),
+    ]
+
+
+def answer_question(question, graph_version, on_stage_done=None, on_chunk=None):
+    """
+    Runs the chat pipeline for one question against a pinned GraphVersion and
+    prints the per-stage timings.
+
+    If on_chunk(stage, chunk) is given, the answer and explanation are streamed
+    and on_chunk is called on the calling thread for every chunk.
+    """
+    with span("chat", question_chars=len(question)):
+        result, stages = _run_chat(question, graph_version, on_stage_done, on_chunk)
+        critical, path = result.critical_path(stages)
+        annotate(critical_path_seconds=critical, answer_ttft=result.stream_timings.get("answer", {}).get("ttft"))
+
+    stage_times = ", ".join(f"{name}={t.seconds:.2f}s" for name, t in result.timings.items())
+    ttfts = "".join(f", {name} first token {t['ttft']:.2f}s" for name, t in result.stream_timings.items() if t.get("ttft") is not None)
+    print(f"Chat pipeline {result.total:.2f}s (critical path {critical:.2f}s: {' -> '.join(path)}; {stage_times}{ttfts})")
+    return result
+
+
+def _run_chat(question, graph_version, on_stage_done, on_chunk):
+    stream_timings = {}
+    chunks = queue.Queue()
+
+    def drain():
+        while True:
+            try:
+                name, chunk = chunks.get_nowait()
+            except queue.Empty:
+                return
+            on_chunk(name, chunk)
+
+    if on_chunk is None:
+        stages = chat_stages(question, graph_version)
+        result = run_dag(stages, on_stage_done)
+    else:
+        def stage_done(name, value, timing):
+            # Deliver every chunk of a stage before announcing that it finished
+            drain()
+            if on_stage_done is not None:
+                on_stage_done(name, value, timing)
+
+        stages = chat_stages(question, graph_version, lambda name, chunk: chunks.put((name, chunk)), stream_timings)
+        result = run_dag(stages, stage_done, on_tick=drain)
+        drain()
+    result.stream_timings = stream_timings
+    return result, stages
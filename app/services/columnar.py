@@ -0,0 +1,598 @@
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from rdflib import RDF, XSD, Namespace, URIRef, Literal, Variable
+from rdflib.plugins.sparql.sparql import QueryContext, FrozenBindings
+from rdflib.plugins.sparql.evalutils import _ebv
+from rdflib.plugins.sparql.parserutils import CompValue
+
+from app.services.graph_snapshot import GraphRegistry
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+# The MenuItem -partOfService-> MealService -providedAt-> Venue chain
+PROJECTED_CLASSES = (SNU.MenuItem, SNU.MealService, SNU.Venue)
+
+NUMERIC_TYPES = {
+    XSD.integer, XSD.int, XSD.long, XSD.short, XSD.decimal, XSD.double, XSD.float,
+    XSD.nonNegativeInteger, XSD.positiveInteger, XSD.nonPositiveInteger, XSD.negativeInteger,
+}
+
+# Builtins whose value depends on more than the single bound variable
+IMPURE_BUILTINS = {
+    "Builtin_NOW", "Builtin_RAND", "Builtin_UUID", "Builtin_STRUUID", "Builtin_BNODE",
+    "Builtin_EXISTS", "Builtin_NOTEXISTS",
+}
+
+_projections = GraphRegistry()
+
+
+class _Unsupported(Exception):
+    """
+    Raised while planning when a query leaves the shapes the fast path covers.
+    """
+
+
+class Column:
+    """
+    A dictionary-encoded single-valued property: codes index into terms, -1 = no value.
+    """
+
+    def __init__(self, terms, codes):
+        self.terms = terms
+        self.codes = codes
+        # Keyed by the rdflib terms themselves, so constant lookups use the same
+        # term equality as rdflib's triple index.
+        self.code_of = {term: i for i, term in enumerate(terms)}
+        self.numeric = _numeric_values(terms)
+
+
+class Link:
+    """
+    A functional object property stored as row indices from one class to another.
+    Reverse links come from inverse-functional properties (e.g. hasMenu) and are
+    stored from the object's class back to the subject's class.
+    """
+
+    def __init__(self, subject_cls, object_cls, targets, reverse):
+        self.subject_cls = subject_cls
+        self.object_cls = object_cls
+        self.targets = targets
+        self.reverse = reverse
+
+
+class ClassTable:
+    def __init__(self, cls, subjects):
+        self.cls = cls
+        self.subjects = subjects
+        self.row_of = {s: i for i, s in enumerate(subjects)}
+        self.columns = {}
+
+
+def _numeric_values(terms):
+    """
+    Returns float values per dictionary entry, or None if the column is not purely
+    numeric or two terms share a value (then MIN/MAX could not pick rdflib's term).
+    """
+    values = []
+    for term in terms:
+        if not isinstance(term, Literal) or term.datatype not in NUMERIC_TYPES:
+            return None
+        value = term.toPython()
+        if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+            return None
+        values.append(float(value))
+    if len(set(values)) != len(values):
+        return None
+    return np.array(values, dtype=np.float64)
+
+
+class ColumnarProjection:
+    """
+    NumPy column store of the MenuItem/MealService/Venue instances in a graph.
+
+    Only properties that are single-valued, and whose subjects (and for object
+    properties, objects) all belong to one projected class, become columns or
+    links; any query touching another property falls back to rdflib.
+    """
+
+    def __init__(self, graph):
+        self.tables = {}
+        self.data_owner = {}
+        self.links = {}
+
+        owner = {}
+        for cls in PROJECTED_CLASSES:
+            members = sorted(graph.subjects(RDF.type, cls))
+            for s in members:
+                if s in owner:
+                    raise ValueError(f"{s} is typed as both {owner[s]} and {cls}")
+                owner[s] = cls
+            self.tables[cls] = ClassTable(cls, members)
+
+        by_predicate = defaultdict(list)
+        foreign = set()
+        for s, p, o in graph:
+            if p == RDF.type:
+                continue
+            if s in owner:
+                by_predicate[p].append((s, o))
+            else:
+                # An untyped pattern on p would also match this subject
+                foreign.add(p)
+
+        for p, pairs in by_predicate.items():
+            subject_classes = {owner[s] for s, _ in pairs}
+            if p in foreign or len(subject_classes) != 1:
+                continue
+            cls = subject_classes.pop()
+            functional = len({s for s, _ in pairs}) == len(pairs)
+            if all(isinstance(o, Literal) for _, o in pairs):
+                if functional:
+                    self._add_column(cls, p, pairs)
+            elif functional:
+                self._add_link(cls, p, pairs, owner)
+            else:
+                self._add_reverse_link(cls, p, pairs, owner)
+
+    def _add_column(self, cls, p, pairs):
+        table = self.tables[cls]
+        terms, code_of = [], {}
+        codes = np.full(len(table.subjects), -1, dtype=np.int32)
+        for s, o in pairs:
+            code = code_of.get(o)
+            if code is None:
+                code = code_of[o] = len(terms)
+                terms.append(o)
+            codes[table.row_of[s]] = code
+        table.columns[p] = Column(terms, codes)
+        self.data_owner[p] = cls
+
+    def _add_link(self, cls, p, pairs, owner):
+        object_classes = {owner.get(o) for _, o in pairs}
+        if len(object_classes) != 1 or None in object_classes:
+            return
+        object_cls = object_classes.pop()
+        src, dst = self.tables[cls], self.tables[object_cls]
+        targets = np.full(len(src.subjects), -1, dtype=np.int32)
+        for s, o in pairs:
+            targets[src.row_of[s]] = dst.row_of[o]
+        self.links[p] = Link(cls, object_cls, targets, reverse=False)
+
+    def _add_reverse_link(self, cls, p, pairs, owner):
+        object_classes = {owner.get(o) for _, o in pairs}
+        if len(object_classes) != 1 or None in object_classes:
+            return
+        if len({o for _, o in pairs}) != len(pairs):
+            return
+        object_cls = object_classes.pop()
+        src, dst = self.tables[object_cls], self.tables[cls]
+        targets = np.full(len(src.subjects), -1, dtype=np.int32)
+        for s, o in pairs:
+            targets[src.row_of[o]] = dst.row_of[s]
+        self.links[p] = Link(cls, object_cls, targets, reverse=True)
+
+    def execute(self, query, graph):
+        """
+        Evaluates a prepared SELECT query. Returns (vars, rows of terms), or raises
+        _Unsupported if the query does not fit the columnar shapes.
+        """
+        plan = _QueryShape(query.algebra)
+        bindings = self._match_bgp(plan.triples)
+        node_vars, value_vars, consts, edges = bindings
+
+        root, steps = self._join_order(node_vars, edges)
+        rows, mask = self._join(node_vars, root, steps)
+
+        for var, p, term in consts:
+            column = self.tables[node_vars[var]].columns[p]
+            code = column.code_of.get(term)
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= column.codes[rows[var]] == code
+        for var, (node, p) in value_vars.items():
+            mask &= self.tables[node_vars[node]].columns[p].codes[rows[node]] >= 0
+
+        ctx = QueryContext(graph)
+        ctx.prologue = query.prologue
+        for expr in plan.filters:
+            mask &= self._filter_mask(expr, ctx, node_vars, value_vars, rows)
+
+        selected = np.nonzero(mask)[0]
+        codes = {var: rows[var][selected] for var in node_vars}
+        for var, (node, p) in value_vars.items():
+            codes[var] = self.tables[node_vars[node]].columns[p].codes[codes[node]]
+
+        if plan.aggregates is not None:
+            output = self._aggregate(plan, node_vars, value_vars, codes)
+        else:
+            output = {}
+            for var in node_vars:
+                subjects = self.tables[node_vars[var]].subjects
+                output[var] = _OutputColumn([subjects[i] for i in codes[var]], None)
+            for var, (node, p) in value_vars.items():
+                column = self.tables[node_vars[node]].columns[p]
+                numeric = column.numeric[codes[var]] if column.numeric is not None else None
+                output[var] = _OutputColumn([column.terms[i] for i in codes[var]], numeric)
+
+        return plan.PV, _finish(plan, output, len(selected) if plan.aggregates is None else None)
+
+    def _match_bgp(self, triples):
+        node_vars, value_vars, consts, edges = {}, {}, [], []
+
+        def assign(var, cls):
+            if node_vars.setdefault(var, cls) != cls:
+                raise _Unsupported(f"{var} used with two classes")
+
+        for s, p, o in triples:
+            if not isinstance(s, Variable) or not isinstance(p, URIRef):
+                raise _Unsupported("constant subject or property path")
+            if p == RDF.type:
+                if o not in self.tables:
+                    raise _Unsupported(f"type {o}")
+                assign(s, o)
+            elif p in self.data_owner:
+                assign(s, self.data_owner[p])
+                if isinstance(o, Variable):
+                    if o in value_vars:
+                        raise _Unsupported(f"{o} bound twice")
+                    value_vars[o] = (s, p)
+                elif isinstance(o, (Literal, URIRef)):
+                    consts.append((s, p, o))
+                else:
+                    raise _Unsupported("blank node object")
+            elif p in self.links:
+                if not isinstance(o, Variable):
+                    raise _Unsupported("constant link target")
+                link = self.links[p]
+                assign(s, link.subject_cls)
+                assign(o, link.object_cls)
+                edges.append((s, p, o))
+            else:
+                raise _Unsupported(f"property {p}")
+
+        if set(value_vars) & set(node_vars):
+            raise _Unsupported("variable used as node and value")
+        if len(set(node_vars.values())) != len(node_vars):
+            raise _Unsupported("self-join on one class")
+        return node_vars, value_vars, consts, edges
+
+    def _join_order(self, node_vars, edges):
+        """
+        Picks a driving variable from which every edge can be followed along a
+        stored (many-to-one) link. Returns (root, [(from, to, link), ...]).
+        """
+        for root in node_vars:
+            reached, steps, pending = {root}, [], list(edges)
+            progress = True
+            while pending and progress:
+                progress = False
+                for edge in list(pending):
+                    s, p, o = edge
+                    link = self.links[p]
+                    src, dst = (o, s) if link.reverse else (s, o)
+                    if src in reached:
+                        steps.append((src, dst, link))
+                        reached.add(dst)
+                        pending.remove(edge)
+                        progress = True
+            if not pending and reached == set(node_vars):
+                return root, steps
+        raise _Unsupported("join is not a many-to-one chain")
+
+    def _join(self, node_vars, root, steps):
+        n = len(self.tables[node_vars[root]].subjects)
+        rows = {root: np.arange(n)}
+        mask = np.ones(n, dtype=bool)
+        for src, dst, link in steps:
+            targets = link.targets[rows[src]]
+            mask &= targets >= 0
+            targets = np.where(targets >= 0, targets, 0)
+            if dst in rows:
+                mask &= targets == rows[dst]
+            else:
+                rows[dst] = targets
+        return rows, mask
+
+    def _filter_mask(self, expr, ctx, node_vars, value_vars, rows):
+        variables = set()
+        _collect_vars(expr, variables)
+        if len(variables) != 1:
+            raise _Unsupported("filter over several variables")
+        var = variables.pop()
+        if var in node_vars:
+            # A filter on the node itself (e.g. :openAt(?service, ...)): once per subject
+            subjects = self.tables[node_vars[var]].subjects
+            passes = np.zeros(len(subjects), dtype=bool)
+            try:
+                for i, subject in enumerate(subjects):
+                    passes[i] = _ebv(expr, FrozenBindings(ctx, {var: subject}))
+            except Exception as e:
+                raise _Unsupported(f"filter evaluation: {e}")
+            return passes[rows[var]]
+        if var not in value_vars:
+            raise _Unsupported(f"filter on {var}")
+
+        # Evaluate the filter once per distinct value with rdflib itself, so the
+        # result is exactly rdflib's, then broadcast it over the rows.
+        node, p = value_vars[var]
+        column = self.tables[node_vars[node]].columns[p]
+        passes = np.zeros(len(column.terms) + 1, dtype=bool)
+        try:
+            for i, term in enumerate(column.terms):
+                passes[i] = _ebv(expr, FrozenBindings(ctx, {var: term}))
+        except Exception as e:
+            raise _Unsupported(f"filter evaluation: {e}")
+        # Code -1 (no value) maps onto the trailing False entry
+        return passes[column.codes[rows[node]]]
+
+    def _aggregate(self, plan, node_vars, value_vars, codes):
+        for var in plan.group_by:
+            if var not in codes:
+                raise _Unsupported(f"group by {var}")
+
+        n = len(next(iter(codes.values()))) if codes else 0
+        if plan.group_by:
+            keys = np.stack([codes[var] for var in plan.group_by], axis=1) if n else np.empty((0, 0))
+            if n:
+                _, first, group_ids = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+                group_ids = group_ids.reshape(-1)
+            else:
+                first, group_ids = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            group_count = len(first)
+        else:
+            # Without GROUP BY an aggregate always yields exactly one row
+            first, group_ids, group_count = np.zeros(1, dtype=np.int64), np.zeros(n, dtype=np.int64), 1
+
+        members = [[] for _ in range(group_count)]
+        for row, gid in enumerate(group_ids.tolist()):
+            members[gid].append(row)
+
+        results = {}
+        for agg in plan.aggregates:
+            results[agg.res] = self._aggregate_one(agg, plan, node_vars, value_vars, codes, members, first)
+
+        output = {}
+        for alias, source in plan.aliases.items():
+            if source not in results:
+                raise _Unsupported(f"alias of non-aggregate {source}")
+            output[alias] = results[source]
+        return output
+
+    def _aggregate_one(self, agg, plan, node_vars, value_vars, codes, members, first):
+        name = agg.name
+        if name == "Aggregate_Count":
+            if agg.vars == "*":
+                if agg.distinct:
+                    raise _Unsupported("COUNT(DISTINCT *)")
+                counts = [len(m) for m in members]
+            else:
+                if agg.vars not in codes:
+                    raise _Unsupported(f"count of {agg.vars}")
+                values = codes[agg.vars]
+                if agg.distinct:
+                    counts = [len(set(values[m].tolist())) for m in members]
+                else:
+                    counts = [len(m) for m in members]
+            return _OutputColumn([Literal(c) for c in counts], np.array(counts, dtype=np.float64))
+
+        if name in ("Aggregate_Min", "Aggregate_Max"):
+            var = agg.vars
+            if var not in value_vars:
+                raise _Unsupported(f"{name} of {var}")
+            node, p = value_vars[var]
+            column = self.tables[node_vars[node]].columns[p]
+            if column.numeric is None:
+                raise _Unsupported(f"{name} of non-numeric {var}")
+            pick = np.argmin if name == "Aggregate_Min" else np.argmax
+            terms, numeric = [], []
+            for m in members:
+                if not m:
+                    terms.append(None)
+                    numeric.append(np.nan)
+                    continue
+                group_codes = codes[var][m]
+                code = group_codes[pick(column.numeric[group_codes])]
+                terms.append(column.terms[code])
+                numeric.append(column.numeric[code])
+            return _OutputColumn(terms, np.array(numeric, dtype=np.float64))
+
+        if name == "Aggregate_Sample" and agg.vars in plan.group_by:
+            var = agg.vars
+            if var in node_vars:
+                subjects = self.tables[node_vars[var]].subjects
+                terms = [subjects[codes[var][i]] for i in first]
+                return _OutputColumn(terms, None)
+            node, p = value_vars[var]
+            column = self.tables[node_vars[node]].columns[p]
+            group_codes = codes[var][first]
+            numeric = column.numeric[group_codes] if column.numeric is not None else None
+            return _OutputColumn([column.terms[c] for c in group_codes], numeric)
+
+        raise _Unsupported(name)
+
+
+class _OutputColumn:
+    def __init__(self, terms, numeric):
+        self.terms = terms
+        self.numeric = numeric
+
+
+class _QueryShape:
+    """
+    Unwraps Slice / Distinct / Project / OrderBy / Extend / AggregateJoin / Filter
+    around a single BGP, the only algebra the fast path accepts.
+    """
+
+    def __init__(self, algebra):
+        if algebra.name != "SelectQuery" or algebra.datasetClause:
+            raise _Unsupported(algebra.name)
+        node = algebra.p
+
+        self.slice = None
+        if node.name == "Slice":
+            self.slice = (node.start or 0, node.length)
+            node = node.p
+        self.distinct = node.name == "Distinct"
+        if self.distinct:
+            node = node.p
+        if node.name != "Project":
+            raise _Unsupported(node.name)
+        self.PV = list(node.PV)
+        node = node.p
+
+        self.order = None
+        self.aliases = {}
+        while node.name in ("OrderBy", "Extend"):
+            if node.name == "OrderBy":
+                if self.order is not None:
+                    raise _Unsupported("nested ORDER BY")
+                self.order = [_order_condition(c) for c in node.expr]
+            else:
+                if not isinstance(node.expr, Variable):
+                    raise _Unsupported("BIND / select expression")
+                self.aliases[node.var] = node.expr
+            node = node.p
+
+        self.aggregates = None
+        self.group_by = []
+        if node.name == "AggregateJoin":
+            self.aggregates = node.A
+            group = node.p
+            if group.name != "Group":
+                raise _Unsupported(group.name)
+            for var in group.expr or []:
+                if not isinstance(var, Variable):
+                    raise _Unsupported("GROUP BY expression")
+                self.group_by.append(var)
+            node = group.p
+        elif self.aliases:
+            raise _Unsupported("BIND without aggregate")
+
+        self.filters = []
+        while node.name == "Filter":
+            self.filters.extend(_conjuncts(node.expr))
+            node = node.p
+        if node.name != "BGP":
+            raise _Unsupported(node.name)
+        self.triples = node.triples
+
+
+def _order_condition(condition):
+    if isinstance(condition, Variable):
+        return condition, False
+    if isinstance(condition, CompValue) and condition.name == "OrderCondition" and isinstance(condition.expr, Variable):
+        return condition.expr, condition.order == "DESC"
+    raise _Unsupported("ORDER BY expression")
+
+
+def _conjuncts(expr):
+    if isinstance(expr, CompValue) and expr.name == "ConditionalAndExpression":
+        parts = []
+        for part in [expr.expr] + list(expr.other or []):
+            parts.extend(_conjuncts(part))
+        return parts
+    return [expr]
+
+
+def _collect_vars(expr, acc):
+    if isinstance(expr, Variable):
+        acc.add(expr)
+    elif isinstance(expr, CompValue):
+        if expr.name in IMPURE_BUILTINS:
+            raise _Unsupported(expr.name)
+        for key, value in expr.items():
+            if not key.startswith("_"):
+                _collect_vars(value, acc)
+    elif isinstance(expr, (list, tuple)):
+        for value in expr:
+            _collect_vars(value, acc)
+
+
+def _finish(plan, output, row_count):
+    """
+    Applies ORDER BY, projection, DISTINCT and LIMIT/OFFSET to the output columns.
+    """
+    for var in plan.PV:
+        if var not in output:
+            raise _Unsupported(f"projected {var} is not bound")
+    n = len(output[plan.PV[0]].terms) if plan.PV else (row_count or 0)
+
+    keys = None
+    order = list(range(n))
+    if plan.order:
+        key_arrays = []
+        for var, descending in plan.order:
+            column = output.get(var)
+            if column is None or column.numeric is None or np.isnan(column.numeric).any():
+                raise _Unsupported(f"ORDER BY {var}")
+            key_arrays.append(-column.numeric if descending else column.numeric)
+        # Stable sort by the last key first, the same way rdflib applies conditions
+        order = np.arange(n)
+        for key in reversed(key_arrays):
+            order = order[np.argsort(key[order], kind="stable")]
+        order = order.tolist()
+        keys = [tuple(k[i] for k in key_arrays) for i in order]
+
+    rows = [tuple(output[var].terms[i] for var in plan.PV) for i in order]
+
+    if plan.distinct:
+        seen = {}
+        for i, row in enumerate(rows):
+            seen.setdefault(row, i)
+        kept = sorted(seen.values())
+        rows = [rows[i] for i in kept]
+        if keys is not None:
+            keys = [keys[i] for i in kept]
+
+    if plan.slice is not None:
+        start, length = plan.slice
+        total = len(rows)
+        end = total if length is None else min(total, start + length)
+        if keys is None:
+            # Which rows an unordered LIMIT keeps is up to the engine
+            if start < total and not (start == 0 and end == total):
+                raise _Unsupported("LIMIT without ORDER BY")
+        else:
+            # Ties straddling a cut would make the kept rows engine-dependent
+            if 0 < start < total and keys[start - 1] == keys[start]:
+                raise _Unsupported("OFFSET splits tied rows")
+            if 0 < end < total and keys[end - 1] == keys[end]:
+                raise _Unsupported("LIMIT splits tied rows")
+        rows = rows[start:end]
+
+    return rows
+
+
+def build_projection(graph):
+    """
+    Builds and registers the columnar projection for a graph.
+    Returns None (and the fast path stays off) if the graph does not fit the model.
+    """
+    try:
+        projection = ColumnarProjection(graph)
+    except Exception as e:
+        print(f"Columnar projection disabled: {e}")
+        return None
+    _projections[graph] = projection
+    return projection
+
+
+def projection_for(graph):
+    return _projections.get(graph)
+
+
+def try_execute(query, graph):
+    """
+    Runs a prepared query on the graph's columnar projection.
+    Returns (vars, rows) or None when the query must go through rdflib.
+    """
+    projection = projection_for(graph)
+    if projection is None:
+        return None
+    try:
+        return projection.execute(query, graph)
+    except _Unsupported:
+        return None
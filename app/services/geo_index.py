@@ -0,0 +1,298 @@
+import re
+import math
+import threading
+import functools
+from collections import OrderedDict, defaultdict
+
+from rdflib import Literal, Namespace, URIRef, XSD
+from rdflib.plugins.sparql.operators import register_custom_function
+from rdflib.plugins.sparql.sparql import SPARQLError
+
+from app.services.graph_snapshot import GraphRegistry
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+# SPARQL extension functions (prefix ":" in generated queries)
+DISTANCE_FN = SNU.distance
+WITHIN_RADIUS_FN = SNU.withinRadius
+NEAREST_FN = SNU.nearest
+
+# Grid cell size in degrees (about 220m of latitude on campus)
+CELL_DEGREES = 0.002
+EARTH_RADIUS_M = 6371000.0
+# (place, radius) / (place, k) lookups kept per index
+LOOKUP_CACHE_SIZE = 256
+
+_indexes = GraphRegistry()
+_indexes_lock = threading.Lock()
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """
+    Great-circle distance in meters.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def normalize_place(text):
+    return re.sub(r"[\s()\[\]·,]+", "", str(text)).lower()
+
+
+def place_aliases(text):
+    """
+    Names a building or venue label answers to: "301동 (제1공학관)" -> the full
+    label, "301동", "제1공학관" and "301"; a trailing phone number is dropped.
+    """
+    text = re.sub(r"\(\s*\d{3}-\d{4}\s*\)", "", str(text)).strip()
+    aliases = {normalize_place(text)}
+    for part in re.split(r"[()/,]", text):
+        part = normalize_place(part)
+        if part:
+            aliases.add(part)
+            number = re.fullmatch(r"(\d+(?:-\d+)?)동", part)
+            if number:
+                aliases.add(number.group(1))
+    aliases.discard("")
+    return aliases
+
+
+class GridIndex:
+    """
+    Points bucketed into a fixed lat/lng grid. Radius and k-nearest searches
+    visit only the cells that can hold an answer.
+    """
+
+    def __init__(self, points, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.points = dict(points)
+        self.cells = defaultdict(list)
+        for key, (lat, lng) in self.points.items():
+            self.cells[self._cell(lat, lng)].append(key)
+        if self.cells:
+            rows = [row for row, _ in self.cells]
+            cols = [col for _, col in self.cells]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, lat, lng):
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def _ring(self, center, radius):
+        row, col = center
+        for r in range(row - radius, row + radius + 1):
+            for c in range(col - radius, col + radius + 1):
+                if max(abs(r - row), abs(c - col)) == radius:
+                    yield from self.cells.get((r, c), ())
+
+    def _cell_meters(self, lat):
+        # The shorter side of a cell: any point outside ring n is more than n cells away
+        return haversine_m(lat, 0, lat, self.cell_degrees) if abs(lat) < 89 else 0.0
+
+    def _max_ring(self, center):
+        row, col = center
+        min_row, max_row, min_col, max_col = self._bounds
+        return max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+
+    def within(self, lat, lng, radius_m):
+        """
+        [(distance, key)] of the points within radius_m, nearest first.
+        """
+        if not self.points:
+            return []
+        center = self._cell(lat, lng)
+        cell_m = self._cell_meters(lat)
+        rings = self._max_ring(center) if cell_m == 0 else min(math.ceil(radius_m / cell_m), self._max_ring(center))
+        found = []
+        for ring in range(rings + 1):
+            for key in self._ring(center, ring):
+                distance = haversine_m(lat, lng, *self.points[key])
+                if distance <= radius_m:
+                    found.append((distance, key))
+        return sorted(found)
+
+    def nearest(self, lat, lng, k):
+        """
+        [(distance, key)] of the k nearest points (all ties at the k-th distance included).
+        """
+        if not self.points or k <= 0:
+            return []
+        center = self._cell(lat, lng)
+        cell_m = self._cell_meters(lat)
+        found = []
+        for ring in range(self._max_ring(center) + 1):
+            for key in self._ring(center, ring):
+                found.append((haversine_m(lat, lng, *self.points[key]), key))
+            found.sort()
+            # Points in later rings are at least ring * cell_m away
+            if len(found) >= k and cell_m and found[k - 1][0] <= ring * cell_m:
+                break
+        if len(found) <= k:
+            return found
+        cutoff = found[k - 1][0]
+        return [hit for hit in found if hit[0] <= cutoff]
+
+
+class GeoIndex:
+    """
+    Venue coordinates (:geoLat/:geoLng) in a GridIndex, plus a gazetteer from
+    building names, venue names and their aliases to coordinates.
+    """
+
+    def __init__(self, graph):
+        lats = dict(graph.subject_objects(SNU.geoLat))
+        points = {}
+        for venue, lng in graph.subject_objects(SNU.geoLng):
+            if venue in lats:
+                try:
+                    points[venue] = (float(lats[venue]), float(lng))
+                except (TypeError, ValueError):
+                    continue
+        self.grid = GridIndex(points)
+
+        self.gazetteer = {}
+        labels = []
+        for venue in points:
+            for prop in (SNU.building, SNU.name):
+                labels.extend((str(label), venue) for label in graph.objects(venue, prop))
+        # Shorter labels first, so an exact building name wins over a venue name containing it
+        for label, venue in sorted(labels, key=lambda item: (len(item[0]), item[0], str(item[1]))):
+            for alias in place_aliases(label):
+                self.gazetteer.setdefault(alias, points[venue])
+
+        self._lookups = OrderedDict()
+        self._lock = threading.Lock()
+        # Every row of a FILTER/ORDER BY asks for the same few names
+        self._locate_name = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._match_name)
+
+    def locate(self, place):
+        """
+        (lat, lng) of a Venue IRI or a building/venue name; substring matches
+        ("301동 근처" -> "301동") take the longest alias. None if unknown.
+        """
+        if isinstance(place, URIRef):
+            return self.grid.points.get(place)
+        return self._locate_name(normalize_place(place))
+
+    def _match_name(self, key):
+        if not key:
+            return None
+        point = self.gazetteer.get(key)
+        if point is not None:
+            return point
+        matches = [alias for alias in self.gazetteer if len(alias) > 1 and (alias in key or key in alias)]
+        if not matches:
+            return None
+        return self.gazetteer[max(matches, key=lambda alias: (len(alias) if alias in key else len(key), alias))]
+
+    def _cached(self, key, compute):
+        with self._lock:
+            hit = self._lookups.get(key)
+            if hit is not None:
+                self._lookups.move_to_end(key)
+                return hit
+        value = compute()
+        with self._lock:
+            self._lookups[key] = value
+            while len(self._lookups) > LOOKUP_CACHE_SIZE:
+                self._lookups.popitem(last=False)
+        return value
+
+    def within(self, place, radius_m):
+        """
+        {venue: distance} of the venues within radius_m of place.
+        """
+        point = self.locate(place)
+        if point is None:
+            return {}
+        return self._cached(("within", point, radius_m),
+                            lambda: {key: d for d, key in self.grid.within(*point, radius_m)})
+
+    def nearest(self, place, k):
+        """
+        {venue: distance} of the k venues nearest to place.
+        """
+        point = self.locate(place)
+        if point is None:
+            return {}
+        return self._cached(("nearest", point, k),
+                            lambda: {key: d for d, key in self.grid.nearest(*point, k)})
+
+
+def build_geo_index(graph):
+    """
+    Builds and registers the GeoIndex for a graph.
+    """
+    index = GeoIndex(graph)
+    _indexes[graph] = index
+    return index
+
+
+def geo_index_for(graph):
+    """
+    The graph's GeoIndex, built on first use.
+    """
+    index = _indexes.get(graph)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(graph)
+            if index is None:
+                index = build_geo_index(graph)
+    return index
+
+
+def _arguments(expr, ctx, count):
+    args = list(expr.expr or [])
+    if len(args) != count:
+        raise SPARQLError(f"{expr.iri.n3()} takes {count} arguments, got {len(args)}")
+    return geo_index_for(ctx.ctx.graph), args
+
+
+def _number(term):
+    if not isinstance(term, Literal):
+        raise SPARQLError(f"expected a number, got {term!r}")
+    try:
+        return float(term.toPython())
+    except (TypeError, ValueError):
+        raise SPARQLError(f"expected a number, got {term!r}")
+
+
+def _distance(expr, ctx):
+    index, (a, b) = _arguments(expr, ctx, 2)
+    point_a, point_b = index.locate(a), index.locate(b)
+    if point_a is None or point_b is None:
+        raise SPARQLError(f"unknown place {a if point_a is None else b!r}")
+    return Literal(round(haversine_m(*point_a, *point_b), 1), datatype=XSD.double)
+
+
+def _within_radius(expr, ctx):
+    index, (venue, place, radius) = _arguments(expr, ctx, 3)
+    return Literal(venue in index.within(place, _number(radius)))
+
+
+def _nearest(expr, ctx):
+    index, (venue, place, k) = _arguments(expr, ctx, 3)
+    return Literal(venue in index.nearest(place, int(_number(k))))
+
+
+def register_functions():
+    """
+    Registers :distance(a, b) (meters between two Venues or place names),
+    :withinRadius(?venue, place, meters) and :nearest(?venue, place, k) with rdflib's SPARQL engine.
+    """
+    register_custom_function(DISTANCE_FN, _distance, override=True, raw=True)
+    register_custom_function(WITHIN_RADIUS_FN, _within_radius, override=True, raw=True)
+    register_custom_function(NEAREST_FN, _nearest, override=True, raw=True)
+
+
+register_functions()
+
+SPATIAL_FUNCTIONS_DOC = """
+- `:distance(?a, ?b)`: meters between two places (a Venue IRI or a building/venue name string, e.g. "301동").
+- `:withinRadius(?venue, "place", meters)`: true if ?venue is within that many meters of the place.
+- `:nearest(?venue, "place", k)`: true if ?venue is one of the k venues nearest to the place.
+"""
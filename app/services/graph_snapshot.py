@@ -0,0 +1,119 @@
+import gc
+import os
+import pickle
+import hashlib
+import weakref
+import rdflib
+
+# Bump when the on-disk layout below changes so stale snapshots are rebuilt.
+SNAPSHOT_FORMAT = 1
+
+
+class GraphRegistry:
+    """
+    Per-graph values keyed by object identity, dropped when the graph is collected.
+
+    rdflib Graphs hash and compare by identifier, and every graph unpickled from
+    one snapshot shares the same identifier, so a WeakKeyDictionary would mix
+    them up and drop the live graph's entry when an older copy is collected.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def __setitem__(self, graph, value):
+        key = id(graph)
+
+        def drop(ref):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is ref:
+                del self._entries[key]
+
+        self._entries[key] = (weakref.ref(graph, drop), value)
+
+    def get(self, graph, default=None):
+        entry = self._entries.get(id(graph))
+        if entry is None or entry[0]() is not graph:
+            return default
+        return entry[1]
+
+
+# Source content key of every graph produced by load_graph(), used as its version stamp
+_graph_versions = GraphRegistry()
+
+
+def snapshot_key(*paths):
+    """
+    Returns a hex digest over the contents of the given source files.
+    The rdflib version is mixed in because the pickled store layout is rdflib-internal.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"format={SNAPSHOT_FORMAT};rdflib={rdflib.__version__}".encode("utf-8"))
+    for path in paths:
+        digest.update(str(path).encode("utf-8"))
+        if not os.path.exists(path):
+            digest.update(b"<missing>")
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_snapshot(path, key):
+    """
+    Loads a pickled graph snapshot if it exists and was built from the same sources.
+    Returns None when the snapshot is missing, stale or unreadable.
+    """
+    if not os.path.exists(path):
+        return None
+
+    # Unpickling allocates one object per term and index entry; pausing the
+    # cyclic GC avoids repeated full collections while the store is rebuilt.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as f:
+            # The key is pickled first so a stale snapshot is rejected without unpickling the graph.
+            stored_key = pickle.load(f)
+            if stored_key != key:
+                return None
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Error loading graph snapshot {path}: {e}")
+        return None
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def save_snapshot(graph, path, key):
+    """
+    Writes the graph snapshot atomically (temp file + rename) so concurrent readers
+    never observe a partially written file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Error saving graph snapshot {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def register_version(graph, key):
+    """
+    Records the source content key a graph was built from.
+    """
+    _graph_versions[graph] = key
+
+
+def graph_version(graph):
+    """
+    Returns the source content key of a graph from load_graph(), or None if unknown.
+    """
+    return _graph_versions.get(graph)
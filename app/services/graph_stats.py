@@ -0,0 +1,210 @@
+import os
+import json
+import threading
+from collections import Counter
+
+from rdflib import Namespace, RDF, RDFS, OWL, Literal, URIRef
+
+from app.services.graph_snapshot import GraphRegistry, graph_version
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+STATS_FORMAT = 2
+
+# Properties whose every distinct value is listed with its count
+CATEGORICAL_PROPERTIES = (":mealType", ":cuisineType", ":carbType", ":category", ":tag",
+                          ":serviceStyle", ":consumptionMode")
+# Properties summarized as min / max / mean
+NUMERIC_PROPERTIES = (":price", ":floor")
+DATE_PROPERTY = ":date"
+# Object property links shown as examples of how resources connect
+SAMPLE_RELATIONS = 5
+
+_stats = GraphRegistry()
+_stats_lock = threading.Lock()
+
+
+def _term(name):
+    return SNU[name[1:]]
+
+
+def _superclasses(graph, cls):
+    found, pending = set(), [cls]
+    while pending:
+        current = pending.pop()
+        if current not in found:
+            found.add(current)
+            pending.extend(graph.objects(current, RDFS.subClassOf))
+    return found
+
+
+def _implied_types(graph, resources):
+    """
+    {predicate: {"subject": [classes], "object": [classes]}}: the rdfs:domain
+    and rdfs:range classes (and their superclasses) that every subject or
+    object of the predicate is typed with in this graph, i.e. the type
+    triples the materialized inferences make redundant. resources maps each
+    predicate to its (subjects, objects) sets.
+    """
+    implied = {}
+    instances = {}
+    for axiom, side in ((RDFS.domain, "subject"), (RDFS.range, "object")):
+        for prop, cls in graph.subject_objects(axiom):
+            if not isinstance(cls, URIRef) or cls.startswith(str(RDFS)) or cls.startswith("http://www.w3.org/2001/XMLSchema#"):
+                continue
+            subjects, objects = resources.get(prop, (None, None))
+            members = subjects if side == "subject" else objects
+            if not members:
+                continue
+            for candidate in _superclasses(graph, cls):
+                if candidate not in instances:
+                    instances[candidate] = set(graph.subjects(RDF.type, candidate))
+                if members <= instances[candidate]:
+                    classes = implied.setdefault(str(prop), {}).setdefault(side, [])
+                    if str(candidate) not in classes:
+                        classes.append(str(candidate))
+    return {prop: {side: sorted(classes) for side, classes in sides.items()} for prop, sides in implied.items()}
+
+
+def compute_stats(graph):
+    """
+    Value statistics of a graph: per-class instance counts, every value of
+    the categorical properties with its count, min/max/mean of the numeric
+    properties, the service dates covered and a few sample relations; and for
+    the query optimizer, per-predicate triple / distinct subject / distinct
+    object counts and the type triples implied by domain and range.
+    """
+    n3 = lambda term: term.n3(graph.namespace_manager)
+    # One link per most-used object property, the same on every run
+    links = []
+    for prop in set(graph.subjects(RDF.type, OWL.ObjectProperty)):
+        pairs = list(graph.subject_objects(prop))
+        if pairs:
+            s, o = min(pairs, key=lambda pair: (str(pair[0]), str(pair[1])))
+            links.append((-len(pairs), str(prop), f"{n3(s)} {n3(prop)} {n3(o)}"))
+    relations = [text for _, _, text in sorted(links)[:SAMPLE_RELATIONS]]
+
+    classes = {c for cls in (OWL.Class, RDFS.Class) for c in graph.subjects(RDF.type, cls)
+               if str(c).startswith(str(SNU))}
+    cardinalities = {}
+    for cls in sorted(classes):
+        count = len(set(graph.subjects(RDF.type, cls)))
+        if count:
+            cardinalities[":" + str(cls)[len(SNU):]] = count
+
+    categorical = {}
+    for prop in CATEGORICAL_PROPERTIES:
+        counts = Counter(str(value) for value in graph.objects(None, _term(prop)))
+        if counts:
+            categorical[prop] = dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    numeric = {}
+    for prop in NUMERIC_PROPERTIES:
+        values = []
+        for value in graph.objects(None, _term(prop)):
+            number = value.toPython() if isinstance(value, Literal) else None
+            if isinstance(number, (int, float)) and not isinstance(number, bool):
+                values.append(number)
+        if values:
+            numeric[prop] = {"min": min(values), "max": max(values),
+                             "mean": round(sum(values) / len(values), 1), "count": len(values)}
+
+    counts, resources = Counter(), {}
+    for subject, prop, value in graph:
+        counts[prop] += 1
+        subjects, objects = resources.setdefault(prop, (set(), set()))
+        subjects.add(subject)
+        objects.add(value)
+    predicates = {str(prop): {"triples": counts[prop], "subjects": len(subjects), "objects": len(objects)}
+                  for prop, (subjects, objects) in resources.items()}
+
+    dates = sorted({str(value) for value in graph.objects(None, _term(DATE_PROPERTY))})
+    return {
+        "classes": cardinalities,
+        "categorical": categorical,
+        "numeric": numeric,
+        "dates": {"first": dates[0], "last": dates[-1], "days": len(dates)} if dates else None,
+        "relations": relations,
+        "triples": len(graph),
+        "predicates": dict(sorted(predicates.items())),
+        "implied_types": _implied_types(graph, resources),
+    }
+
+
+def load_stats(path, key):
+    """
+    Persisted statistics if they were computed for the graph version key, else None.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except Exception as e:
+        print(f"Error loading graph stats {path}: {e}")
+        return None
+    if stored.get("format") != STATS_FORMAT or stored.get("version") != key:
+        return None
+    return stored["stats"]
+
+
+def save_stats(stats, path, key):
+    """
+    Writes the statistics for graph version key atomically (temp file + rename).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": STATS_FORMAT, "version": key, "stats": stats}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Error saving graph stats {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def stats_for(graph, path=None):
+    """
+    The graph's statistics: from path when they were persisted for its version,
+    otherwise computed once and saved there (graphs without a version are only
+    kept in memory).
+    """
+    stats = _stats.get(graph)
+    if stats is not None:
+        return stats
+    with _stats_lock:
+        stats = _stats.get(graph)
+        if stats is None:
+            key = graph_version(graph)
+            stats = load_stats(path, key) if key else None
+            if stats is None:
+                stats = compute_stats(graph)
+                if key and path:
+                    save_stats(stats, path, key)
+            _stats[graph] = stats
+    return stats
+
+
+def format_stats(stats, properties=None):
+    """
+    Schema summary sections for the statistics, limited to properties (and
+    classes) in the given set when one is given.
+    """
+    keep = (lambda name: True) if properties is None else (lambda name: name in properties)
+    sections = []
+    classes = [f"{name}: {count}" for name, count in stats["classes"].items() if keep(name)]
+    if classes:
+        sections.append("## Class Cardinalities\n" + ", ".join(classes))
+    values = [f"Unique Values for {prop} (with counts): {json.dumps(counts, ensure_ascii=False)}"
+              for prop, counts in stats["categorical"].items() if keep(prop)]
+    if values:
+        sections.append("## Categorical Values\n" + "\n".join(values))
+    ranges = [f"{prop}: {summary['min']} ~ {summary['max']} (mean {summary['mean']}, {summary['count']} values)"
+              for prop, summary in stats["numeric"].items() if keep(prop)]
+    if ranges:
+        sections.append("## Value Ranges\n" + "\n".join(ranges))
+    dates = stats.get("dates")
+    if dates and keep(DATE_PROPERTY):
+        sections.append(f"## Date Coverage\n{DATE_PROPERTY}: {dates['first']} ~ {dates['last']} ({dates['days']} days)")
+    return "\n\n".join(sections)
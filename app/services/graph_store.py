@@ -0,0 +1,162 @@
+import time
+import threading
+from dataclasses import dataclass
+
+from app.services.rag_pipeline import load_graph, extract_schema_info, build_schema_catalog
+from app.services.graph_snapshot import snapshot_key, graph_version
+from app.services.graph_stats import stats_for
+from app.services.partitioned_graph import PartitionedGraph
+from config import TBOX_PATH, ABOX_INFERRED_PATH, GRAPH_REFRESH_SECONDS
+from config import GRAPH_PARTITIONED, PARTITION_RETENTION_DAYS, PARTITION_ARCHIVE_DIR, SCHEMA_PRUNING
+from config import GRAPH_STATS_PATH
+
+
+@dataclass(frozen=True)
+class GraphVersion:
+    """
+    An immutable (graph, schema) pair published to every session.
+    The graph is shared and must be treated as read-only by readers.
+    With partitions, graph is the view of the retained dates. schema is the
+    summary string, or a SchemaCatalog when prompts are pruned per question.
+    """
+    version: str
+    graph: object
+    schema: object
+    loaded_at: float
+    partitions: object = None
+
+
+def _schema(graph, stats):
+    if SCHEMA_PRUNING:
+        return build_schema_catalog(graph, stats)
+    return extract_schema_info(graph, stats)
+
+
+def _source_key():
+    return snapshot_key(TBOX_PATH, ABOX_INFERRED_PATH)
+
+
+def _load_version():
+    # With partitions, the merged graph is only split; the views carry the indexes
+    graph = load_graph(build_indexes=not GRAPH_PARTITIONED)
+    # load_graph() only versions a graph whose TBox and ABox both parsed
+    version = graph_version(graph)
+    if version is None:
+        raise RuntimeError("Graph sources failed to parse; not publishing a partial graph")
+    # Statistics of the whole graph (archived dates included), persisted per version
+    stats = stats_for(graph, GRAPH_STATS_PATH)
+    if not GRAPH_PARTITIONED:
+        return GraphVersion(version, graph, _schema(graph, stats), time.time())
+    partitions = PartitionedGraph(graph, version, PARTITION_ARCHIVE_DIR, PARTITION_RETENTION_DAYS)
+    # Release the merged graph before the view copies the retained partitions
+    del graph
+    view = partitions.view()
+    return GraphVersion(version, view, _schema(view, stats), time.time(), partitions)
+
+
+def scoped_graph(graph_version, question):
+    """
+    The graph a question is answered from: the partitions of the date window
+    it implies (loading archived ones if needed), else the published graph.
+    """
+    partitions = getattr(graph_version, "partitions", None)
+    if partitions is None or partitions.window(question) is None:
+        return graph_version.graph
+    return partitions.graph_for(question)
+
+
+class GraphStore:
+    """
+    Process-wide holder of the current GraphVersion.
+
+    Readers take one reference per request via current(); a new version is built
+    off to the side and swapped in with a single assignment, so in-flight requests
+    keep the version they started with and never see a half-built graph.
+    """
+
+    def __init__(self, loader=_load_version, refresh_seconds=GRAPH_REFRESH_SECONDS, source_key=_source_key):
+        self._loader = loader
+        self._source_key = source_key
+        self._refresh_seconds = refresh_seconds
+        self._current = None
+        self._last_check = 0.0
+        # Serializes loads only; readers never take this lock once a version exists.
+        self._load_lock = threading.Lock()
+
+    def is_loaded(self):
+        return self._current is not None
+
+    def current(self):
+        """
+        Returns the published GraphVersion, loading it on first use.
+        """
+        current = self._current
+        if current is not None:
+            return current
+        with self._load_lock:
+            if self._current is None:
+                self._publish(self._loader())
+            return self._current
+
+    def publish(self, graph, schema, version):
+        """
+        Atomically replaces the shared version.
+        """
+        new_version = GraphVersion(version, graph, schema, time.time())
+        with self._load_lock:
+            self._publish(new_version)
+        return new_version
+
+    def refresh(self):
+        """
+        Reloads and publishes the graph if its source files changed.
+        Returns the (possibly unchanged) current version. A failed reload keeps
+        the current version and is retried on the next check.
+        """
+        with self._load_lock:
+            self._last_check = time.time()
+            current = self._current
+            if current is not None and current.version == self._source_key():
+                return current
+            try:
+                new_version = self._loader()
+            except Exception as e:
+                if current is None:
+                    raise
+                print(f"Error reloading graph, keeping version {current.version[:12]}: {e}")
+                return current
+            self._publish(new_version)
+            return self._current
+
+    def maybe_refresh(self):
+        """
+        Like refresh(), but checks the source files at most once per refresh interval
+        and never waits behind a reload that another session already started.
+        """
+        current = self._current
+        if current is not None and (
+            time.time() - self._last_check < self._refresh_seconds or self._load_lock.locked()
+        ):
+            return current
+        return self.refresh()
+
+    def _publish(self, new_version):
+        self._current = new_version
+        self._last_check = time.time()
+        print(f"Published graph version {new_version.version[:12]} ({len(new_version.graph)} triples)")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_graph_store():
+    """
+    Returns the process-wide GraphStore shared by all Streamlit sessions.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = GraphStore()
+    return _store
@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import time
+import queue
+import random
+import hashlib
+import threading
+import http.client
+from urllib.parse import urlparse
+
+from app.services.tracing import annotate
+from config import LLM_BACKEND, LLM_BASE_URL, LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_RECORDINGS_PATH
+
+
+class LLMBackend:
+    """
+    Text generation interface used by the pipeline and the ETL classifier.
+    Backends are long-lived and shared between threads.
+    """
+    name = "base"
+
+    def check(self):
+        """
+        Raises ValueError if the backend is not usable (e.g. missing credentials).
+        """
+
+    def generate(self, prompt):
+        """
+        Returns the full response text.
+        """
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        """
+        Yields response text chunks as they arrive.
+        """
+        yield self.generate(prompt)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for backends that do not report usage (about 3 chars per token
+    for mixed Korean/English text).
+    """
+    return max(1, len(text) // 3) if text else 0
+
+
+def _annotate_usage(backend, prompt_tokens, response_tokens, estimated=False):
+    annotate(backend=backend.name, prompt_tokens=prompt_tokens, response_tokens=response_tokens,
+             tokens_estimated=estimated)
+
+
+def _with_retries(call, max_retries, retriable, label):
+    """
+    Calls call() up to max_retries + 1 times with jittered exponential backoff
+    between attempts, retrying only exceptions for which retriable(e) is true.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == max_retries or not retriable(e):
+                raise
+            delay = min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Retrying {label} in {delay:.1f}s ({type(e).__name__}: {e})")
+            time.sleep(delay)
+
+
+class HTTPStatusError(RuntimeError):
+    """
+    A non-200 response from the HTTP backend; 429 and 5xx are worth retrying.
+    """
+
+    def __init__(self, status, detail):
+        super().__init__(f"HTTP {status}: {detail}")
+        self.status = status
+
+    @property
+    def retriable(self):
+        return self.status == 429 or self.status >= 500
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini through google.generativeai, with one GenerativeModel reused
+    for every call instead of a new client per request.
+    """
+    name = "gemini"
+    RETRIABLE = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError")
+
+    def __init__(self, model_name, api_key=None, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES):
+        import google.generativeai as genai
+
+        self.model_name = model_name
+        self.api_key = api_key or os.environ.get("GOOGLE_API_KEY")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._model = None
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(model_name)
+
+    def check(self):
+        if self._model is None:
+            raise ValueError("GOOGLE_API_KEY is not set.")
+
+    def _retriable(self, e):
+        return type(e).__name__ in self.RETRIABLE
+
+    def generate(self, prompt):
+        self.check()
+        response = _with_retries(
+            lambda: self._model.generate_content(prompt, request_options={"timeout": self.timeout}),
+            self.max_retries, self._retriable, self.model_name)
+        self._annotate(response)
+        return response.text
+
+    def stream(self, prompt):
+        self.check()
+        # Only the request itself is retried; a stream that fails midway cannot be resumed
+        response = _with_retries(
+            lambda: self._model.generate_content(prompt, stream=True, request_options={"timeout": self.timeout}),
+            self.max_retries, self._retriable, self.model_name)
+        for chunk in response:
+            text = chunk.text
+            if text:
+                yield text
+        # Usage metadata is complete once the stream is exhausted
+        self._annotate(response)
+
+    def _annotate(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            _annotate_usage(self, usage.prompt_token_count, usage.candidates_token_count)
+
+
+class HTTPBackend(LLMBackend):
+    """
+    Client for the local stand-in server (scripts/utils/llm_standin_server.py).
+    Keeps a pool of keep-alive connections so concurrent requests do not pay
+    connection setup every time.
+
+    Protocol: POST /generate {"model", "prompt", "stream"} returns {"text"}, or
+    with stream=true one {"text"} JSON object per line.
+    """
+    name = "http"
+
+    def __init__(self, base_url, model_name, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES, pool_size=8):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connection(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _request(self, prompt, stream):
+        """
+        Sends the request and returns (connection, response, payload). Without
+        stream the body is read and decoded here, so a failed or malformed body
+        is retried like a failed request; payload is None for streams.
+        """
+        body = json.dumps({"model": self.model_name, "prompt": prompt, "stream": stream}).encode("utf-8")
+
+        def call():
+            conn = self._connection()
+            try:
+                conn.request("POST", "/generate", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                data = None if stream and response.status == 200 else response.read()
+                if response.status == 200 and not stream:
+                    payload = json.loads(data)
+            except BaseException:
+                conn.close()
+                raise
+            if response.status != 200:
+                self._release(conn)
+                raise HTTPStatusError(response.status, data.decode("utf-8", "replace"))
+            if stream:
+                return conn, response, None
+            self._release(conn)
+            return conn, response, payload
+
+        retriable = lambda e: (isinstance(e, (OSError, http.client.HTTPException, json.JSONDecodeError))
+                               or isinstance(e, HTTPStatusError) and e.retriable)
+        return _with_retries(call, self.max_retries, retriable, f"{self.host}:{self.port}")
+
+    def generate(self, prompt):
+        _, _, payload = self._request(prompt, stream=False)
+        _annotate_usage(self, estimate_tokens(prompt), estimate_tokens(payload["text"]), estimated=True)
+        return payload["text"]
+
+    def stream(self, prompt):
+        conn, response, _ = self._request(prompt, stream=True)
+        parts = []
+        try:
+            for line in iter(response.readline, b""):
+                if line.strip():
+                    parts.append(json.loads(line)["text"])
+                    yield parts[-1]
+        except BaseException:
+            # Abandoned midway: the connection still has unread data
+            conn.close()
+            raise
+        self._release(conn)
+        _annotate_usage(self, estimate_tokens(prompt), estimate_tokens("".join(parts)), estimated=True)
+
+
+class RecordedResponses:
+    """
+    Deterministic responses for offline runs: the first recording whose
+    "contains" substrings all occur in the prompt wins, otherwise a canned
+    response for the prompt's kind (SPARQL, classification, free text).
+    """
+
+    def __init__(self, path=None):
+        self.recordings = []
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self.recordings = json.load(f).get("responses", [])
+
+    def respond(self, prompt):
+        for recording in self.recordings:
+            if all(fragment in prompt for fragment in recording["contains"]):
+                return recording["text"]
+
+        if "into a SPARQL" in prompt:
+            return "SELECT ?vName WHERE {\n  ?v a :Venue ;\n     :name ?vName .\n}"
+        if "food ontology expert" in prompt:
+            match = re.search(r"Input items:\s*(\[.*?\])\s*Output JSON", prompt, re.DOTALL)
+            names = json.loads(match.group(1)) if match else []
+            return json.dumps({
+                name: {"cuisineType": "Korean", "containsMeat": False, "carbType": "Rice", "isSpicy": False}
+                for name in names
+            }, ensure_ascii=False)
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        return f"요청하신 내용에 대한 응답입니다. ({digest})"
+
+
+def split_chunks(text, size=16):
+    """
+    Splits text into roughly size-character chunks on whitespace, like a token stream.
+    """
+    chunks, current = [], ""
+    for piece in re.findall(r"\S+\s*|\s+", text):
+        current += piece
+        if len(current) >= size:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ReplayBackend(LLMBackend):
+    """
+    In-process RecordedResponses, with optional simulated latency.
+    """
+    name = "replay"
+
+    def __init__(self, recordings_path=LLM_RECORDINGS_PATH, latency=0.0, chunk_delay=0.0):
+        self.responses = RecordedResponses(recordings_path)
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+
+    def generate(self, prompt):
+        time.sleep(self.latency)
+        text = self.responses.respond(prompt)
+        _annotate_usage(self, estimate_tokens(prompt), estimate_tokens(text), estimated=True)
+        return text
+
+    def stream(self, prompt):
+        time.sleep(self.latency)
+        text = self.responses.respond(prompt)
+        for chunk in split_chunks(text):
+            time.sleep(self.chunk_delay)
+            yield chunk
+        _annotate_usage(self, estimate_tokens(prompt), estimate_tokens(text), estimated=True)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+# Explicitly installed backends (benchmarks, tests) take precedence over config
+_overrides = {}
+
+
+def use_backend(model_name, backend):
+    """
+    Makes get_backend(model_name) return backend regardless of LLM_BACKEND;
+    None removes the override.
+    """
+    if backend is None:
+        _overrides.pop(model_name, None)
+    else:
+        _overrides[model_name] = backend
+
+
+def create_backend(kind, model_name, max_retries=LLM_MAX_RETRIES):
+    if kind == "gemini":
+        return GeminiBackend(model_name, max_retries=max_retries)
+    if kind == "http":
+        return HTTPBackend(os.environ.get("LLM_BASE_URL", LLM_BASE_URL), model_name, max_retries=max_retries)
+    if kind == "replay":
+        return ReplayBackend()
+    raise ValueError(f"Unknown LLM backend: {kind}")
+
+
+def get_backend(model_name, kind=None, max_retries=LLM_MAX_RETRIES):
+    """
+    Returns the shared backend for a model, created on first use.
+    The kind defaults to config.LLM_BACKEND ("gemini", "http" or "replay").
+    Callers that retry failed calls themselves pass max_retries=0.
+    """
+    if kind is None and model_name in _overrides:
+        return _overrides[model_name]
+    # Re-read the environment: rag_pipeline loads .env after config is imported
+    kind = kind or os.environ.get("LLM_BACKEND", LLM_BACKEND)
+    key = (kind, model_name, max_retries)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = _backends[key] = create_backend(kind, model_name, max_retries)
+    return backend
@@ -0,0 +1,263 @@
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+
+from rdflib import Dataset, Graph, Namespace, URIRef, RDF
+
+from app.services.graph_snapshot import register_version, graph_version
+from app.services.columnar import build_projection
+from app.services.text_index import build_text_index
+from app.services.time_index import local_today
+from app.services.tracing import span, annotate, record_cache
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+# Named graphs of the Dataset: one shared static graph, one per service date
+STATIC_GRAPH = URIRef("http://snu.ac.kr/dining/graph/static")
+PARTITION_PREFIX = "http://snu.ac.kr/dining/graph/date/"
+
+# Views kept per date window (static + partitions, with their columnar projection)
+VIEW_CACHE_SIZE = 8
+
+WEEKDAYS = "월화수목금토일"
+# What may follow a bare "1/15" for it to be read as a date ("1/15 메뉴", "1/15(목)"), not "1/2 인분"
+SLASH_DATE_CONTEXT = r"일|날|에|의|메뉴|식단|아침|점심|저녁|조식|중식|석식|\("
+
+
+def partition_graph_id(day):
+    return URIRef(f"{PARTITION_PREFIX}{day.isoformat()}")
+
+
+def service_dates(graph):
+    """
+    Returns {node: date} for every MealService and MenuItem with a service date.
+    """
+    dates = {}
+    for service, value in graph.subject_objects(SNU.date):
+        if (service, RDF.type, SNU.MealService) not in graph:
+            continue
+        try:
+            dates[service] = date.fromisoformat(str(value))
+        except ValueError:
+            continue
+    for item, service in graph.subject_objects(SNU.partOfService):
+        if service in dates:
+            dates[item] = dates[service]
+    return dates
+
+
+def split_by_date(graph):
+    """
+    Splits a graph into (static triples, {date: triples}). Triples about a
+    MealService or MenuItem, and links to one (a Venue's :offers), go to the
+    partition of its date; the TBox, Venues and everything else stay static.
+    """
+    dates = service_dates(graph)
+    static, partitions = [], defaultdict(list)
+    for s, p, o in graph:
+        day = dates.get(s) or dates.get(o)
+        if day is None:
+            static.append((s, p, o))
+        else:
+            partitions[day].append((s, p, o))
+    return static, dict(partitions)
+
+
+def _week(day, offset=0):
+    monday = day - timedelta(days=day.weekday()) + timedelta(weeks=offset)
+    return monday, monday + timedelta(days=6)
+
+
+def _month(day, offset=0):
+    month = day.month - 1 + offset
+    first = date(day.year + month // 12, month % 12 + 1, 1)
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+def date_window(question, today):
+    """
+    Returns the (first, last) dates a question refers to ("오늘", "어제",
+    "이번 주 금요일", "지난달", "1월 15일", "2026-01-15", "최근 3일", ...),
+    or None when it does not imply a date.
+    """
+    text = re.sub(r"\s+", "", question.lower())
+
+    match = re.search(r"(\d{4})-(\d{1,2})-(\d{1,2})", text)
+    if match:
+        try:
+            day = date(*map(int, match.groups()))
+        except ValueError:
+            return None
+        return day, day
+    match = (re.search(r"(\d{1,2})월(\d{1,2})일", text) or
+             re.search(rf"(?<![\d/])(\d{{1,2}})/(\d{{1,2}})(?=(?:{SLASH_DATE_CONTEXT}))", text))
+    if match:
+        try:
+            day = date(today.year, *map(int, match.groups()))
+        except ValueError:
+            return None
+        return day, day
+
+    match = re.search(r"(?:최근|지난)(\d+)일", text)
+    if match:
+        return today - timedelta(days=int(match.group(1)) - 1), today
+
+    week = 0
+    if re.search(r"지난주|저번주|lastweek", text):
+        week = -1
+    elif re.search(r"다음주|nextweek", text):
+        week = 1
+    match = re.search(rf"([{WEEKDAYS}])요일", text)
+    if match:
+        day = _week(today, week)[0] + timedelta(days=WEEKDAYS.index(match.group(1)))
+        return day, day
+    if re.search(r"주말|weekend", text):
+        saturday = _week(today, week)[0] + timedelta(days=5)
+        return saturday, saturday + timedelta(days=1)
+    if week or re.search(r"이번주|금주|thisweek", text):
+        return _week(today, week)
+
+    if re.search(r"지난달|저번달|lastmonth", text):
+        return _month(today, -1)
+    if re.search(r"이번달|thismonth", text):
+        return _month(today)
+
+    for pattern, offset in ((r"그저께|그제", -2), (r"어제|yesterday", -1), (r"모레", 2),
+                            (r"내일|tomorrow", 1), (r"오늘|today|tonight|지금|now", 0)):
+        if re.search(pattern, text):
+            day = today + timedelta(days=offset)
+            return day, day
+    return None
+
+
+class PartitionedGraph:
+    """
+    The merged TBox + ABox graph stored as an rdflib Dataset: a static named
+    graph (TBox, Venues) and one named graph per service date.
+
+    Partitions older than retention_days before the newest date are
+    written to archive_dir as N-Triples and dropped from the Dataset; view()
+    parses them back only for a window that reaches them. Views (static +
+    the window's partitions) are plain Graphs with their own version, columnar
+    projection and text index, so execute_sparql() and its caches work unchanged.
+    """
+
+    def __init__(self, graph, version, archive_dir=None, retention_days=None, today=None,
+                 view_cache_size=VIEW_CACHE_SIZE):
+        self.version = version
+        self.archive_dir = os.path.join(str(archive_dir), version[:16]) if archive_dir else None
+        self.namespaces = list(graph.namespaces())
+        self.dataset = Dataset()
+        self.static = self.dataset.graph(STATIC_GRAPH)
+
+        static, partitions = split_by_date(graph)
+        self.static.addN((s, p, o, self.static) for s, p, o in static)
+        del static
+        self._today = today
+        self.partitions = {}
+        self.archived = {}
+
+        newest = max(partitions, default=None) or self.today
+        cutoff = newest - timedelta(days=retention_days) if retention_days is not None and archive_dir else None
+        for day in sorted(partitions):
+            # Each date's triples are dropped once copied into the Dataset or archive
+            triples = partitions.pop(day)
+            if cutoff is not None and day < cutoff:
+                self.archived[day] = self._archive(day, triples)
+            else:
+                named = self.dataset.graph(partition_graph_id(day))
+                named.addN((s, p, o, named) for s, p, o in triples)
+                self.partitions[day] = named
+
+        self._views = OrderedDict()
+        self._view_cache_size = view_cache_size
+        self._lock = threading.Lock()
+
+    def _archive(self, day, triples):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{day.isoformat()}.nt")
+        if not os.path.exists(path):
+            archived = Graph()
+            archived.addN((s, p, o, archived) for s, p, o in triples)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            archived.serialize(destination=tmp_path, format="nt", encoding="utf-8")
+            os.replace(tmp_path, path)
+        return path
+
+    @property
+    def today(self):
+        """
+        The date "오늘" refers to: the given date, else today in LOCAL_TIMEZONE
+        (the clock :openAt uses), even when its menus are not loaded.
+        """
+        return self._today or local_today()
+
+    def dates(self):
+        return sorted(set(self.partitions) | set(self.archived))
+
+    def window(self, question):
+        """
+        The (first, last) dates the question refers to, or None.
+        """
+        return date_window(question, self.today)
+
+    def view(self, window=None):
+        """
+        A Graph of the static data plus the partitions in window (first, last),
+        loading archived ones from disk. Without a window: the retained partitions.
+        """
+        if window is None:
+            days = tuple(sorted(self.partitions))
+        else:
+            first, last = window
+            days = tuple(day for day in self.dates() if first <= day <= last)
+
+        with self._lock:
+            view = self._views.get(days)
+            record_cache("partition_view", view is not None)
+            if view is not None:
+                self._views.move_to_end(days)
+                return view
+
+            with span("partition_view", partitions=len(days)):
+                view = Graph()
+                for prefix, namespace in self.namespaces:
+                    view.bind(prefix, namespace, override=True, replace=True)
+                view += self.static
+                loaded = 0
+                for day in days:
+                    if day in self.partitions:
+                        view += self.partitions[day]
+                    else:
+                        view.parse(self.archived[day], format="nt")
+                        loaded += 1
+                annotate(archived_loaded=loaded, triples=len(view))
+                if loaded:
+                    print(f"Loaded {loaded} archived partition(s) for {days[0]}..{days[-1]}")
+
+                register_version(view, f"{self.version}|{','.join(d.isoformat() for d in days)}")
+                build_projection(view)
+                build_text_index(view)
+
+            self._views[days] = view
+            while len(self._views) > self._view_cache_size:
+                self._views.popitem(last=False)
+            return view
+
+    def graph_for(self, question):
+        """
+        The view a question should be answered from: its date window if it
+        implies one, else the retained partitions.
+        """
+        return self.view(self.window(question))
+
+
+def partition(graph, archive_dir=None, retention_days=None, today=None):
+    """
+    PartitionedGraph of a graph from load_graph().
+    """
+    version = graph_version(graph) or "unversioned"
+    return PartitionedGraph(graph, version, archive_dir, retention_days, today)
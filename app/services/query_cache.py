@@ -0,0 +1,176 @@
+import re
+import threading
+from collections import OrderedDict
+
+# Lexical tokens of a SPARQL query; order matters where alternatives share a prefix.
+_TOKEN = re.compile(
+    r'(?P<comment>\#[^\n]*)'
+    r'|(?P<string>"""(?:[^"\\]|\\.|"(?!""))*"""' r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    r'|"(?:[^"\\\n]|\\.)*"' r"|'(?:[^'\\\n]|\\.)*')"
+    r'|(?P<iri><[^<>"{}|^`\\\s]*>)'
+    r'|(?P<var>[?$]\w+)'
+    r'|(?P<pname>(?:[^\W\d][\w\-.]*)?:(?:[\w\-.]*[\w\-])?)'
+    r'|(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)'
+    r'|(?P<word>[^\W\d]\w*)'
+    r'|(?P<ws>\s+)'
+    r'|(?P<other>.)',
+    re.DOTALL,
+)
+
+# Case-insensitive SPARQL keywords and builtins ("a", true and false are case-sensitive)
+_KEYWORDS = {
+    "select", "construct", "describe", "ask", "where", "from", "named", "prefix", "base",
+    "distinct", "reduced", "optional", "filter", "union", "minus", "graph", "service", "bind",
+    "values", "as", "order", "by", "asc", "desc", "limit", "offset", "group", "having", "not",
+    "exists", "in", "undef", "count", "sum", "min", "max", "avg", "sample", "group_concat",
+    "separator", "str", "lang", "langmatches", "datatype", "bound", "iri", "uri", "bnode",
+    "strlen", "substr", "ucase", "lcase", "strstarts", "strends", "contains", "strbefore",
+    "strafter", "concat", "replace", "regex", "abs", "round", "ceil", "floor", "year", "month",
+    "day", "hours", "minutes", "seconds", "now", "coalesce", "if", "sameterm", "isiri",
+    "isuri", "isblank", "isliteral", "isnumeric", "strdt", "strlang",
+}
+
+# Builtins whose value changes between runs of the same query
+_VOLATILE = {"now", "rand", "uuid", "struuid", "bnode"}
+
+
+def is_volatile(query):
+    """
+    True if the query calls NOW(), RAND() or another builtin that makes its
+    results differ between runs, so they must not be cached.
+    """
+    return any(match.lastgroup == "word" and match.group().lower() in _VOLATILE
+               for match in _TOKEN.finditer(query))
+
+
+def canonicalize(query, namespaces=None):
+    """
+    Reduces a query to a cache key that ignores whitespace, comments, keyword case,
+    prefix labels and variable names.
+
+    Returns (key, names) where names maps each original variable name to its
+    canonical name (v0, v1, ... in order of first use), so cached rows can be
+    renamed back to the caller's variables.
+    """
+    prefixes = {prefix: str(iri) for prefix, iri in (namespaces or {}).items()}
+    tokens = []
+    for match in _TOKEN.finditer(query):
+        kind = match.lastgroup
+        if kind not in ("ws", "comment"):
+            tokens.append((kind, match.group()))
+
+    # PREFIX declarations only occur in the prologue, so they can be dropped as
+    # they are read and every later prefixed name expanded to its full IRI.
+    body = []
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        if (kind == "word" and text.lower() == "prefix" and i + 2 < len(tokens)
+                and tokens[i + 1][0] == "pname" and tokens[i + 2][0] == "iri"):
+            prefixes[tokens[i + 1][1][:-1]] = tokens[i + 2][1][1:-1]
+            i += 3
+            continue
+        body.append((kind, text))
+        i += 1
+
+    names = {}
+    out = []
+    for kind, text in body:
+        if kind == "var":
+            name = text[1:]
+            if name not in names:
+                names[name] = f"v{len(names)}"
+            out.append("?" + names[name])
+        elif kind == "pname":
+            prefix, local = text.split(":", 1)
+            if prefix in prefixes:
+                out.append(f"<{prefixes[prefix]}{local}>")
+            else:
+                out.append(text)
+        elif kind == "word" and text.lower() in _KEYWORDS:
+            out.append(text.upper())
+        else:
+            out.append(text)
+    return " ".join(out), names
+
+
+def _rows_size(rows):
+    """
+    Rough memory footprint of a result set of string dictionaries, in bytes.
+    """
+    size = 64
+    for row in rows:
+        size += 232
+        for key, value in row.items():
+            size += 2 * (len(key) + len(str(value))) + 100
+    return size
+
+
+def _rename(rows, mapping):
+    return [{mapping.get(key, key): value for key, value in row.items()} for row in rows]
+
+
+class QueryResultCache:
+    """
+    Thread-safe LRU of execute_sparql() results bounded by entry count and an
+    approximate byte budget. Entries are keyed by the canonical query plus the
+    graph version, so regenerating the ABox makes old entries unreachable.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version, names):
+        """
+        Returns a fresh copy of the cached rows with the caller's variable names, or None.
+        """
+        with self._lock:
+            entry = self._entries.get((version, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((version, key))
+            self.hits += 1
+            rows = entry[0]
+        return _rename(rows, {canonical: original for original, canonical in names.items()})
+
+    def put(self, key, version, names, rows):
+        stored = _rename(rows, names)
+        size = _rows_size(stored)
+        # A single huge result would flush everything else; not worth caching.
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop((version, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[(version, key)] = (stored, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,294 @@
+import threading
+from collections import defaultdict
+
+from rdflib import BNode, Literal, RDF, URIRef, Variable, XSD
+from rdflib.plugins.sparql import CUSTOM_EVALS
+from rdflib.plugins.sparql.evaluate import evalBGP
+from rdflib.plugins.sparql.parserutils import CompValue
+
+from app.services.graph_snapshot import GraphRegistry
+from app.services.graph_stats import SNU, stats_for
+
+# Equality filters matching more distinct literals than this are left as filters
+PUSHDOWN_MAX_TERMS = 16
+# CUSTOM_EVALS key of the evaluator that keeps a BGP's triple order
+ORDERED_BGP_EVAL = "snu_ordered_bgp"
+
+_values = GraphRegistry()
+_values_lock = threading.Lock()
+
+
+def _literals_by_text(graph, prop):
+    """
+    {lexical form: [literal terms]} of the objects of prop, built once per graph and property.
+    """
+    by_prop = _values.get(graph)
+    if by_prop is None:
+        with _values_lock:
+            by_prop = _values.get(graph)
+            if by_prop is None:
+                by_prop = {}
+                _values[graph] = by_prop
+    found = by_prop.get(prop)
+    if found is None:
+        found = defaultdict(list)
+        for value in set(graph.objects(None, prop)):
+            if isinstance(value, Literal):
+                found[str(value)].append(value)
+        by_prop[prop] = found = dict(found)
+    return found
+
+
+# --- Equality pushdown ------------------------------------------------------
+
+def _string_constant(term):
+    return isinstance(term, Literal) and term.language is None and term.datatype in (None, XSD.string)
+
+
+def _target(expr):
+    """
+    The variable of ?x or STR(?x); None for anything else.
+    """
+    if isinstance(expr, CompValue) and expr.name == "Builtin_STR":
+        expr = expr.arg
+    return expr if isinstance(expr, Variable) else None
+
+
+def _equality(expr):
+    """
+    (var, {texts}) of STR(?x) = "...", ?x = "..." (either side) or
+    ?x IN ("...", ...); None for anything else.
+    """
+    if not isinstance(expr, CompValue) or expr.name != "RelationalExpression":
+        return None
+    if expr.op == "=":
+        for left, right in ((expr.expr, expr.other), (expr.other, expr.expr)):
+            var = _target(left)
+            if var is not None and _string_constant(right):
+                return var, {str(right)}
+    elif expr.op == "IN":
+        var = _target(expr.expr)
+        if var is not None and expr.other and all(_string_constant(term) for term in expr.other):
+            return var, {str(term) for term in expr.other}
+    return None
+
+
+def _equalities(expr):
+    """
+    [(var, {texts})] for each conjunct of expr that pins a variable to string
+    values, including disjunctions of such conditions on one variable.
+    """
+    if isinstance(expr, CompValue) and expr.name == "ConditionalAndExpression":
+        found = []
+        for part in [expr.expr] + list(expr.other or []):
+            found.extend(_equalities(part))
+        return found
+    if isinstance(expr, CompValue) and expr.name == "ConditionalOrExpression":
+        parts = [_equality(part) for part in [expr.expr] + list(expr.other or [])]
+        if all(parts) and len({var for var, _ in parts}) == 1:
+            return [(parts[0][0], set().union(*(texts for _, texts in parts)))]
+        return []
+    found = _equality(expr)
+    return [found] if found else []
+
+
+def _required_bgp(part, var):
+    """
+    (BGP node, predicate) of a triple binding var as the object of a constant
+    predicate that every solution of part must match: only Join, Filter,
+    Extend and the left side of OPTIONAL are followed.
+    """
+    if not isinstance(part, CompValue):
+        return None
+    if part.name == "BGP":
+        for s, p, o in part.triples:
+            if o == var and isinstance(p, URIRef):
+                return part, p
+        return None
+    if part.name == "Join":
+        return _required_bgp(part.p1, var) or _required_bgp(part.p2, var)
+    if part.name in ("Filter", "Extend", "LeftJoin"):
+        return _required_bgp(part.p if part.name != "LeftJoin" else part.p1, var)
+    return None
+
+
+def _bind_first(parent, key, bgp, var, terms):
+    """
+    Replaces parent[key] (the BGP) by a lazy join that binds var to terms
+    before the BGP is matched.
+    """
+    values = CompValue("values", res=[{var: term} for term in sorted(terms, key=lambda t: (str(t), str(t.datatype)))])
+    join = CompValue("Join", p1=CompValue("ToMultiSet", p=values), p2=bgp, lazy=True)
+    join["_vars"] = set(bgp._vars or ()) | {var}
+    parent[key] = join
+
+
+def _replace_bgp(part, bgp, replace):
+    """
+    Calls replace(parent, key) for the node holding bgp under part.
+    """
+    for key, value in part.items():
+        if value is bgp:
+            replace(part, key)
+            return True
+        if isinstance(value, CompValue) and not key.startswith("_") and _replace_bgp(value, bgp, replace):
+            return True
+    return False
+
+
+def push_down_equalities(query, graph, bound):
+    """
+    Binds the variables of equality FILTERs on string values to the literal
+    terms the graph actually holds for that predicate (xsd:string as written
+    by the ETL, or plain), so the BGP is matched with them in place. The
+    FILTER stays and still decides. Records the variables bound ahead of
+    each BGP in bound; returns the number of pushed-down conditions.
+    """
+    pushed = 0
+    pending = [query.algebra]
+    while pending:
+        node = pending.pop()
+        for key, value in node.items():
+            if isinstance(value, CompValue) and not key.startswith("_"):
+                pending.append(value)
+        if node.name != "Filter":
+            continue
+        for var, texts in _equalities(node.expr):
+            found = _required_bgp(node.p, var)
+            if found is None:
+                continue
+            bgp, prop = found
+            if var in bound.get(id(bgp), ()):
+                continue
+            literals = _literals_by_text(graph, prop)
+            terms = [term for text in texts for term in literals.get(text, ())]
+            if len(terms) > PUSHDOWN_MAX_TERMS:
+                continue
+            if node.p is bgp:
+                _bind_first(node, "p", bgp, var, terms)
+            else:
+                _replace_bgp(node.p, bgp, lambda parent, key: _bind_first(parent, key, bgp, var, terms))
+            bound.setdefault(id(bgp), set()).add(var)
+            pushed += 1
+    return pushed
+
+
+# --- Redundant type patterns and join order ---------------------------------
+
+def drop_implied_types(triples, implied):
+    """
+    The triples without `?x a :C` patterns where another triple on ?x has a
+    predicate whose domain (subject side) or range (object side) is typed C
+    for every resource in the graph.
+    """
+    kept = []
+    for triple in triples:
+        s, p, o = triple
+        if p == RDF.type and isinstance(o, URIRef):
+            cls = str(o)
+            if any(other is not triple and isinstance(other[1], URIRef) and other[1] != RDF.type and (
+                    (other[0] == s and cls in implied.get(str(other[1]), {}).get("subject", ())) or
+                    (other[2] == s and cls in implied.get(str(other[1]), {}).get("object", ())))
+                   for other in triples):
+                continue
+        kept.append(triple)
+    return kept
+
+
+def _is_free(term, bound):
+    return isinstance(term, (Variable, BNode)) and term not in bound
+
+
+def estimate(triple, bound, stats):
+    """
+    Expected matches of a triple pattern once the variables in bound are
+    bound, from the per-predicate triple / distinct subject / distinct object counts.
+    """
+    s, p, o = triple
+    s_free, o_free = _is_free(s, bound), _is_free(o, bound)
+    if _is_free(p, bound):
+        total = stats["triples"]
+        return total if s_free and o_free else total ** 0.5
+    if p == RDF.type and not o_free and not s_free:
+        return 1
+    if p == RDF.type and not o_free and isinstance(o, URIRef) and o.startswith(str(SNU)):
+        return stats["classes"].get(":" + o[len(SNU):], 0)
+    counts = stats["predicates"].get(str(p))
+    if counts is None:
+        return 0
+    if not s_free and not o_free:
+        return 1
+    if not s_free:
+        return counts["triples"] / max(1, counts["subjects"])
+    if not o_free:
+        return counts["triples"] / max(1, counts["objects"])
+    return counts["triples"]
+
+
+def order_triples(triples, stats, bound=()):
+    """
+    Greedy join order: repeatedly the cheapest remaining triple that shares a
+    variable with those already placed (any triple when none does).
+    """
+    bound = set(bound)
+    remaining = list(triples)
+    ordered = []
+    while remaining:
+        connected = [t for t in remaining
+                     if not ordered or any(term in bound for term in t if isinstance(term, (Variable, BNode)))]
+        best = min(connected or remaining, key=lambda t: estimate(t, bound, stats))
+        remaining.remove(best)
+        ordered.append(best)
+        bound.update(term for term in best if isinstance(term, (Variable, BNode)))
+    return ordered
+
+
+def _eval_ordered_bgp(ctx, part):
+    """
+    Evaluates BGPs ordered by optimize_query() in their given order; rdflib
+    would otherwise re-sort them by bound terms alone, which can put
+    unconnected patterns next to each other (a cross product).
+    """
+    if part.name != "BGP" or not part.get("_ordered"):
+        raise NotImplementedError()
+    return evalBGP(ctx, part.triples)
+
+
+def register_evaluator():
+    """
+    Registers the ordered-BGP evaluator with rdflib's SPARQL engine.
+    """
+    CUSTOM_EVALS[ORDERED_BGP_EVAL] = _eval_ordered_bgp
+
+
+register_evaluator()
+
+
+def optimize_query(query, graph, stats=None):
+    """
+    Rewrites a prepared query in place for rdflib's evaluator: equality
+    FILTERs on string values are pushed into the triple patterns, type
+    patterns implied by domain/range are dropped, and every BGP is
+    reordered by estimated selectivity. Returns {"pushed", "dropped",
+    "reordered"} counts.
+    """
+    stats = stats if stats is not None else stats_for(graph)
+    bound = {}
+    changes = {"pushed": push_down_equalities(query, graph, bound), "dropped": 0, "reordered": 0}
+    implied = stats.get("implied_types", {})
+    pending = [query.algebra]
+    while pending:
+        node = pending.pop()
+        for key, value in node.items():
+            if isinstance(value, CompValue) and not key.startswith("_"):
+                pending.append(value)
+        if node.name != "BGP" or not node.triples:
+            continue
+        triples = drop_implied_types(node.triples, implied)
+        changes["dropped"] += len(node.triples) - len(triples)
+        ordered = order_triples(triples, stats, bound.get(id(node), ()))
+        if ordered != node.triples:
+            changes["reordered"] += 1
+        node["triples"] = ordered
+        node["_ordered"] = True
+    return changes
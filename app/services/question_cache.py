@@ -0,0 +1,312 @@
+import os
+import re
+import json
+import threading
+import unicodedata
+
+from rdflib.plugins.sparql import prepareQuery
+
+from app.services.time_index import local_today
+
+SPARQL_PREFIXES = "PREFIX : <http://snu.ac.kr/dining/>\n"
+
+# Prefixes generate_sparql() tells the model it may rely on without declaring them
+DEFAULT_NAMESPACES = {
+    "": "http://snu.ac.kr/dining/",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+}
+
+# Slot lexicons: (regex over the normalized question, value). Negations come first
+# so "안 매운" is consumed before "매운" can match.
+MEAL_TYPES = [
+    (r"아침|조식", "breakfast"),
+    (r"점심", "lunch"),
+    (r"저녁|석식", "dinner"),
+]
+CUISINES = [
+    (r"한식", "Korean"),
+    (r"일식", "Japanese"),
+    (r"양식", "Western"),
+    (r"중국\s*(?:음식|요리)", "Chinese"),
+]
+CARB_TYPES = [
+    (r"면\s*요리|국수|noodle", "Noodle"),
+    (r"빵", "Bread"),
+]
+SPICY = [
+    (r"안\s*매운|맵지\s*않은|매운\s*(?:거|걸|것)\S*\s*못\s*먹\S*", False),
+    (r"매운|매콤\S*", True),
+]
+MEAT = [
+    (r"고기\s*(?:없는|안\s*들어간)|채식", False),
+]
+TAKEOUT = r"테이크\s*아웃|포장"
+CHEAPEST = r"(?:제일|가장)\s*(?:싼|저렴한)|최저가"
+PRICE_LIMIT = r"(\d+)\s*원\s*(이하|미만|까지|안쪽)\S*"
+TIME_AFTER = r"(?:(저녁|오후)\s*)?(\d{1,2})\s*시(?:\s*(\d{1,2})\s*분|\s*반)?\s*(?:이후|넘어서|후)\S*"
+MENU_INTENT = r"메뉴|뭐|추천"
+# "지금" keeps the services open at NOW(); "오늘" the services of today's date
+NOW = r"지금"
+TODAY = r"오늘"
+
+# Words that carry no constraint once the slots are taken out of the question
+FILLERS = {
+    "식당", "곳", "어디", "어디야", "어디로", "있어", "있나", "있을까", "알려줘",
+    "찾아줘", "추천해줘", "먹을", "수", "있는", "메뉴", "뭐", "뭐야", "되는", "식사", "먹고",
+    "싶은데", "가면", "돼", "나", "걸로", "거", "중에", "나온", "파는", "근처", "그런", "땡기는데",
+    "게", "식단", "밥", "먹을수", "하는", "좀", "요리", "음식", "학식",
+}
+PARTICLES = ("에서는", "에서", "에는", "으로", "에도", "에", "은", "는", "이", "가", "을", "를", "로", "도", "의", "야", "요")
+
+
+def normalize_question(question):
+    """
+    Canonical form of a question for exact matching: NFKC, lower case, thousands
+    separators removed, punctuation dropped and whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = re.sub(r"(?<=\d),(?=\d{3})", "", text)
+    text = re.sub(r"[^\w\s:~-]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_valid_sparql(query):
+    try:
+        prepareQuery(query, initNs=DEFAULT_NAMESPACES)
+        return True
+    except Exception:
+        return False
+
+
+def load_venue_gazetteer(venues_path):
+    """
+    Returns [(phrase, property, value)] for venue slot filling, longest phrase first.
+    Building names match :building, venue ids match :name.
+    """
+    entries = {}
+    if not os.path.exists(venues_path):
+        return []
+    with open(venues_path, "r") as f:
+        venues = json.load(f).get("venues", [])
+    for v in venues:
+        if v.get("venue_id"):
+            phrase = normalize_question(v["venue_id"])
+            entries[phrase] = (phrase, "name", v["venue_id"])
+        building = v.get("building")
+        if building and not building.endswith("근처"):
+            # "301동 (제1공학관)" -> "301동"
+            short = re.split(r"\s*\(", building)[0].strip()
+            phrase = normalize_question(short)
+            entries.setdefault(phrase, (phrase, "building", short))
+    return sorted(entries.values(), key=lambda e: -len(e[0]))
+
+
+class _SlotReader:
+    """
+    Pulls slot values out of a normalized question and keeps the unmatched rest.
+    """
+
+    def __init__(self, text):
+        self.rest = f" {text} "
+
+    def take(self, pattern):
+        match = re.search(pattern, self.rest)
+        if match is None:
+            return None
+        self.rest = self.rest[:match.start()] + " " + self.rest[match.end():]
+        return match
+
+    def take_one_of(self, lexicon):
+        """
+        Returns the value of the only lexicon entry present, None if none is,
+        and raises ValueError if the question names several different values.
+        """
+        found = set()
+        for pattern, value in lexicon:
+            while self.take(pattern) is not None:
+                found.add(value)
+        if len(found) > 1:
+            raise ValueError("conflicting slot values")
+        return found.pop() if found else None
+
+    def leftover_words(self):
+        words = []
+        for word in self.rest.split():
+            for particle in PARTICLES:
+                if word.endswith(particle) and len(word) > len(particle) and word[:-len(particle)] in FILLERS:
+                    word = word[:-len(particle)]
+                    break
+            if word not in FILLERS:
+                words.append(word)
+        return words
+
+
+def match_template(question, gazetteer, today=None):
+    """
+    Fills the MenuItem/MealService/Venue query template from the question's slots
+    (meal type, price limit, cuisine, carb type, spiciness, meat, take-out, venue,
+    time, now / today). Returns None unless every word of the question is accounted for.
+    """
+    reader = _SlotReader(normalize_question(question))
+    try:
+        spicy = reader.take_one_of(SPICY)
+        no_meat = reader.take_one_of(MEAT)
+        meal = reader.take_one_of(MEAL_TYPES) if not re.search(TIME_AFTER, reader.rest) else None
+        time_after = reader.take(TIME_AFTER)
+        if meal is None:
+            meal = reader.take_one_of(MEAL_TYPES)
+        cuisine = reader.take_one_of(CUISINES)
+        carb = reader.take_one_of(CARB_TYPES)
+    except ValueError:
+        return None
+    takeout = reader.take(TAKEOUT) is not None
+    cheapest = reader.take(CHEAPEST) is not None
+    price = reader.take(PRICE_LIMIT)
+    venue = None
+    for phrase, prop, value in gazetteer:
+        if reader.take(re.escape(phrase)) is not None:
+            venue = (prop, value)
+            break
+    now = reader.take(NOW) is not None
+    on_today = reader.take(TODAY) is not None
+    menu_intent = re.search(MENU_INTENT, reader.rest) is not None
+
+    if reader.leftover_words():
+        return None
+
+    item_slots = any(v is not None for v in (spicy, no_meat, cuisine, carb, price)) or takeout or cheapest
+    service_slots = meal is not None or time_after is not None or venue is not None
+    if not item_slots and not service_slots:
+        return None
+
+    service_patterns = ["?service :providedAt ?venue .", "?venue :name ?venueName ."]
+    if meal:
+        service_patterns.append(f'?service :mealType ?mealType . FILTER(STR(?mealType) = "{meal}")')
+    if time_after:
+        half, hour, minute = time_after.group(1), int(time_after.group(2)), time_after.group(3)
+        minute = int(minute) if minute else (30 if "반" in time_after.group(0) else 0)
+        if (half or meal == "dinner") and hour < 12:
+            hour += 12
+        service_patterns.append(f'FILTER(:openAfter(?service, "{hour:02d}:{minute:02d}"))')
+    if on_today:
+        day = (today or local_today()).isoformat()
+        service_patterns.append(f'?service :date ?serviceDate . FILTER(STR(?serviceDate) = "{day}")')
+    if now:
+        service_patterns.append("FILTER(:openAt(?service, NOW()))")
+    if venue:
+        prop, value = venue
+        service_patterns.append(f'?venue :{prop} ?venueKey . FILTER(CONTAINS(?venueKey, "{value}"))')
+
+    if not item_slots and not menu_intent:
+        body = "\n  ".join(["?service a :MealService ."] + service_patterns)
+        return f"{SPARQL_PREFIXES}SELECT DISTINCT ?venueName WHERE {{\n  {body}\n}}"
+
+    with_price = price is not None or cheapest
+    item_patterns = ["?menu a :MenuItem ; :menuName ?menuName ; :partOfService ?service ."]
+    if with_price:
+        item_patterns.append("?menu :price ?price .")
+    if price:
+        op = "<=" if price.group(2) in ("이하", "까지", "안쪽") else "<"
+        item_patterns.append(f"FILTER(?price {op} {int(price.group(1))})")
+    if cuisine:
+        item_patterns.append(f'?menu :cuisineType ?cuisineType . FILTER(STR(?cuisineType) = "{cuisine}")')
+    if carb:
+        item_patterns.append(f'?menu :carbType ?carbType . FILTER(STR(?carbType) = "{carb}")')
+    if spicy is not None:
+        item_patterns.append(f"?menu :isSpicy {'true' if spicy else 'false'} .")
+    if no_meat is not None:
+        item_patterns.append("?menu :containsMeat false .")
+    if takeout:
+        item_patterns.append('?menu :consumptionMode ?mode . FILTER(STR(?mode) = "Takeout")')
+
+    projection = "?venueName ?menuName ?price" if with_price else "?venueName ?menuName"
+    body = "\n  ".join(item_patterns + service_patterns)
+    query = f"{SPARQL_PREFIXES}SELECT DISTINCT {projection} WHERE {{\n  {body}\n}}"
+    if cheapest:
+        query += "\nORDER BY ASC(?price)\nLIMIT 1"
+    return query
+
+
+class QuestionCache:
+    """
+    Question -> SPARQL lookup in front of the LLM: normalized exact matches
+    (persisted as JSON, each for the graph version it was answered on) first,
+    then slot-filled templates.
+    """
+
+    def __init__(self, path, venues_path, max_entries=1000):
+        self.path = path
+        self.venues_path = venues_path
+        self.max_entries = max_entries
+        self._entries = None
+        self._gazetteer = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r") as f:
+                        self._entries = json.load(f)
+                except Exception as e:
+                    print(f"Error loading question cache {self.path}: {e}")
+            self._gazetteer = load_venue_gazetteer(self.venues_path)
+
+    def match(self, question, version=None):
+        """
+        Returns (query, source) with source "exact" or "template", or (None, None).
+        Exact entries are only used for the graph version they were promoted on.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is not None and entry.get("version") == version:
+                entry["hits"] = entry.get("hits", 0) + 1
+                return entry["sparql"], "exact"
+            gazetteer = self._gazetteer
+
+        query = match_template(question, gazetteer)
+        if query is not None and is_valid_sparql(query):
+            return query, "template"
+        return None, None
+
+    def promote(self, question, query, version=None, source="llm"):
+        """
+        Stores a query that answered the question on graph version, unless the
+        question is already answered by a template or the same entry, and
+        persists the cache. Entries of other versions are dropped, then the
+        least used ones beyond max_entries.
+        """
+        if not query or not is_valid_sparql(query):
+            return False
+        key = normalize_question(question)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is not None and entry.get("version") == version and entry["sparql"] == query:
+                return False
+            if match_template(question, self._gazetteer) is not None:
+                return False
+            self._entries = {k: e for k, e in self._entries.items() if e.get("version") == version}
+            self._entries.pop(key, None)
+            self._entries[key] = {"question": question, "sparql": query, "source": source,
+                                  "version": version, "hits": 0}
+            excess = len(self._entries) - self.max_entries
+            if excess > 0:
+                # Fewest hits first; ties keep the newest
+                for stale in sorted(self._entries, key=lambda k: self._entries[k].get("hits", 0))[:excess]:
+                    del self._entries[stale]
+            self._save()
+        return True
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
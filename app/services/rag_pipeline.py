@@ -1,20 +1,40 @@
 import os
 import re
 import json
-import google.generativeai as genai
+import time
 import rdflib
 from rdflib import RDF, RDFS, OWL
+from rdflib.plugins.sparql import prepareQuery
 
 # Configuration
 import sys
 # Ensure we can import config relative to project root if running as module
 try:
-    from config import TBOX_PATH, ABOX_INFERRED_PATH, MODEL_NAME, PROJECT_ROOT
+    from config import TBOX_PATH, ABOX_INFERRED_PATH, GRAPH_SNAPSHOT_PATH, MODEL_NAME, PROJECT_ROOT
+    from config import RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES
+    from config import QUESTION_CACHE_PATH, QUESTION_CACHE_MAX_ENTRIES, VENUES_LOCATION_JSON_PATH
+    from config import SPARQL_EXAMPLES_PATH, SCHEMA_MAX_EXAMPLES, GRAPH_STATS_PATH, QUERY_OPTIMIZER
 except ImportError:
     # Fallback if running directly or path issues, try to add root
     # Current file: app/services/rag_pipeline.py -> Project Root: ../..
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-    from config import TBOX_PATH, ABOX_INFERRED_PATH, MODEL_NAME, PROJECT_ROOT
+    from config import TBOX_PATH, ABOX_INFERRED_PATH, GRAPH_SNAPSHOT_PATH, MODEL_NAME, PROJECT_ROOT
+    from config import RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES
+    from config import QUESTION_CACHE_PATH, QUESTION_CACHE_MAX_ENTRIES, VENUES_LOCATION_JSON_PATH
+    from config import SPARQL_EXAMPLES_PATH, SCHEMA_MAX_EXAMPLES, GRAPH_STATS_PATH, QUERY_OPTIMIZER
+
+from app.services.graph_snapshot import snapshot_key, load_snapshot, save_snapshot, register_version, graph_version
+from app.services.columnar import build_projection, try_execute
+from app.services.geo_index import SPATIAL_FUNCTIONS_DOC
+from app.services.time_index import TIME_FUNCTIONS_DOC
+from app.services.text_index import TEXT_FUNCTIONS_DOC, build_text_index, rewrite_text_filters
+from app.services.graph_stats import stats_for, format_stats
+from app.services.query_optimizer import optimize_query
+from app.services.schema_selector import SchemaCatalog, TERM_REQUIREMENTS, load_examples
+from app.services.query_cache import QueryResultCache, canonicalize, is_volatile
+from app.services.question_cache import QuestionCache
+from app.services.llm_backend import get_backend
+from app.services.tracing import traced, span, annotate, record_cache
 
 ENV_PATH = os.path.join(PROJECT_ROOT, ".env")
 
@@ -27,38 +47,82 @@ if os.path.exists(ENV_PATH):
                 key, value = line.split("=", 1)
                 os.environ[key.strip()] = value.strip()
 
-API_KEY = os.environ.get("GOOGLE_API_KEY")
-# MODEL_NAME is imported from config
+# MODEL_NAME is imported from config; the backend (Gemini, stand-in server or
+# replay) is chosen by config.LLM_BACKEND and created on first use
+
+# Shared by all sessions; keyed by canonical query + graph version
+result_cache = QueryResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES)
 
-if API_KEY:
-    genai.configure(api_key=API_KEY)
+# Answers repeated and template-shaped questions without a model round trip
+question_cache = QuestionCache(QUESTION_CACHE_PATH, VENUES_LOCATION_JSON_PATH, QUESTION_CACHE_MAX_ENTRIES)
 
+# Validated question -> SPARQL pairs used as few-shot examples
+sparql_examples = load_examples(SPARQL_EXAMPLES_PATH)
 
-def load_graph():
+
+@traced("load_graph")
+def load_graph(use_snapshot=True, build_indexes=True):
     """
     Loads TBox and ABox into an rdflib Graph.
     Expected paths are defined in config.py
+
+    With use_snapshot, a pickled copy of the merged graph is reused while the
+    content hashes of both Turtle files are unchanged, and rebuilt otherwise.
+    build_indexes=False skips the columnar projection and text index, for
+    callers that only split the graph into partitions with their own.
     """
+    key = snapshot_key(TBOX_PATH, ABOX_INFERRED_PATH)
+    if use_snapshot:
+        g = load_snapshot(GRAPH_SNAPSHOT_PATH, key)
+        if g is not None:
+            print(f"Loaded graph snapshot from {GRAPH_SNAPSHOT_PATH}. Total triples: {len(g)}")
+            annotate(snapshot=True, triples=len(g))
+            register_version(g, key)
+            if build_indexes:
+                build_projection(g)
+                build_text_index(g)
+            return g
+
     g = rdflib.Graph()
+    parsed = True
     
     try:
         g.parse(str(TBOX_PATH), format="turtle")
         print(f"Loaded TBox from {TBOX_PATH}: {len(g)} triples so far")
     except Exception as e:
+        parsed = False
         print(f"Error loading TBox: {e}")
 
     try:
         g.parse(str(ABOX_INFERRED_PATH), format="turtle")
         print(f"Loaded ABox from {ABOX_INFERRED_PATH}. Total triples: {len(g)}")
     except Exception as e:
+        parsed = False
         print(f"Error loading ABox: {e}")
+
+    # Never persist a partial graph; the next start should retry the parse.
+    if use_snapshot and parsed:
+        save_snapshot(g, GRAPH_SNAPSHOT_PATH, key)
+
+    if parsed:
+        register_version(g, key)
+
+    annotate(snapshot=False, triples=len(g))
+
+    if build_indexes:
+        # Columnar view of MenuItem/MealService/Venue for the execute_sparql fast path
+        build_projection(g)
+        # Name n-gram index for CONTAINS / :textMatch filters left to rdflib
+        build_text_index(g)
     
     return g
 
 
-def extract_schema_info(graph):
+@traced("schema_extraction")
+def extract_schema_info(graph, stats=None):
     """
-    Extracts classes, properties, and sample triples to describe the graph structure.
+    Extracts classes, properties, and sample triples to describe the graph structure,
+    plus the value statistics (stats_for(graph) unless given).
     Returns a string summary.
     """
     # Classes
@@ -75,47 +139,11 @@ def extract_schema_info(graph):
     for s, p, o in graph.triples((None, RDF.type, OWL.DatatypeProperty)):
         properties.add(s.n3(graph.namespace_manager))
 
-    # Sample Relations (avoiding type definitions to see actual data links)
-    relations = []
-    q = """
-    SELECT ?s ?p ?o
-    WHERE {
-        ?s ?p ?o .
-        FILTER (?p != rdf:type)
-        FILTER (!isLiteral(?o)) 
-    }
-    LIMIT 5
-    """
-    try:
-        for row in graph.query(q):
-            s_str = row.s.n3(graph.namespace_manager)
-            p_str = row.p.n3(graph.namespace_manager)
-            o_str = row.o.n3(graph.namespace_manager)
-            relations.append(f"{s_str} {p_str} {o_str}")
-    except Exception as e:
-        print(f"Error sampling relations: {e}")
-
-    # [NEW] Extract unique values for Categorical Properties
-    categorical_info = ""
-    cat_properties = [":mealType", ":cuisineType"] # Add more if needed like :cuisineType
-    
-    for prop in cat_properties:
-        try:
-            q_cat = f"""
-            SELECT DISTINCT ?val
-            WHERE {{
-                ?s {prop} ?val .
-            }}
-            LIMIT 10
-            """
-            values = []
-            for row in graph.query(q_cat):
-                 values.append(str(row.val))
-            
-            if values:
-                categorical_info += f"\nUnique Values for {prop}: {json.dumps(values, ensure_ascii=False)}"
-        except Exception as e:
-            print(f"Error extracting values for {prop}: {e}")
+    # Sample relations and value statistics are computed once per graph
+    # version and persisted, so no query runs here
+    if stats is None:
+        stats = stats_for(graph, GRAPH_STATS_PATH)
+    relations = stats.get("relations", [])
 
     schema_info = f"""
 ## Classes
@@ -127,79 +155,119 @@ def extract_schema_info(graph):
 ## Sample Relations
 {chr(10).join(relations) if relations else "No relations found"}
 
-## Categorical Values
-{categorical_info}
-"""
+{format_stats(stats)}
+
+## Spatial Functions
+{SPATIAL_FUNCTIONS_DOC}
+## Time Functions
+{TIME_FUNCTIONS_DOC}
+## Text Functions
+{TEXT_FUNCTIONS_DOC}"""
+    annotate(schema_chars=len(schema_info))
     return schema_info
 
-def generate_sparql(question, schema_info):
+
+def build_schema_catalog(graph, stats=None):
     """
-    Generates a SPARQL query based on the question and schema info using Gemini.
+    SchemaCatalog over the graph's schema, value statistics and the example
+    library, for prompts pruned to each question.
     """
-    if not API_KEY:
-        raise ValueError("GOOGLE_API_KEY is not set.")
+    if stats is None:
+        stats = stats_for(graph, GRAPH_STATS_PATH)
+    return SchemaCatalog(graph, extract_schema_info(graph, stats), sparql_examples,
+                         SPATIAL_FUNCTIONS_DOC + TIME_FUNCTIONS_DOC + TEXT_FUNCTIONS_DOC,
+                         max_examples=SCHEMA_MAX_EXAMPLES, stats=stats)
 
-    model = genai.GenerativeModel(MODEL_NAME)
-    
-    prompt = f"""
-    You are an expert in SPARQL and Ontologies.
-    Convert the following natural language question into a SPARQL 1.1 query.
-    Use the provided Schema Information to understand the classes, properties, and valid values.
-    
-    # Schema Information
-    {schema_info}
-    
-    # Prefixes
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    PREFIX owl: <http://www.w3.org/2002/07/owl#>
-    PREFIX : <http://snu.ac.kr/dining/>
-    
-    # Question
-    {question}
-    
-    # Requirements
-    - Return ONLY the SPARQL query code.
-    - Do not include markdown code blocks (```sparql ... ```).
-    - Use only the classes and properties defined in the schema if possible.
-    - For names (venues, menus), ALWAYS query the `:name` or `:menuName` property and filter it. Do NOT filter the Subject URI.
-    - Check "Categorical Values" in schema to map terms like "Morning" -> "breakfast".
-    - When checking categorical values (e.g. mealType), use `FILTER(STR(?var) = "value")` to avoid literal type mismatches.
-    - CRITICAL: The path from Venue to Menu is: `?venue :offers ?service . ?service :hasMenu ?menuItem`. Use this path.
-    - If the user asks about a general concept (e.g., "Engineering Zone"), rely on 'partOf' relationships or specific building names if you can infer them.
-
-    # User Question Examples (Few-Shot)
-    
-    User: "301동 식당 알려줘" (Venue Name Search)
-    SPARQL:
-    SELECT ?v WHERE {{
-      ?v a :Venue ;
-         :building ?b .
-      FILTER(CONTAINS(?b, "301"))
-    }}
-
-    User: "아침 먹을 수 있는 곳" (Categorical Filter)
-    SPARQL:
-    SELECT ?vName WHERE {{
-      ?s a :MealService ;
-         :mealType "breakfast" ;  # Inferred from schema values
-         :providedAt ?Venue .
-      ?Venue :name ?vName .
-    }}
-    
-    User: "5000원 이하 메뉴" (Numeric Filter)
-    SPARQL:
-    SELECT ?mName ?price WHERE {{
-       ?m a :MenuItem ;
-          :price ?price ;
-          :menuName ?mName .
-       FILTER(?price <= 5000)
-    }}
+def generate_sparql(question, schema_info, version=None):
     """
-    
+    Generates a SPARQL query based on the question and schema info.
+
+    Exact repeats (promoted on the same graph version) and slot-filled template
+    matches come from the question cache; everything else goes to Gemini.
+    """
+    with span("generate_sparql", question_chars=len(question)):
+        query, source = question_cache.match(question, version)
+        record_cache("question", query is not None)
+        if query is not None:
+            print(f"SPARQL from question cache ({source})")
+            annotate(source=source, response_chars=len(query))
+            return query
+
+        annotate(source="llm")
+        return _generate_sparql_llm(question, schema_info)
+
+
+def remember_sparql(question, query, rows, version):
+    """
+    Promotes a generated query into the question cache once it returned rows
+    on graph version, so the next ask skips the model.
+    """
+    if not rows or version is None:
+        return False
+    return question_cache.promote(question, query, version)
+
+
+def _format_examples(examples):
+    return "\n\n".join(f'User: "{example.question}"\nSPARQL:\n{example.sparql}' for example in examples)
+
+
+def sparql_prompt(question, schema_info):
+    """
+    The SPARQL generation prompt. A SchemaCatalog contributes only the schema
+    terms, requirement lines and few-shot examples relevant to the question;
+    a plain schema string is used whole with the default examples.
+    """
+    if isinstance(schema_info, SchemaCatalog):
+        selection = schema_info.select(question)
+        schema_text, examples, extra = selection.schema, selection.examples, selection.requirements
+        annotate(schema_terms=len(selection.terms))
+    else:
+        schema_text, examples, extra = str(schema_info), sparql_examples[:4], tuple(TERM_REQUIREMENTS.values())
+    requirements = "\n".join(f"- {line}" for line in extra)
+
+    return f"""
+You are an expert in SPARQL and Ontologies.
+Convert the following natural language question into a SPARQL 1.1 query.
+Use the provided Schema Information to understand the classes, properties, and valid values.
+
+# Schema Information
+{schema_text}
+
+# Prefixes
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX owl: <http://www.w3.org/2002/07/owl#>
+PREFIX : <http://snu.ac.kr/dining/>
+
+# Question
+{question}
+
+# Requirements
+- Return ONLY the SPARQL query code.
+- Do not include markdown code blocks (```sparql ... ```).
+- Use only the classes and properties defined in the schema if possible.
+- For names (venues, menus), ALWAYS query the `:name` or `:menuName` property and filter it. Do NOT filter the Subject URI.
+- Check "Categorical Values" in schema to map terms like "Morning" -> "breakfast".
+- When checking categorical values (e.g. mealType), use `FILTER(STR(?var) = "value")` to avoid literal type mismatches.
+- CRITICAL: The path from Venue to Menu is: `?venue :offers ?service . ?service :hasMenu ?menuItem`. Use this path.
+- If the user asks about a general concept (e.g., "Engineering Zone"), rely on 'partOf' relationships or specific building names if you can infer them.
+{requirements}
+
+# User Question Examples (Few-Shot)
+
+{_format_examples(examples)}
+"""
+
+
+def _generate_sparql_llm(question, schema_info):
+    backend = get_backend(MODEL_NAME)
+    backend.check()
+
+    prompt = sparql_prompt(question, schema_info)
+    annotate(prompt_chars=len(prompt))
     try:
-        response = model.generate_content(prompt)
-        query = response.text.strip()
+        query = backend.generate(prompt).strip()
+        annotate(response_chars=len(query))
         # Clean up markdown if present
         if query.startswith("```"):
             query = re.sub(r"^```\w*\n", "", query)
@@ -213,38 +281,82 @@ def execute_sparql(query, graph):
     """
     Executes the SPARQL query on the graph.
     Returns a list of dictionaries (keys as variables).
+
+    Results are cached per canonical query and graph version, except for queries
+    calling NOW() and the like. SELECT queries over
+    the MenuItem/MealService/Venue chain are answered from the columnar projection
+    built in load_graph(); everything else goes to rdflib.
     """
-    try:
-        results = graph.query(query)
-        data = []
-        for row in results:
-            item = {}
-            if hasattr(results, 'vars'): # Select query
-                for var in results.vars:
-                    val = row[var]
-                    if val is not None:
-                         # Convert simple literals to string, URIs to string
-                        item[str(var)] = str(val)
-                data.append(item)
-            else: # Construct/Ask? Handling Select primarily
-                 data.append(row.asdict()) 
-        return data
-    except Exception as e:
-        print(f"Error executing SPARQL: {e}")
-        return []
+    with span("execute_sparql", query_chars=len(query)):
+        try:
+            namespaces = dict(graph.namespaces())
+            version = None if is_volatile(query) else graph_version(graph)
+            if version is not None:
+                cache_key, names = canonicalize(query, namespaces)
+                cached = result_cache.get(cache_key, version, names)
+                record_cache("sparql_result", cached is not None)
+                if cached is not None:
+                    annotate(rows=len(cached))
+                    return cached
 
-def generate_answer(question, raw_data):
+            data = _run_query(query, graph, namespaces)
+            annotate(rows=len(data))
+
+            if version is not None:
+                result_cache.put(cache_key, version, names, data)
+            return data
+        except Exception as e:
+            print(f"Error executing SPARQL: {e}")
+            annotate(error=str(e))
+            return []
+
+
+def _run_query(query, graph, namespaces):
+    # Parse once with the graph's prefixes, as graph.query() would
+    prepared = prepareQuery(query, initNs=namespaces)
+
+    fast = try_execute(prepared, graph)
+    record_cache("columnar", fast is not None)
+    if fast is not None:
+        variables, rows = fast
+        return [
+            {str(var): str(val) for var, val in zip(variables, row) if val is not None}
+            for row in rows
+        ]
+
+    if QUERY_OPTIMIZER:
+        start = time.perf_counter()
+        changes = optimize_query(prepared, graph)
+        annotate(optimizer_ms=round((time.perf_counter() - start) * 1000, 3),
+                 **{f"optimizer_{name}": count for name, count in changes.items() if count})
+    rewrites = rewrite_text_filters(prepared, graph)
+    if rewrites:
+        annotate(text_index_rewrites=rewrites)
+    results = graph.query(prepared)
+    data = []
+    for row in results:
+        item = {}
+        if hasattr(results, 'vars'): # Select query
+            for var in results.vars:
+                val = row[var]
+                if val is not None:
+                     # Convert simple literals to string, URIs to string
+                    item[str(var)] = str(val)
+            data.append(item)
+        else: # Construct/Ask? Handling Select primarily
+             data.append(row.asdict()) 
+    return data
+
+
+def sparql_cache_stats():
     """
-    Generates a natural language answer based on the raw data.
+    Returns hit/miss/eviction counters of the execute_sparql() result cache.
     """
-    if not API_KEY:
-         raise ValueError("GOOGLE_API_KEY is not set.")
-         
-    model = genai.GenerativeModel(MODEL_NAME)
-    
+    return result_cache.stats()
+
+def _answer_prompt(question, raw_data):
     data_str = json.dumps(raw_data, ensure_ascii=False, indent=2)
-    
-    prompt = f"""
+    return f"""
     You are a helpful assistant for Seoul National University cafeteria info.
     Answer the user's question based on the provided Data.
     
@@ -260,24 +372,10 @@ def generate_answer(question, raw_data):
     - Mention specific names and prices if available.
     - Answer in Korean.
     """
-    
-    try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        print(f"Error generating answer: {e}")
-        return "죄송합니다. 답변을 생성하는 중에 오류가 발생했습니다."
 
-def generate_explanation(question, query):
-    """
-    Explains the SPARQL query in plain Korean.
-    """
-    if not API_KEY:
-         raise ValueError("GOOGLE_API_KEY is not set.")
-         
-    model = genai.GenerativeModel(MODEL_NAME)
-    
-    prompt = f"""
+
+def _explanation_prompt(question, query):
+    return f"""
     You are an expert in Semantic Web and SPARQL.
     Explain WHY this SPARQL query was constructed to answer the user's question.
     
@@ -293,11 +391,87 @@ def generate_explanation(question, query):
     - Speak in Korean.
     - Be concise (2-3 sentences).
     """
+
+
+@traced("generate_answer")
+def generate_answer(question, raw_data):
+    """
+    Generates a natural language answer based on the raw data.
+    """
+    backend = get_backend(MODEL_NAME)
+    backend.check()
+    
+    prompt = _answer_prompt(question, raw_data)
+    annotate(prompt_chars=len(prompt), input_rows=len(raw_data))
+    try:
+        answer = backend.generate(prompt).strip()
+        annotate(response_chars=len(answer))
+        return answer
+    except Exception as e:
+        print(f"Error generating answer: {e}")
+        return "죄송합니다. 답변을 생성하는 중에 오류가 발생했습니다."
+
+@traced("generate_explanation")
+def generate_explanation(question, query):
+    """
+    Explains the SPARQL query in plain Korean.
+    """
+    backend = get_backend(MODEL_NAME)
+    backend.check()
     
+    prompt = _explanation_prompt(question, query)
+    annotate(prompt_chars=len(prompt))
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        explanation = backend.generate(prompt).strip()
+        annotate(response_chars=len(explanation))
+        return explanation
     except Exception as e:
         print(f"Error generating explanation: {e}")
         return "쿼리 해석을 생성할 수 없습니다."
 
+
+def _stream(prompt, label, fallback, timing):
+    """
+    Yields response text chunks as the model produces them and records
+    time-to-first-token and total time (seconds) into timing.
+    """
+    backend = get_backend(MODEL_NAME)
+    backend.check()
+    timing = timing if timing is not None else {}
+    timing["ttft"] = None
+    with span(f"generate_{label}", stream=True, prompt_chars=len(prompt)):
+        start = time.perf_counter()
+        response_chars = 0
+        try:
+            for text in backend.stream(prompt):
+                if timing["ttft"] is None:
+                    timing["ttft"] = time.perf_counter() - start
+                response_chars += len(text)
+                yield text
+        except Exception as e:
+            print(f"Error generating {label}: {e}")
+            # Text already shown to the user stays; only a silent failure gets the fallback
+            if timing["ttft"] is None:
+                timing["ttft"] = time.perf_counter() - start
+                yield fallback
+        finally:
+            timing["total"] = time.perf_counter() - start
+            annotate(ttft=timing["ttft"], response_chars=response_chars)
+            if timing["ttft"] is not None:
+                print(f"Streamed {label}: first token {timing['ttft']:.2f}s, total {timing['total']:.2f}s")
+
+
+def generate_answer_stream(question, raw_data, timing=None):
+    """
+    Streaming variant of generate_answer(): yields chunks of the answer as they arrive.
+    """
+    return _stream(_answer_prompt(question, raw_data), "answer",
+                   "죄송합니다. 답변을 생성하는 중에 오류가 발생했습니다.", timing)
+
+
+def generate_explanation_stream(question, query, timing=None):
+    """
+    Streaming variant of generate_explanation().
+    """
+    return _stream(_explanation_prompt(question, query), "explanation",
+                   "쿼리 해석을 생성할 수 없습니다.", timing)
@@ -0,0 +1,213 @@
+import os
+import re
+import json
+from dataclasses import dataclass
+
+from rdflib import RDF, RDFS, OWL
+
+from app.services.graph_stats import format_stats, stats_for
+from app.services.text_index import SNU, normalize_text, text_index_for
+
+# Always in the prompt: the Venue <- MealService <- MenuItem chain and its names
+CORE_TERMS = frozenset({
+    ":Venue", ":MealService", ":MenuItem",
+    ":offers", ":providedAt", ":hasMenu", ":partOfService", ":name", ":menuName",
+})
+
+# Question cues (substrings of the normalized question) -> schema terms and functions
+CUES = {
+    ":price": ("원", "가격", "싼", "저렴", "비싼", "얼마", "추천", "price", "cheap"),
+    ":mealType": ("아침", "조식", "점심", "저녁", "석식", "breakfast", "lunch", "dinner"),
+    ":cuisineType": ("한식", "일식", "중식", "양식", "퓨전", "korean", "japanese", "chinese", "western"),
+    ":carbType": ("면", "국수", "밥", "빵", "noodle", "rice", "bread"),
+    ":isSpicy": ("매운", "매콤", "맵", "spicy"),
+    ":containsMeat": ("고기", "채식", "비건", "meat", "vegetarian", "vegan"),
+    ":consumptionMode": ("포장", "테이크아웃", "takeout", "take-out"),
+    ":serviceStyle": ("뷔페", "buffet"),
+    ":date": ("오늘", "내일", "어제", "요일", "날짜", "월", "today", "tomorrow"),
+    ":timeRange": ("시간", "몇시", "언제", "운영", "영업", "hours"),
+    ":building": ("동", "건물", "관", "building"),
+    ":floor": ("층", "floor"),
+    ":phone": ("전화", "번호", "phone"),
+    ":address": ("주소", "위치", "address"),
+    ":category": ("종류", "분류", "category"),
+    ":tag": ("태그", "tag"),
+    ":description": ("설명", "공지", "description"),
+    ":withinRadius": ("근처", "가까", "주변", "근방", "이내", "near", "close"),
+    ":nearest": ("가까", "가장가까", "제일가까", "nearest", "closest"),
+    ":distance": ("근처", "가까", "주변", "거리", "멀", "near", "distance"),
+    ":openAt": ("지금", "현재", "열려", "문연", "영업중", "운영중", "하는곳", "되는", "now", "open"),
+    ":openAfter": ("이후", "넘어서", "늦게", "after", "late"),
+    ":crowdedAt": ("붐비", "혼잡", "한산", "사람많", "crowd"),
+    ":crowdTimeRange": ("붐비", "혼잡", "한산", "사람많", "crowd"),
+}
+
+# Requirement lines of the SPARQL prompt that only matter with some terms
+TERM_REQUIREMENTS = {
+    ":withinRadius": 'For proximity ("near", "근처", "가까운"), use the Spatial Functions instead of comparing :geoLat/:geoLng yourself.',
+    ":openAt": 'For opening hours ("지금", "몇 시 이후", "안 붐비는"), use the Time Functions instead of comparing :timeStart/:timeEnd yourself.',
+    ":textMatch": "When the user's spelling or spacing of a name may differ from the data, filter with `:textMatch` instead of CONTAINS.",
+}
+# Terms that bring in another term's requirement line
+REQUIREMENT_ALIASES = {":nearest": ":withinRadius", ":distance": ":withinRadius",
+                       ":openAfter": ":openAt", ":crowdedAt": ":openAt"}
+
+# Words that name no dish, venue or building
+NAME_STOPWORDS = frozenset({"메뉴", "식당", "오늘", "지금", "있어", "있는", "먹을", "추천", "알려", "찾아", "어디"})
+
+_CUE_WORDS = frozenset(cue for cues in CUES.values() for cue in cues)
+_TERM = re.compile(r"(?<!\w)(:[A-Za-z_]\w*)")
+_LITERAL_OR_IRI = re.compile(r'"(?:[^"\\]|\\.)*"|<[^>\s]*>')
+_FUNCTION_DOC = re.compile(r"^- `(:\w+)\(")
+
+
+def query_terms(sparql):
+    """
+    The ":name" terms (classes, properties, functions) a SPARQL query uses.
+    """
+    return set(_TERM.findall(_LITERAL_OR_IRI.sub('""', sparql)))
+
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+def estimate_tokens(text):
+    """
+    Rough token count: about one token per Hangul syllable and per 4 other characters.
+    """
+    hangul = sum(1 for char in text if "가" <= char <= "힣")
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+@dataclass(frozen=True)
+class Example:
+    question: str
+    sparql: str
+    terms: frozenset
+    grams: frozenset
+
+
+def load_examples(path):
+    """
+    The validated question -> SPARQL library ([{"question", "sparql"}, ...]).
+    """
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    return [Example(r["question"], r["sparql"], frozenset(query_terms(r["sparql"])),
+                    frozenset(_bigrams(normalize_text(r["question"])))) for r in records]
+
+
+@dataclass(frozen=True)
+class SchemaSelection:
+    """
+    The part of the schema and the few-shot examples chosen for one question.
+    """
+    schema: str
+    examples: tuple
+    terms: frozenset
+    requirements: tuple
+
+
+class SchemaCatalog:
+    """
+    The schema of a graph broken into classes, properties, value statistics
+    and extension functions, plus a library of validated question -> SPARQL
+    examples. select() keeps only what a question needs; str() is the full
+    schema text from extract_schema_info().
+    """
+
+    def __init__(self, graph, full_text, examples=(), function_docs="", max_examples=2, stats=None):
+        self.graph = graph
+        self.full_text = full_text
+        self.examples = list(examples)
+        self.max_examples = max_examples
+        self.stats = stats if stats is not None else stats_for(graph)
+        n3 = lambda term: term.n3(graph.namespace_manager)
+
+        self.classes = sorted({n3(s) for cls in (OWL.Class, RDFS.Class) for s in graph.subjects(RDF.type, cls)})
+        self.properties = sorted({n3(s) for kind in (OWL.ObjectProperty, OWL.DatatypeProperty)
+                                  for s in graph.subjects(RDF.type, kind)})
+        self.functions = {}
+        for line in function_docs.splitlines():
+            match = _FUNCTION_DOC.match(line.strip())
+            if match:
+                self.functions[match.group(1)] = line.strip()
+
+    def __str__(self):
+        return self.full_text
+
+    def default_examples(self, count=4):
+        return tuple(self.examples[:count])
+
+    def _named_terms(self, question):
+        """
+        Terms implied by dish, venue or building names the question mentions.
+        """
+        index = text_index_for(self.graph)
+        terms = set()
+        for token in re.split(r"[\s,.?!]+", question):
+            token = normalize_text(token)
+            # Strip particles ("학생회관에서" -> "학생회관") by trying shorter prefixes
+            for end in range(len(token), 1, -1):
+                prefix = token[:end]
+                if prefix in NAME_STOPWORDS or prefix in _CUE_WORDS:
+                    break
+                if index.contains(prefix, SNU.building) or index.contains(prefix, SNU.placeName):
+                    terms.add(":building")
+                    break
+                if not prefix.isdigit() and index.contains(prefix, SNU.menuName):
+                    terms.add(":textMatch")
+                    break
+        return terms
+
+    def _rank_examples(self, grams, terms):
+        ranked = []
+        optional = terms - CORE_TERMS
+        for i, example in enumerate(self.examples):
+            lexical = 2 * len(grams & example.grams) / (len(grams) + len(example.grams))
+            used = example.terms - CORE_TERMS
+            overlap = len(used & optional) / len(used | optional) if used | optional else 0.0
+            score = lexical + 0.5 * overlap
+            if score > 0:
+                ranked.append((-score, i, example))
+        return [example for _, _, example in sorted(ranked)[:self.max_examples]]
+
+    def select(self, question):
+        """
+        SchemaSelection for a question: core terms, terms its cues and names
+        imply, the best-matching examples and every term those examples use.
+        """
+        normalized = normalize_text(question)
+        terms = set(CORE_TERMS)
+        for term, cues in CUES.items():
+            if any(cue in normalized for cue in cues):
+                terms.add(term)
+        terms |= self._named_terms(question)
+
+        examples = self._rank_examples(frozenset(_bigrams(normalized)), terms)
+        for example in examples:
+            terms |= example.terms
+
+        sections = []
+        classes = [c for c in self.classes if c in terms]
+        properties = [p for p in self.properties if p in terms]
+        if classes:
+            sections.append("## Classes\n" + ", ".join(classes))
+        if properties:
+            sections.append("## Properties\n" + ", ".join(properties))
+        statistics = format_stats(self.stats, terms)
+        if statistics:
+            sections.append(statistics)
+        functions = [doc for name, doc in self.functions.items() if name in terms]
+        if functions:
+            sections.append("## Functions\n" + "\n".join(functions))
+
+        requirements = []
+        for term in sorted(terms):
+            line = TERM_REQUIREMENTS.get(REQUIREMENT_ALIASES.get(term, term))
+            if line and line not in requirements:
+                requirements.append(line)
+        return SchemaSelection("\n\n".join(sections), tuple(examples), frozenset(terms), tuple(requirements))
@@ -0,0 +1,350 @@
+import re
+import functools
+import threading
+from collections import defaultdict
+
+from rdflib import Literal, Namespace, Variable
+from rdflib.plugins.sparql.operators import register_custom_function
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import SPARQLError
+
+from app.services.graph_snapshot import GraphRegistry
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+# Literal-valued properties searched by name
+TEXT_PROPERTIES = (SNU.menuName, SNU.name, SNU.placeName, SNU.building)
+
+# SPARQL extension function (prefix ":" in generated queries)
+TEXT_MATCH_FN = SNU.textMatch
+
+# Jamo edits tolerated per this many jamo of the query (at least one, from 4 jamo up)
+FUZZY_JAMO_PER_EDIT = 8
+FUZZY_MIN_JAMO = 4
+# A CONTAINS filter matching more than this share of a property's values is left to rdflib
+REWRITE_MAX_SHARE = 0.5
+LOOKUP_CACHE_SIZE = 512
+
+_indexes = GraphRegistry()
+_indexes_lock = threading.Lock()
+
+_HANGUL_BASE, _HANGUL_LAST = 0xAC00, 0xD7A3
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONGSEONG = ["", *"ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ"]
+
+
+def normalize_text(text):
+    """
+    Lowercased, without whitespace and punctuation ("김치 찌개(밥)" -> "김치찌개밥").
+    """
+    return re.sub(r"[\s\W_]+", "", str(text)).lower()
+
+
+def jamo(text):
+    """
+    Hangul syllables split into their jamo ("개" -> "ㄱㅐ"), so a typo such as
+    개/게 is one edit instead of a whole different syllable.
+    """
+    out = []
+    for char in text:
+        code = ord(char) - _HANGUL_BASE
+        if 0 <= code <= _HANGUL_LAST - _HANGUL_BASE:
+            out.append(_CHOSEONG[code // 588] + _JUNGSEONG[code % 588 // 28] + _JONGSEONG[code % 28])
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def substring_distance(pattern, text):
+    """
+    Fewest edits turning pattern into some substring of text.
+    """
+    previous = [0] * (len(text) + 1)
+    for i, p in enumerate(pattern, 1):
+        current = [i] + [0] * len(text)
+        for j, t in enumerate(text, 1):
+            current[j] = min(previous[j - 1] + (p != t), previous[j] + 1, current[j - 1] + 1)
+        previous = current
+    return min(previous)
+
+
+def _grams(text, sizes=(1, 2)):
+    return {text[i:i + n] for n in sizes for i in range(len(text) - n + 1)}
+
+
+class TextIndex:
+    """
+    Character unigram/bigram inverted index over the distinct literals of
+    TEXT_PROPERTIES. contains() answers CONTAINS(?x, "...") by intersecting
+    postings and checking only those candidates; fuzzy() ignores spacing and
+    tolerates small typos by comparing jamo.
+    """
+
+    def __init__(self, graph, properties=TEXT_PROPERTIES):
+        self.terms = []
+        self.texts = []
+        self.by_property = {}
+        ids = {}
+        for prop in properties:
+            members = set()
+            for value in graph.objects(None, prop):
+                if not isinstance(value, Literal):
+                    continue
+                if value not in ids:
+                    ids[value] = len(self.terms)
+                    self.terms.append(value)
+                    self.texts.append(str(value))
+                members.add(ids[value])
+            self.by_property[prop] = frozenset(members)
+
+        self.postings = defaultdict(set)
+        self.normalized = [normalize_text(text) for text in self.texts]
+        self.normalized_postings = defaultdict(set)
+        self.jamo = [jamo(text) for text in self.normalized]
+        for i, (text, normalized) in enumerate(zip(self.texts, self.normalized)):
+            for gram in _grams(text):
+                self.postings[gram].add(i)
+            for gram in _grams(normalized):
+                self.normalized_postings[gram].add(i)
+
+        self._contains = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._lookup_contains)
+        self._fuzzy = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._lookup_fuzzy)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _members(self, prop):
+        return self.by_property.get(prop, frozenset()) if prop is not None else None
+
+    def _candidates(self, postings, text):
+        grams = sorted((postings.get(gram, frozenset()) for gram in _grams(text, (2,) if len(text) > 1 else (1,))),
+                       key=len)
+        # A gram that occurs nowhere sorts first and rules out every literal
+        if not grams or not grams[0]:
+            return set()
+        candidates = set(grams[0])
+        for posting in grams[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return candidates
+
+    def _lookup_contains(self, needle, prop):
+        if not needle:
+            ids = set(range(len(self.terms)))
+        else:
+            ids = {i for i in self._candidates(self.postings, needle) if needle in self.texts[i]}
+        members = self._members(prop)
+        return frozenset(self.terms[i] for i in ids if members is None or i in members)
+
+    def contains(self, needle, prop=None):
+        """
+        Literals (of prop, or of any indexed property) whose text contains needle.
+        """
+        return self._contains(str(needle), prop)
+
+    def _lookup_fuzzy(self, query, prop):
+        normalized = normalize_text(query)
+        if not normalized:
+            return ()
+        pattern = jamo(normalized)
+        budget = 0 if len(pattern) < FUZZY_MIN_JAMO else max(1, len(pattern) // FUZZY_JAMO_PER_EDIT)
+        if budget:
+            # One typo spares a bigram of a 4+ syllable query; shorter ones keep a syllable
+            candidates = set().union(*(self.normalized_postings.get(gram, ()) for gram in
+                                       _grams(normalized, (2,) if len(normalized) > 3 else (1,))))
+        else:
+            candidates = self._candidates(self.normalized_postings, normalized)
+        members = self._members(prop)
+        hits = []
+        for i in candidates:
+            if members is not None and i not in members:
+                continue
+            if normalized in self.normalized[i]:
+                hits.append((0, self.texts[i], self.terms[i]))
+            elif budget:
+                distance = substring_distance(pattern, self.jamo[i])
+                if distance <= budget:
+                    hits.append((distance, self.texts[i], self.terms[i]))
+        return tuple((distance, term) for distance, _, term in sorted(hits))
+
+    def fuzzy(self, query, prop=None):
+        """
+        [(jamo edits, literal)] of the literals matching query regardless of
+        spacing and punctuation, with up to one typo per FUZZY_JAMO_PER_EDIT jamo.
+        """
+        return list(self._fuzzy(str(query), prop))
+
+    def fuzzy_terms(self, query, prop=None):
+        return frozenset(term for _, term in self._fuzzy(str(query), prop))
+
+
+def build_text_index(graph):
+    """
+    Builds and registers the TextIndex for a graph.
+    """
+    index = TextIndex(graph)
+    _indexes[graph] = index
+    return index
+
+
+def text_index_for(graph):
+    """
+    The graph's TextIndex, built on first use.
+    """
+    index = _indexes.get(graph)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(graph)
+            if index is None:
+                index = build_text_index(graph)
+    return index
+
+
+def _text_match(expr, ctx):
+    args = list(expr.expr or [])
+    if len(args) != 2:
+        raise SPARQLError(f"{expr.iri.n3()} takes 2 arguments, got {len(args)}")
+    value, query = args
+    return Literal(value in text_index_for(ctx.ctx.graph).fuzzy_terms(query))
+
+
+def register_functions():
+    """
+    Registers :textMatch(?name, "query") with rdflib's SPARQL engine.
+    """
+    register_custom_function(TEXT_MATCH_FN, _text_match, override=True, raw=True)
+
+
+register_functions()
+
+
+# --- CONTAINS rewriting -----------------------------------------------------
+
+def _text_condition(expr):
+    """
+    (var, kind, text) of CONTAINS(?x, "..."), CONTAINS(STR(?x), "...") or
+    :textMatch(?x, "..."); None for anything else.
+    """
+    if not isinstance(expr, CompValue):
+        return None
+    if expr.name == "Builtin_CONTAINS":
+        target, needle, kind = expr.arg1, expr.arg2, "contains"
+    elif expr.name == "Function" and expr.iri == TEXT_MATCH_FN and len(expr.expr or []) == 2:
+        target, needle = expr.expr
+        kind = "fuzzy"
+    else:
+        return None
+    if isinstance(target, CompValue) and target.name == "Builtin_STR":
+        target = target.arg
+    if not isinstance(target, Variable) or not isinstance(needle, Literal):
+        return None
+    return target, kind, str(needle)
+
+
+def _restrictions(expr):
+    """
+    [(var, [(kind, text), ...])] for each conjunct of expr that is a text
+    condition, or a disjunction of text conditions on one variable.
+    """
+    if isinstance(expr, CompValue) and expr.name == "ConditionalAndExpression":
+        found = []
+        for part in [expr.expr] + list(expr.other or []):
+            found.extend(_restrictions(part))
+        return found
+    if isinstance(expr, CompValue) and expr.name == "ConditionalOrExpression":
+        parts = [_text_condition(part) for part in [expr.expr] + list(expr.other or [])]
+        if all(parts) and len({var for var, _, _ in parts}) == 1:
+            return [(parts[0][0], [(kind, text) for _, kind, text in parts])]
+        return []
+    condition = _text_condition(expr)
+    return [(condition[0], [condition[1:]])] if condition else []
+
+
+def _required_bgp(part, var):
+    """
+    (BGP node, triple) of a triple binding var as the object of an indexed
+    property that every solution of part must match: only Join, Filter,
+    Extend and the left side of OPTIONAL are followed.
+    """
+    if not isinstance(part, CompValue):
+        return None
+    if part.name == "BGP":
+        for triple in part.triples:
+            if triple[2] == var and triple[1] in TEXT_PROPERTIES:
+                return part, triple
+        return None
+    if part.name == "Join":
+        return _required_bgp(part.p1, var) or _required_bgp(part.p2, var)
+    if part.name in ("Filter", "Extend", "LeftJoin"):
+        return _required_bgp(part.p if part.name != "LeftJoin" else part.p1, var)
+    return None
+
+
+def _restrict(parent, key, bgp, triple, var, terms):
+    """
+    Replaces parent[key] (the BGP) by a lazy join that binds var from terms
+    first, with the triple on var moved to the front of the BGP.
+    """
+    bgp.triples = [triple] + [t for t in bgp.triples if t is not triple]
+    values = CompValue("values", res=[{var: term} for term in sorted(terms, key=lambda t: (str(t), str(t.datatype)))])
+    join = CompValue("Join", p1=CompValue("ToMultiSet", p=values), p2=bgp, lazy=True)
+    join["_vars"] = set(bgp._vars or ()) | {var}
+    parent[key] = join
+
+
+def _replace_bgp(part, bgp, replace):
+    """
+    Calls replace(parent, key) for the node holding bgp under part.
+    """
+    for key, value in part.items():
+        if value is bgp:
+            replace(part, key)
+            return True
+        if isinstance(value, CompValue) and not key.startswith("_") and _replace_bgp(value, bgp, replace):
+            return True
+    return False
+
+
+def rewrite_text_filters(query, graph):
+    """
+    Rewrites the FILTERs of a prepared query whose CONTAINS / :textMatch
+    conditions pin a variable bound by :menuName, :name, :placeName or
+    :building, so the candidate literals come from the TextIndex and bind the
+    variable before the BGP is matched. The FILTER itself stays and still
+    decides; the rewrite only prunes rows it would reject.
+    Returns the number of rewritten conditions.
+    """
+    index = text_index_for(graph)
+    rewritten = 0
+    pending = [query.algebra]
+    while pending:
+        node = pending.pop()
+        for key, value in node.items():
+            if isinstance(value, CompValue) and not key.startswith("_"):
+                pending.append(value)
+        if node.name != "Filter":
+            continue
+        for var, conditions in _restrictions(node.expr):
+            found = _required_bgp(node.p, var)
+            if found is None:
+                continue
+            bgp, triple = found
+            prop = triple[1]
+            terms = set()
+            for kind, text in conditions:
+                terms |= index.contains(text, prop) if kind == "contains" else index.fuzzy_terms(text, prop)
+            if len(terms) > REWRITE_MAX_SHARE * len(index.by_property.get(prop, ())):
+                continue
+            if node.p is bgp:
+                _restrict(node, "p", bgp, triple, var, terms)
+            else:
+                _replace_bgp(node.p, bgp, lambda parent, key: _restrict(parent, key, bgp, triple, var, terms))
+            rewritten += 1
+    return rewritten
+
+
+TEXT_FUNCTIONS_DOC = """
+- `:textMatch(?name, "김치 찌게")`: true if the name matches ignoring spacing and small typos; prefer it over CONTAINS for names typed by the user.
+"""
@@ -0,0 +1,267 @@
+import re
+import bisect
+import datetime
+import functools
+import threading
+from zoneinfo import ZoneInfo
+
+from rdflib import Literal, Namespace, RDF
+from rdflib.plugins.sparql.operators import register_custom_function
+from rdflib.plugins.sparql.sparql import SPARQLError
+
+from app.services.graph_snapshot import GraphRegistry
+from config import LOCAL_TIMEZONE
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+# SPARQL extension functions (prefix ":" in generated queries)
+OPEN_AT_FN = SNU.openAt
+OPEN_AFTER_FN = SNU.openAfter
+CROWDED_AT_FN = SNU.crowdedAt
+
+# A time string with only a start ("17:00", "11") is taken to last this long
+OPEN_ENDED_MINUTES = 120
+# Distinct function arguments whose answer sets are kept per index
+LOOKUP_CACHE_SIZE = 256
+
+_CLOCK = re.compile(r"(\d{1,2})(?:\s*:\s*(\d{2}))?(?::\d{2})?")
+_RANGE = re.compile(r"(\d{1,2}(?:\s*:\s*\d{2})?)\s*(?:~\s*(\d{1,2}(?:\s*:\s*\d{2})?))?")
+
+_indexes = GraphRegistry()
+_indexes_lock = threading.Lock()
+
+
+def parse_clock(text):
+    """
+    Minutes after midnight of "8:00", "08:00:00" or "11"; None if it is not a time of day.
+    """
+    match = _CLOCK.fullmatch(str(text).strip())
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour > 24 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def parse_time_range(text):
+    """
+    (start, end) in minutes after midnight of "11:00~14:00", "17:00" or "11";
+    end is None when only a start is given, and the result None if there is no time.
+    """
+    if not text:
+        return None
+    match = _RANGE.search(str(text))
+    if not match:
+        return None
+    start = parse_clock(match.group(1))
+    if start is None:
+        return None
+    end = parse_clock(match.group(2)) if match.group(2) else None
+    return start, end
+
+
+def format_clock(minutes):
+    """
+    "HH:MM:00" as written to :timeStart/:timeEnd.
+    """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+class IntervalIndex:
+    """
+    Half-open [start, end) intervals in minutes with keys. at(t) bisects the
+    starts and checks only intervals that began within the longest interval's
+    length of t; ending_after(t) bisects the ends. Past-midnight intervals
+    end after 24 * 60.
+    """
+
+    def __init__(self, intervals):
+        by_start = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self.starts = [start for start, _, _ in by_start]
+        self.by_start = by_start
+        by_end = sorted(intervals, key=lambda item: item[1])
+        self.ends = [end for _, end, _ in by_end]
+        self.by_end = [key for _, _, key in by_end]
+        self.max_length = max((end - start for start, end, _ in by_start), default=0)
+
+    def __len__(self):
+        return len(self.by_start)
+
+    def at(self, t):
+        lo = bisect.bisect_left(self.starts, t - self.max_length)
+        hi = bisect.bisect_right(self.starts, t)
+        return {key for start, end, key in self.by_start[lo:hi] if start <= t < end}
+
+    def ending_after(self, t):
+        """
+        Keys of the intervals still open at t or later, i.e. ending after t.
+        """
+        return set(self.by_end[bisect.bisect_right(self.ends, t):])
+
+
+class ServiceHours:
+    """
+    Interval indexes over every MealService's (date, service hours) and
+    (date, crowd time range), one per date plus one over all dates for
+    questions that give only a time of day.
+
+    Hours come from :timeStart/:timeEnd, falling back to parsing :timeRange
+    (start-only times last OPEN_ENDED_MINUTES); crowd times from :crowdTimeRange.
+    """
+
+    def __init__(self, graph):
+        hours, crowd = {}, {}
+        for service in graph.subjects(RDF.type, SNU.MealService):
+            day = graph.value(service, SNU.date)
+            try:
+                day = datetime.date.fromisoformat(str(day)) if day is not None else None
+            except ValueError:
+                day = None
+            interval = self._hours(graph, service)
+            if interval:
+                hours.setdefault(day, []).append((*interval, service))
+            crowd_range = parse_time_range(graph.value(service, SNU.crowdTimeRange))
+            if crowd_range and crowd_range[1] is not None:
+                crowd.setdefault(day, []).append((*self._span(*crowd_range), service))
+
+        self.hours = {day: IntervalIndex(items) for day, items in hours.items()}
+        self.hours[None] = IntervalIndex([item for items in hours.values() for item in items])
+        self.crowd = {day: IntervalIndex(items) for day, items in crowd.items()}
+        self.crowd[None] = IntervalIndex([item for items in crowd.values() for item in items])
+
+        self.open_at = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._open_at)
+        self.open_after = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._open_after)
+        self.crowded_at = functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._crowded_at)
+
+    @staticmethod
+    def _span(start, end):
+        if end is None:
+            end = start + OPEN_ENDED_MINUTES
+        elif end <= start:
+            # Past midnight
+            end += 24 * 60
+        return start, end
+
+    def _hours(self, graph, service):
+        start, end = (parse_clock(graph.value(service, prop) or "") for prop in (SNU.timeStart, SNU.timeEnd))
+        if start is None:
+            parsed = parse_time_range(graph.value(service, SNU.timeRange))
+            if parsed is None:
+                return None
+            start, end = parsed
+        return self._span(start, end)
+
+    @staticmethod
+    def _lookup(indexes, day, minute, probe):
+        """
+        probe(index, minute) on day's index, plus probe(index, minute + 24h) on
+        the previous day's, where ranges past midnight end after 24:00.
+        """
+        found = set()
+        index = indexes.get(day)
+        if index:
+            found |= probe(index, minute)
+        previous = indexes.get(day - datetime.timedelta(days=1) if day is not None else None)
+        if previous:
+            found |= probe(previous, minute + 24 * 60)
+        return frozenset(found)
+
+    def _open_at(self, day, minute):
+        """
+        Services serving at minute on day (any date if day is None).
+        """
+        return self._lookup(self.hours, day, minute, IntervalIndex.at)
+
+    def _open_after(self, day, minute):
+        """
+        Services still serving at or after minute on day (any date if day is None).
+        """
+        return self._lookup(self.hours, day, minute, IntervalIndex.ending_after)
+
+    def _crowded_at(self, day, minute):
+        return self._lookup(self.crowd, day, minute, IntervalIndex.at)
+
+
+def build_time_index(graph):
+    """
+    Builds and registers the ServiceHours index for a graph.
+    """
+    index = ServiceHours(graph)
+    _indexes[graph] = index
+    return index
+
+
+def time_index_for(graph):
+    """
+    The graph's ServiceHours index, built on first use.
+    """
+    index = _indexes.get(graph)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(graph)
+            if index is None:
+                index = build_time_index(graph)
+    return index
+
+
+def local_today():
+    """
+    Today's date in LOCAL_TIMEZONE, the date NOW() falls on for these functions.
+    """
+    return datetime.datetime.now(ZoneInfo(LOCAL_TIMEZONE)).date()
+
+
+def moment(term):
+    """
+    (date or None, minutes after midnight) of an xsd:dateTime (NOW(), converted
+    to LOCAL_TIMEZONE), an xsd:time, or a "HH:MM" / "YYYY-MM-DD HH:MM" string.
+    """
+    value = term.toPython() if isinstance(term, Literal) else term
+    if isinstance(value, str):
+        text = value.strip().replace("T", " ")
+        day, _, clock = text.rpartition(" ")
+        minute = parse_clock(clock)
+        if minute is None:
+            raise SPARQLError(f"not a time: {term!r}")
+        try:
+            return (datetime.date.fromisoformat(day) if day else None), minute
+        except ValueError:
+            raise SPARQLError(f"not a date: {term!r}")
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(ZoneInfo(LOCAL_TIMEZONE))
+        return value.date(), value.hour * 60 + value.minute
+    if isinstance(value, datetime.time):
+        return None, value.hour * 60 + value.minute
+    raise SPARQLError(f"not a time: {term!r}")
+
+
+def _lookup(method):
+    def function(expr, ctx):
+        args = list(expr.expr or [])
+        if len(args) != 2:
+            raise SPARQLError(f"{expr.iri.n3()} takes 2 arguments, got {len(args)}")
+        service, when = args
+        index = time_index_for(ctx.ctx.graph)
+        return Literal(service in getattr(index, method)(*moment(when)))
+    return function
+
+
+def register_functions():
+    """
+    Registers :openAt(?service, when), :openAfter(?service, when) and
+    :crowdedAt(?service, when) with rdflib's SPARQL engine.
+    """
+    register_custom_function(OPEN_AT_FN, _lookup("open_at"), override=True, raw=True)
+    register_custom_function(OPEN_AFTER_FN, _lookup("open_after"), override=True, raw=True)
+    register_custom_function(CROWDED_AT_FN, _lookup("crowded_at"), override=True, raw=True)
+
+
+register_functions()
+
+TIME_FUNCTIONS_DOC = """
+- `:openAt(?service, NOW())`: true if the MealService is serving at that moment. Also takes "HH:MM" (any date) or "YYYY-MM-DD HH:MM".
+- `:openAfter(?service, "18:30")`: true if the MealService is still serving at or after that time.
+- `:crowdedAt(?service, NOW())`: true if that moment is in the service's crowd time; use `!:crowdedAt(...)` for "not crowded".
+"""
@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds (seconds) of the exported latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Numeric span attributes that are also accumulated as per-stage counters
+COUNTED_ATTRS = ("prompt_chars", "response_chars", "prompt_tokens", "response_tokens", "rows")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed stage. Attributes set while the span is open (sizes, token counts,
+    row counts, cache hits) are exported with it.
+    """
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = dict(attrs or {})
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+class Histogram:
+    """
+    Cumulative bucket counts for export plus a window of recent samples for
+    percentiles.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.samples.append(value)
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """
+    Process-wide latency histograms and counters, keyed by (name, labels).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def summary(self, name="rag_stage_duration_seconds"):
+        """
+        Returns {stage: {"count", "p50", "p95", "p99"}} for one histogram family.
+        """
+        with self._lock:
+            return {
+                dict(labels).get("stage", ""): {
+                    "count": h.count,
+                    "p50": h.percentile(0.5),
+                    "p95": h.percentile(0.95),
+                    "p99": h.percentile(0.99),
+                }
+                for (hist_name, labels), h in self.histograms.items() if hist_name == name
+            }
+
+    def prometheus_text(self):
+        """
+        Renders everything in the Prometheus text exposition format. Histograms
+        also get a <name>_quantile summary computed over the recent window.
+        """
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for family in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {family} counter")
+                for (name, labels), value in sorted(self.counters.items()):
+                    if name == family:
+                        lines.append(f"{name}{fmt(labels)} {value}")
+
+            for family in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {family} histogram")
+                quantiles = []
+                for (name, labels), h in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if name != family:
+                        continue
+                    cumulative = 0
+                    bounds = [str(b) for b in h.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{fmt(labels)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{fmt(labels)} {h.count}")
+                    for q in (0.5, 0.95, 0.99):
+                        value = h.percentile(q)
+                        if value is not None:
+                            quantiles.append(f"{name}_quantile{fmt(labels, [('quantile', q)])} {value:.6f}")
+                if quantiles:
+                    lines.append(f"# TYPE {family}_quantile gauge")
+                    lines.extend(quantiles)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class JsonlSink:
+    """
+    Appends every finished span as one JSON line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __call__(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+_sinks = []
+
+
+def add_sink(sink):
+    """
+    Registers a callable that receives every finished Span.
+    """
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times a pipeline stage as a child of the current span (if any).
+    The duration lands in rag_stage_duration_seconds{stage=name}.
+    """
+    current = Span(name, _current_span.get(), attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except GeneratorExit:
+        # A streaming consumer stopped early; not a failure of the stage
+        current.attrs["abandoned"] = True
+        raise
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._start
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Closed from another context, e.g. an abandoned streaming generator
+            pass
+        _finish(current)
+
+
+def _finish(current):
+    metrics.observe("rag_stage_duration_seconds", current.duration, stage=current.name)
+    if current.error:
+        metrics.count("rag_stage_errors_total", stage=current.name, error=current.error)
+    for attr in COUNTED_ATTRS:
+        value = current.attrs.get(attr)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.count(f"rag_stage_{attr}_total", value, stage=current.name)
+    for sink in list(_sinks):
+        try:
+            sink(current)
+        except Exception as e:
+            print(f"Error writing span {current.name}: {e}")
+
+
+def traced(name):
+    """
+    Decorator form of span() for functions that are one stage end to end.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attrs):
+    """
+    Adds attributes to the innermost open span; a no-op outside any span.
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def record_cache(cache, hit):
+    """
+    Counts a cache lookup and marks it on the current span.
+    """
+    metrics.count("rag_cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+    annotate(**{f"{cache}_hit": hit})
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serves GET /metrics from a daemon thread; later calls return the running server.
+    """
+    global _metrics_server
+    with _metrics_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+            print(f"Serving metrics on http://{host}:{_metrics_server.server_address[1]}/metrics")
+        return _metrics_server
+
+
+_configured = False
+
+
+def configure(metrics_port=None, jsonl_path=None):
+    """
+    One-time setup of the exporters: a /metrics endpoint on metrics_port and a
+    span log at jsonl_path. Safe to call on every Streamlit rerun.
+    """
+    global _configured
+    with _metrics_lock:
+        if _configured:
+            return
+        _configured = True
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    if jsonl_path:
+        add_sink(JsonlSink(jsonl_path))
@@ -9,15 +9,72 @@ DATA_DIR = PROJECT_ROOT / "data"
 RAW_DATA_DIR = DATA_DIR / "raw"
 ONTOLOGY_DIR = DATA_DIR / "ontology"
 KG_DIR = DATA_DIR / "knowledge_graph"
+CACHE_DIR = DATA_DIR / "cache"
 
 # File Paths
 MENUS_JSON_PATH = RAW_DATA_DIR / "menus.json"
 VENUES_LOCATION_JSON_PATH = RAW_DATA_DIR / "venues_location.json"
 
 TBOX_PATH = ONTOLOGY_DIR / "tbox.ttl"
+SHACL_PATH = ONTOLOGY_DIR / "shacl.ttl"
 ABOX_INFERRED_PATH = KG_DIR / "abox_inferred.ttl"
 CLEAN_GRAPH_PATH = KG_DIR / "clean_graph.ttl"
 ABOX_FINAL_PATH = KG_DIR / "abox_final.ttl"
+MENU_CLASSIFICATION_PATH = DATA_DIR / "menu_classification.json"
+# Append-only log behind menu_classification.json (which is exported from it)
+MENU_CLASSIFICATION_LOG_PATH = DATA_DIR / "menu_classification.jsonl"
+
+# Incremental ABox generation: per-service content hashes and per-date N-Triples parts
+ABOX_MANIFEST_PATH = KG_DIR / "abox_manifest.json"
+ABOX_PARTS_DIR = KG_DIR / "abox_parts"
+
+# Per-focus-node SHACL results kept between validation runs (--changed-only)
+SHACL_STATE_PATH = CACHE_DIR / "shacl_state.pkl"
+
+# Precompiled (pickled) TBox + inferred ABox, keyed by the content hash of both files
+GRAPH_SNAPSHOT_PATH = CACHE_DIR / "graph_snapshot.pkl"
+# Value statistics (distinct values with counts, numeric ranges, dates, class sizes) per graph version
+GRAPH_STATS_PATH = CACHE_DIR / "graph_stats.json"
+
+# How often (seconds) the shared graph checks its source files for a new version
+GRAPH_REFRESH_SECONDS = 60
+
+# ABox kept as per-date named graphs; partitions older than the retention window
+# (days before the newest service date) are archived here and loaded on demand
+GRAPH_PARTITIONED = os.environ.get("RAG_GRAPH_PARTITIONED", "1") != "0"
+PARTITION_RETENTION_DAYS = 14
+PARTITION_ARCHIVE_DIR = CACHE_DIR / "partitions"
+
+# Time zone of service hours; NOW() in SPARQL is converted to it
+LOCAL_TIMEZONE = "Asia/Seoul"
+
+# Rewrite queries left to rdflib (equality pushdown, implied type patterns, join order)
+QUERY_OPTIMIZER = os.environ.get("RAG_QUERY_OPTIMIZER", "1") != "0"
+
+# execute_sparql() result cache (LRU, bounded by entries and approximate bytes)
+RESULT_CACHE_MAX_ENTRIES = 512
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Question -> SPARQL cache (exact repeats and promoted LLM outputs), persisted across restarts.
+# Entries belong to the graph version whose answer promoted them; the least used are evicted first.
+QUESTION_CACHE_PATH = CACHE_DIR / "question_cache.json"
+QUESTION_CACHE_MAX_ENTRIES = 1000
+
+# SPARQL prompt: per-question schema pruning and few-shots from a validated example library
+SCHEMA_PRUNING = os.environ.get("RAG_SCHEMA_PRUNING", "1") != "0"
+SCHEMA_MAX_EXAMPLES = 2
+SPARQL_EXAMPLES_PATH = DATA_DIR / "sparql_examples.json"
 
 # Model Config
 MODEL_NAME = "gemini-3-pro-preview"
+
+# LLM backend: "gemini" (Google API), "http" (local stand-in server) or "replay" (in-process recordings)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "http://127.0.0.1:8765")
+LLM_TIMEOUT = 60
+LLM_MAX_RETRIES = 2
+LLM_RECORDINGS_PATH = PROJECT_ROOT / "scripts" / "benchmark" / "competency_recordings.json"
+
+# Tracing exporters (both off unless set): Prometheus-style /metrics port and span JSONL log
+METRICS_PORT = int(os.environ.get("RAG_METRICS_PORT", "0")) or None
+TRACE_JSONL_PATH = os.environ.get("RAG_TRACE_JSONL") or None
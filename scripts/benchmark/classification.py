@@ -0,0 +1,54 @@
+import sys
+import os
+import time
+import argparse
+from collections import Counter
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import MENU_CLASSIFICATION_PATH
+from scripts.etl.classification_store import ClassificationStore
+from scripts.etl.classification_cascade import ClassificationCascade, CONFIDENCE_THRESHOLD, FIELDS
+
+
+def run(thresholds, classification_path=MENU_CLASSIFICATION_PATH):
+    """
+    Leave-one-out check of the local cascade tiers: every classified name is
+    classified from the others, and compared with its LLM classification.
+    """
+    print("=== Classification Cascade Benchmark (leave-one-out vs LLM labels) ===")
+    store = ClassificationStore.from_json(classification_path)
+    cascade = ClassificationCascade(store)
+    items = store.items()
+    print(f"Classified names: {len(items)} distinct")
+
+    start = time.perf_counter()
+    predictions = [(cascade.classify(key, exclude=key), truth) for key, truth in items]
+    elapsed = time.perf_counter() - start
+    print(f"Local classification: {elapsed * 1000 / len(items):.2f}ms per name")
+
+    print("\n--- Results ---")
+    for threshold in thresholds:
+        tiers, agreed, fields = Counter(), Counter(), Counter()
+        for (value, confidence, tier), truth in predictions:
+            if value is None or confidence < threshold:
+                tiers["llm"] += 1
+                continue
+            tiers[tier] += 1
+            agreed[tier] += value == truth
+            for field in FIELDS:
+                fields[field] += value[field] == truth[field]
+        local = len(items) - tiers["llm"]
+        summary = ", ".join(f"{tier} {count} ({agreed[tier]} agree)" for tier, count in sorted(tiers.items()) if tier != "llm")
+        print(f"Threshold {threshold:.2f}: {local}/{len(items)} resolved locally [{summary or 'none'}], "
+              f"{tiers['llm']} left for the LLM")
+        if local:
+            print("    field agreement: " + ", ".join(f"{field} {fields[field] / local:.0%}" for field in FIELDS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local classification cascade against the LLM classifications.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.6, 0.7, 0.8, CONFIDENCE_THRESHOLD, 0.9])
+    args = parser.parse_args()
+    run(args.thresholds)
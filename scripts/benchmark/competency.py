@@ -0,0 +1,215 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import rdflib
+from config import MODEL_NAME, CACHE_DIR, VENUES_LOCATION_JSON_PATH, PROJECT_ROOT, SCHEMA_PRUNING
+from app.services import rag_pipeline
+from app.services.rag_pipeline import load_graph, extract_schema_info, build_schema_catalog, _run_query
+from app.services.graph_store import GraphVersion
+from app.services.graph_snapshot import graph_version
+from app.services.chat_pipeline import answer_question
+from app.services.question_cache import QuestionCache
+from app.services.llm_backend import ReplayBackend, use_backend
+
+RECORDINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "competency_recordings.json")
+RESULTS_DIR = CACHE_DIR / "benchmarks"
+
+
+def summarize(samples):
+    """
+    Summary statistics of a list of durations (seconds), reported in milliseconds.
+    """
+    ordered = sorted(samples)
+
+    def pct(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "n": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "min_ms": ordered[0] * 1000,
+        "p50_ms": pct(0.5),
+        "p90_ms": pct(0.9),
+        "p99_ms": pct(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def measure(fn, warmup, repeat, quiet=True, before=None):
+    """
+    Runs fn warmup times untimed, then repeat times timed. before() runs
+    untimed ahead of every call (e.g. to clear caches).
+    """
+    samples = []
+    for i in range(warmup + repeat):
+        if before is not None:
+            before()
+        sink = io.StringIO() if quiet else None
+        with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(args):
+    with open(args.recordings, "r") as f:
+        questions = json.load(f)["questions"]
+    recorded = ReplayBackend(args.recordings, latency=args.llm_latency_ms / 1000, chunk_delay=args.chunk_delay_ms / 1000)
+    use_backend(MODEL_NAME, recorded)
+    quiet = not args.verbose
+    results = {}
+
+    print(f"=== Competency Benchmark ({len(questions)} questions, warm-up {args.warmup}, repeat {args.repeat}) ===")
+
+    results["graph_load.snapshot"] = summarize(measure(load_graph, 1, args.load_repeat, quiet))
+    if args.parse:
+        results["graph_load.parse"] = summarize(measure(lambda: load_graph(use_snapshot=False), 0, args.load_repeat, quiet))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = load_graph()
+    results["schema_extraction"] = summarize(measure(lambda: extract_schema_info(graph), args.warmup, args.repeat, quiet))
+
+    # SPARQL execution of the recorded LLM queries, bypassing the result cache
+    namespaces = dict(graph.namespaces())
+    all_execution = []
+    for i, question in enumerate(questions, 1):
+        query = recorded.responses.respond(f"into a SPARQL\n{question}")
+        samples = measure(lambda: _run_query(query, graph, namespaces), args.warmup, args.repeat, quiet)
+        results[f"sparql_execution.q{i}"] = summarize(samples)
+        all_execution.extend(samples)
+    results["sparql_execution.all"] = summarize(all_execution)
+
+    # End to end through the chat pipeline with replayed model output. A throwaway
+    # question cache keeps runs independent; caches are emptied before every call
+    # unless --warm-caches.
+    schema = build_schema_catalog(graph) if SCHEMA_PRUNING else extract_schema_info(graph)
+    active = GraphVersion(graph_version(graph) or "benchmark", graph, schema, time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "question_cache.json")
+        original_cache = rag_pipeline.question_cache
+
+        def reset_caches():
+            if not args.warm_caches:
+                rag_pipeline.question_cache = QuestionCache(cache_path + ".unused", VENUES_LOCATION_JSON_PATH)
+                rag_pipeline.result_cache.clear()
+
+        rag_pipeline.question_cache = QuestionCache(cache_path, VENUES_LOCATION_JSON_PATH)
+        try:
+            all_e2e = []
+            for i, question in enumerate(questions, 1):
+                samples = measure(lambda: answer_question(question, active), args.warmup, args.repeat, quiet, reset_caches)
+                results[f"end_to_end.q{i}"] = summarize(samples)
+                all_e2e.extend(samples)
+            results["end_to_end.all"] = summarize(all_e2e)
+        finally:
+            rag_pipeline.question_cache = original_cache
+            use_backend(MODEL_NAME, None)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "triples": len(graph),
+            "questions": questions,
+            "python": platform.python_version(),
+            "rdflib": rdflib.__version__,
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "llm_latency_ms": args.llm_latency_ms,
+            "warm_caches": args.warm_caches,
+        },
+        "results": results,
+    }
+
+
+def print_results(report):
+    print("\n--- Results (ms) ---")
+    print(f"{'metric':<28}{'n':>5}{'p50':>10}{'p90':>10}{'p99':>10}{'mean':>10}")
+    for name, stats in report["results"].items():
+        print(f"{name:<28}{stats['n']:>5}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['mean_ms']:>10.2f}")
+
+
+def compare(baseline, current, threshold, min_delta_ms, stat="p50_ms"):
+    """
+    Returns the metrics whose stat grew by more than threshold (ratio) and
+    min_delta_ms (absolute) against the baseline report.
+    """
+    regressions = []
+    print(f"\n--- Comparison on {stat} (baseline {baseline['meta'].get('git_revision')}, "
+          f"{baseline['meta'].get('triples')} triples -> {current['meta'].get('triples')} triples) ---")
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        before, after = base[stat], stats[stat]
+        ratio = after / before if before > 0 else float("inf")
+        regressed = ratio > threshold and after - before > min_delta_ms
+        marker = "REGRESSION" if regressed else ""
+        print(f"{name:<28}{before:>10.2f}{after:>10.2f}{ratio:>8.2f}x  {marker}")
+        if regressed:
+            regressions.append((name, before, after, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the competency questions with replayed LLM output.")
+    parser.add_argument("--recordings", default=RECORDINGS_PATH, help="Recorded LLM responses and question list")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--load-repeat", type=int, default=3, help="Repetitions for graph loading")
+    parser.add_argument("--parse", action="store_true", help="Also time a cold Turtle parse")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated model latency per call")
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0, help="Simulated delay between streamed chunks")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep question/result caches between calls")
+    parser.add_argument("--output", help="Results JSON path (default: data/cache/benchmarks/competency_<time>.json)")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline output while timing")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_results(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"competency_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.2f}x")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import sys
+import os
+import io
+import json
+import time
+import contextlib
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import date, timedelta
+from itertools import cycle
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import MENUS_JSON_PATH
+from scripts.etl.streaming import iter_json_array
+
+
+def write_archive(path, days, source=MENUS_JSON_PATH):
+    """
+    Writes a synthetic archive of days days by cycling the days of menus.json
+    with shifted dates, one record at a time.
+    """
+    by_date = {}
+    for record in iter_json_array(source):
+        by_date.setdefault(record["date"], []).append(record)
+    start = date(2021, 1, 1)
+    records = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for offset, day in zip(range(days), cycle(sorted(by_date))):
+            for record in by_date[day]:
+                f.write(",\n" if records else "")
+                json.dump(dict(record, date=(start + timedelta(days=offset)).isoformat()), f, ensure_ascii=False)
+                records += 1
+        f.write("\n]\n")
+    return records
+
+
+def _child(mode, menus_path, output_path):
+    """
+    One generator run in this (fresh) process; prints its output size, time and peak RSS
+    as JSON. The size is the full build's distinct triples and the streaming modes' lines
+    written (which repeat triples shared between services).
+    """
+    import resource
+    from scripts.etl import generate_knowledge_graph as generator
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "stream":
+            lines = generator.run_streaming(menus_path=menus_path, output_path=output_path)["lines"]
+        elif mode == "sharded":
+            lines = generator.run_sharded(menus_path=menus_path, output_path=output_path)["lines"]
+        else:
+            lines = generator.run(output_path=output_path, menus_path=menus_path)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux; RUSAGE_CHILDREN covers the largest pool worker
+    peak_mb = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024
+    print(json.dumps({"lines": lines, "seconds": seconds, "peak_mb": peak_mb}))
+
+
+def measure(mode, menus_path, output_path):
+    """
+    Runs the generator in a child process; returns (lines, seconds, peak RSS in MB).
+    The child's peak RSS starts from this process's, which stays small.
+    """
+    output = subprocess.run([sys.executable, __file__, "--child", mode, menus_path, output_path],
+                            check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["lines"], result["seconds"], result["peak_mb"]
+
+
+def run(days_list, max_full_days):
+    print(f"=== ETL Memory Benchmark: full Graph build vs streaming vs sharded ({os.cpu_count()} CPUs) ===")
+    workdir = tempfile.mkdtemp(prefix="etl_memory_")
+    try:
+        print(f"{'days':>6} {'records':>8} {'mode':>7} {'lines':>9} {'seconds':>8} {'lines/s':>10} {'peak RSS':>10}")
+        for days in days_list:
+            menus_path = os.path.join(workdir, f"menus_{days}.json")
+            records = write_archive(menus_path, days)
+            modes = ["full", "stream", "sharded"] if days <= max_full_days else ["stream", "sharded"]
+            for mode in modes:
+                output_path = os.path.join(workdir, f"abox_{days}_{mode}.ttl")
+                lines, seconds, peak_mb = measure(mode, menus_path, output_path)
+                print(f"{days:>6} {records:>8} {mode:>7} {lines:>9} {seconds:>8.2f} "
+                      f"{lines / seconds:>10.0f} {peak_mb:>8.1f}MB")
+                os.remove(output_path)
+            os.remove(menus_path)
+        if any(days > max_full_days for days in days_list):
+            print(f"(full mode skipped above {max_full_days} days; raise --max-full-days to include it)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare peak memory and throughput of the full, streaming and sharded ABox builds.")
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 120, 365], help="Archive sizes in days")
+    parser.add_argument("--max-full-days", type=int, default=120, help="Largest archive built with a full Graph")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "MENUS", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(*args.child)
+    else:
+        run(args.days, args.max_full_days)
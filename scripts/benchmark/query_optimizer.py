@@ -0,0 +1,134 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+from collections import Counter
+from datetime import datetime
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from rdflib.plugins.sparql import prepareQuery
+
+from config import CACHE_DIR, SPARQL_EXAMPLES_PATH
+from app.services.rag_pipeline import load_graph
+from app.services.graph_stats import stats_for
+from app.services.query_optimizer import optimize_query
+from app.services.llm_backend import RecordedResponses
+from scripts.benchmark.competency import RECORDINGS_PATH, summarize
+
+RESULTS_DIR = CACHE_DIR / "benchmarks"
+PREFIX = "PREFIX : <http://snu.ac.kr/dining/>\n"
+
+
+def workload(recordings_path, examples_path):
+    """
+    (label, query) pairs: the recorded LLM queries of the competency
+    questions and the validated example library.
+    """
+    queries = []
+    with open(recordings_path, "r") as f:
+        questions = json.load(f)["questions"]
+    responses = RecordedResponses(recordings_path)
+    for i, question in enumerate(questions, 1):
+        queries.append((f"q{i}", responses.respond(f"into a SPARQL\n{question}")))
+    with open(examples_path, "r", encoding="utf-8") as f:
+        for i, example in enumerate(json.load(f), 1):
+            queries.append((f"ex{i}", PREFIX + example["sparql"]))
+    return queries
+
+
+def _rows(results):
+    return Counter(tuple(row) for row in results)
+
+
+def _unsliced(text):
+    """
+    The query without LIMIT/OFFSET, whose rows do not depend on evaluation order.
+    """
+    return re.sub(r"\b(LIMIT|OFFSET)\s+\d+", "", text, flags=re.IGNORECASE)
+
+
+def run(args):
+    """
+    Times every query through rdflib as parsed and after optimize_query()
+    (the columnar fast path and text-index rewrite are left out of both),
+    and checks that both return the same rows once LIMIT/OFFSET are removed.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = load_graph()
+    namespaces = dict(graph.namespaces())
+    stats = stats_for(graph)
+
+    def prepare(text, optimize):
+        query = prepareQuery(text, initNs=namespaces)
+        if optimize:
+            optimize_query(query, graph, stats)
+        return query
+
+    def timed(text, optimize):
+        samples = []
+        for i in range(args.warmup + args.repeat):
+            query = prepare(text, optimize)
+            start = time.perf_counter()
+            rows = _rows(graph.query(query))
+            if i >= args.warmup:
+                samples.append(time.perf_counter() - start)
+        return sum(rows.values()), summarize(samples)
+
+    report = []
+    for label, text in workload(args.recordings, args.examples):
+        changes = optimize_query(prepareQuery(text, initNs=namespaces), graph, stats)
+        rows, before = timed(text, False)
+        _, after = timed(text, True)
+        unsliced = _unsliced(text)
+        same = _rows(graph.query(prepare(unsliced, False))) == _rows(graph.query(prepare(unsliced, True)))
+        report.append({"query": label, "changes": changes, "before_ms": before["p50_ms"],
+                       "after_ms": after["p50_ms"], "same_rows": same, "rows": rows})
+    return {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "triples": len(graph),
+                 "warmup": args.warmup, "repeat": args.repeat},
+        "queries": report,
+    }
+
+
+def print_results(report):
+    print(f"{'query':<7}{'rows':>6}{'before':>10}{'after':>10}{'speedup':>9}  changes")
+    for row in report["queries"]:
+        speedup = row["before_ms"] / row["after_ms"] if row["after_ms"] > 0 else float("inf")
+        changes = ", ".join(f"{name} {count}" for name, count in row["changes"].items() if count) or "-"
+        marker = "" if row["same_rows"] else "  RESULTS DIFFER"
+        print(f"{row['query']:<7}{row['rows']:>6}{row['before_ms']:>10.2f}{row['after_ms']:>10.2f}"
+              f"{speedup:>8.1f}x  {changes}{marker}")
+    before = sum(row["before_ms"] for row in report["queries"])
+    after = sum(row["after_ms"] for row in report["queries"])
+    print(f"\nTotal p50: {before:.1f} ms -> {after:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rdflib execution time of generated SPARQL before/after optimize_query().")
+    parser.add_argument("--recordings", default=RECORDINGS_PATH, help="Recorded LLM responses and question list")
+    parser.add_argument("--examples", default=str(SPARQL_EXAMPLES_PATH), help="Validated question -> SPARQL library")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Results JSON path (default: data/cache/benchmarks/query_optimizer_<time>.json)")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_results(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"query_optimizer_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Saved results to {output}")
+    if not all(row["same_rows"] for row in report["queries"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import io
+import os
+import sys
+import json
+import argparse
+import contextlib
+from datetime import datetime
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import CACHE_DIR
+from app.services.rag_pipeline import load_graph, build_schema_catalog, sparql_prompt
+from app.services.schema_selector import estimate_tokens, query_terms
+from app.services.llm_backend import ReplayBackend
+
+RECORDINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "competency_recordings.json")
+RESULTS_DIR = CACHE_DIR / "benchmarks"
+
+
+def run(args):
+    """
+    Full vs pruned SPARQL prompt size per question, and whether the pruned
+    schema still covers every term of the recorded query.
+    """
+    with open(args.recordings, "r") as f:
+        questions = json.load(f)["questions"]
+    recorded = ReplayBackend(args.recordings)
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = load_graph()
+    catalog = build_schema_catalog(graph)
+
+    rows = []
+    for question in questions:
+        full = sparql_prompt(question, str(catalog))
+        pruned = sparql_prompt(question, catalog)
+        selection = catalog.select(question)
+        query = recorded.responses.respond(f"into a SPARQL\n{question}")
+        missing = sorted(query_terms(query) - selection.terms) if query else None
+        rows.append({
+            "question": question,
+            "full_chars": len(full),
+            "pruned_chars": len(pruned),
+            "full_tokens": estimate_tokens(full),
+            "pruned_tokens": estimate_tokens(pruned),
+            "examples": [example.question for example in selection.examples],
+            "missing_terms": missing,
+        })
+    full_tokens = sum(row["full_tokens"] for row in rows)
+    pruned_tokens = sum(row["pruned_tokens"] for row in rows)
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "triples": len(graph),
+            "library_examples": len(catalog.examples),
+            "max_examples": catalog.max_examples,
+        },
+        "summary": {
+            "full_tokens": full_tokens,
+            "pruned_tokens": pruned_tokens,
+            "reduction": 1 - pruned_tokens / full_tokens if full_tokens else 0.0,
+            "covered": sum(1 for row in rows if row["missing_terms"] == []),
+            "recorded": sum(1 for row in rows if row["missing_terms"] is not None),
+        },
+        "questions": rows,
+    }
+
+
+def print_results(report):
+    print(f"{'#':<4}{'full':>7}{'pruned':>8}{'saved':>8}  missing terms / question")
+    for i, row in enumerate(report["questions"], 1):
+        saved = 1 - row["pruned_tokens"] / row["full_tokens"]
+        missing = "-" if row["missing_terms"] is None else (", ".join(row["missing_terms"]) or "none")
+        print(f"q{i:<3}{row['full_tokens']:>7}{row['pruned_tokens']:>8}{saved:>8.0%}  {missing} / {row['question']}")
+    summary = report["summary"]
+    print(f"\nEstimated prompt tokens: {summary['full_tokens']} -> {summary['pruned_tokens']} "
+          f"({summary['reduction']:.0%} fewer); recorded queries fully covered: "
+          f"{summary['covered']}/{summary['recorded']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token cost of the full vs relevance-pruned SPARQL prompt.")
+    parser.add_argument("--recordings", default=RECORDINGS_PATH, help="Question list and recorded SPARQL")
+    parser.add_argument("--output", help="Results JSON path (default: data/cache/benchmarks/schema_prompt_<time>.json)")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_results(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"schema_prompt_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
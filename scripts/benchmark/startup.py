@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import GRAPH_SNAPSHOT_PATH
+from app.services.rag_pipeline import load_graph
+
+
+def _time_load(use_snapshot, repeat):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        g = load_graph(use_snapshot=use_snapshot)
+        timings.append(time.perf_counter() - start)
+        size = len(g)
+    return timings, size
+
+
+def run(repeat=5):
+    print("=== Startup Benchmark: Turtle parse vs graph snapshot ===")
+
+    parse_times, parse_size = _time_load(False, repeat)
+
+    # Make sure the snapshot exists and is current before timing it
+    if os.path.exists(GRAPH_SNAPSHOT_PATH):
+        os.remove(GRAPH_SNAPSHOT_PATH)
+    start = time.perf_counter()
+    load_graph(use_snapshot=True)
+    build_time = time.perf_counter() - start
+
+    snap_times, snap_size = _time_load(True, repeat)
+
+    if parse_size != snap_size:
+        print(f"WARNING: triple counts differ (parse={parse_size}, snapshot={snap_size})")
+
+    parse_best, snap_best = min(parse_times), min(snap_times)
+    print("\n--- Results ---")
+    print(f"Triples:                  {parse_size}")
+    print(f"Turtle parse (best/avg):  {parse_best:.3f}s / {sum(parse_times) / repeat:.3f}s")
+    print(f"Snapshot build (once):    {build_time:.3f}s")
+    print(f"Snapshot load (best/avg): {snap_best:.3f}s / {sum(snap_times) / repeat:.3f}s")
+    print(f"Speedup:                  {parse_best / snap_best:.1f}x")
+    print(f"Snapshot size:            {os.path.getsize(GRAPH_SNAPSHOT_PATH) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cold graph parse time with snapshot load time.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.repeat)
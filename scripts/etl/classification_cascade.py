@@ -0,0 +1,227 @@
+import re
+from collections import Counter, defaultdict
+
+from scripts.etl.menu_names import canonical_name
+
+CONFIDENCE_THRESHOLD = 0.85  # below this a name goes to the LLM
+RULE_CONFIDENCE = 0.9        # a keyword match in the main dish
+NEIGHBOURS = 3               # classified names voting on each field
+MIN_SIMILARITY = 0.5         # bigram Dice similarity for a name to count as a neighbour
+
+FIELDS = ("cuisineType", "containsMeat", "carbType", "isSpicy")
+
+# Keyword rules per field: value -> regular expressions. Absence of a keyword
+# is not evidence, so there are no rules for containsMeat/isSpicy = false.
+RULES = {
+    "carbType": {
+        "Noodle": ("면", "국수", "우동", "라멘", "소바", "짬뽕", "짜장", "파스타", "스파게티", "까르보나라"),
+        "Rice": ("밥", "덮밥", "라이스", "리조또", "도리아", "카레라이스"),
+        "Bread": ("빵", "토스트", "버거", "샌드위치", "베이글", "피자", "와플"),
+        # Dishes served without a staple, unless a later keyword says otherwise ("김치찌개(밥포함)")
+        "None": ("찌개", "탕", "국(?!수)", "구이", "볶음", "무침", "조림", "튀김", "찜", "샐러드",
+                 "스테이크", "치킨", "강정", "까스", "가스", "카츠"),
+    },
+    "cuisineType": {
+        "Korean": ("찌개", "국밥", "비빔밥", "김치", "된장", "나물", "무침", "떡볶이", "김밥", "찜닭",
+                   "감자탕", "해장국", "백숙", "장조림", "미역국", "제육", "불고기", "닭갈비", "순두부"),
+        "Chinese": ("짜장", "짬뽕", "탕수육", "마파", "깐풍", "유린기", "춘권", "교자", "양장피", "짬짜"),
+        "Japanese": ("우동", "라멘", "소바", "규동", "돈부리", "초밥", "스시", "미소", "카레", "야끼",
+                     "오코노미", "가츠동", "카츠동"),
+        "Western": ("파스타", "스파게티", "까르보나라", "버거", "스테이크", "샐러드", "피자", "리조또",
+                    "샌드위치", "토스트", "베이크", "그라탕", "오므라이스"),
+    },
+    "containsMeat": {
+        True: ("돈까스", "돈가스", "카츠", "치킨", "닭", "돼지", "소고기", "쇠고기", "삼겹", "목살", "제육",
+               "불고기", "베이컨", "햄", "스팸", "소시지", "소세지", "갈비", "비프", "육회", "등심", "차슈",
+               "통다리", "함박", "미트"),
+    },
+    "isSpicy": {
+        # 불 but not 불고기 or 숯불
+        True: ("(?<!숯)불(?!고기)", "매운", "매콤", "얼큰", "짬뽕", "김치찌개", "떡볶이", "마라",
+               "고추장", "칠리", "핫"),
+    },
+}
+
+_RULE_PATTERNS = {
+    field: [(value, re.compile("|".join(keywords))) for value, keywords in values.items()]
+    for field, values in RULES.items()
+}
+
+
+def main_dish(key):
+    """
+    The first dish of a set menu ("돈까스&우동", "짬뽕+짜장"), which decides its classification.
+    """
+    for part in re.split(r"[&+/,]", key):
+        if part:
+            return part
+    return key
+
+
+def rule_fields(name):
+    """
+    Field values the keyword rules give for name, as {field: (value, confidence)}.
+    In Korean the head of a compound comes last ("짬뽕밥" is rice), so the
+    match ending furthest right wins.
+    """
+    dish = main_dish(canonical_name(name))
+    fields = {}
+    for field, patterns in _RULE_PATTERNS.items():
+        best = None
+        for value, pattern in patterns:
+            for match in pattern.finditer(dish):
+                if best is None or match.end() > best[0]:
+                    best = (match.end(), value)
+        if best is not None:
+            fields[field] = (best[1], RULE_CONFIDENCE)
+    return fields
+
+
+def bigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class NgramIndex:
+    """
+    Character-bigram index over classified canonical names, for near-duplicate lookups.
+    """
+
+    def __init__(self, items=()):
+        self._grams = {}
+        self._values = {}
+        self._postings = defaultdict(list)
+        for key, value in items:
+            self.add(key, value)
+
+    def add(self, key, value):
+        if key in self._grams:
+            self._values[key] = value
+            return
+        grams = bigrams(key)
+        self._grams[key] = grams
+        self._values[key] = value
+        for gram in grams:
+            self._postings[gram].append(key)
+
+    def __len__(self):
+        return len(self._grams)
+
+    def nearest(self, key, k=NEIGHBOURS, min_similarity=MIN_SIMILARITY, exclude=None):
+        """
+        Up to k (Dice similarity, key, value) of the most similar indexed names,
+        most similar first.
+        """
+        grams = bigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        scored = []
+        for other, count in shared.items():
+            if other == exclude:
+                continue
+            similarity = 2 * count / (len(grams) + len(self._grams[other]))
+            if similarity >= min_similarity:
+                scored.append((similarity, other, self._values[other]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:k]
+
+
+def neighbour_fields(neighbours, rules=None):
+    """
+    Similarity-weighted vote of the neighbours on each field, as {field: (value,
+    confidence)}; confidence is the winner's share of the vote scaled by the
+    best similarity, so a unanimous exact match is 1.0.
+
+    A neighbour does not vote on a field whose value its own keywords explain
+    unless rules (the name's keyword fields) match it: "매운양념치킨" says
+    nothing about whether "양념치킨" is spicy.
+    """
+    rules = rules or {}
+    fields = {}
+    for field in FIELDS:
+        votes, best, total = Counter(), 0.0, 0.0
+        for similarity, key, value in neighbours:
+            explained = rule_fields(key).get(field)
+            if explained and rules.get(field, (None,))[0] != explained[0]:
+                continue
+            votes[value[field]] += similarity
+            best = max(best, similarity)
+            total += similarity
+        if votes:
+            value, weight = max(votes.items(), key=lambda item: (item[1], str(item[0])))
+            fields[field] = (value, best * weight / total)
+    return fields
+
+
+def combine(rules, neighbours):
+    """
+    Picks each field from the more confident source (agreement raises the
+    confidence). Returns (classification or None, confidence, tier).
+    """
+    value, sources, confidence = {}, set(), 1.0
+    for field in FIELDS:
+        candidates = [(c, v, source) for source, fields in (("rules", rules), ("neighbour", neighbours))
+                      for v, c in [fields.get(field, (None, 0.0))] if c > 0]
+        if not candidates:
+            return None, 0.0, None
+        candidates.sort(key=lambda item: -item[0])
+        field_confidence, field_value, source = candidates[0]
+        if len(candidates) == 2 and candidates[1][1] == field_value:
+            field_confidence = 1 - (1 - candidates[0][0]) * (1 - candidates[1][0])
+            sources.update(("rules", "neighbour"))
+        else:
+            sources.add(source)
+        value[field] = field_value
+        confidence = min(confidence, field_confidence)
+    tier = "+".join(sorted(sources, reverse=True))
+    return value, confidence, tier
+
+
+class ClassificationCascade:
+    """
+    Classifies menu names locally where it can, in front of the LLM:
+
+    1. cache: the canonical name is already in the store
+    2. rules / neighbour / rules+neighbour: keyword rules and a similarity-
+       weighted vote of the nearest classified names (character bigrams), field
+       by field; accepted if every field reaches the confidence threshold
+
+    Everything else is left for the LLM. Only LLM (and imported) values serve
+    as neighbours, so local guesses never feed further guesses.
+    """
+
+    def __init__(self, store, threshold=CONFIDENCE_THRESHOLD, neighbours=NEIGHBOURS):
+        self.store = store
+        self.threshold = threshold
+        self.neighbours = neighbours
+        self.index = NgramIndex((key, value) for key, value in store.items() if store.source(key) is None)
+
+    def classify(self, name, exclude=None):
+        """
+        Returns (classification or None, confidence, tier) for one name without
+        consulting the store; exclude leaves one indexed key out of the neighbours.
+        """
+        key = canonical_name(name)
+        rules = rule_fields(name)
+        neighbours = self.index.nearest(key, self.neighbours, exclude=exclude)
+        return combine(rules, neighbour_fields(neighbours, rules))
+
+    def resolve(self, names):
+        """
+        Returns ({name: (classification, tier)} for the names resolved locally,
+        names left for the LLM, Counter of names per tier).
+        """
+        resolved, pending, tiers = {}, [], Counter()
+        for name in names:
+            if name in self.store:
+                resolved[name] = (self.store[name], "cache")
+                tiers["cache"] += 1
+                continue
+            value, confidence, tier = self.classify(name)
+            if value is not None and confidence >= self.threshold:
+                resolved[name] = (value, tier)
+                tiers[tier] += 1
+            else:
+                pending.append(name)
+        return resolved, pending, tiers
@@ -0,0 +1,186 @@
+import os
+import json
+import threading
+
+from scripts.etl.menu_names import canonical_name
+
+
+class ClassificationStore:
+    """
+    Menu classifications keyed by canonical menu name (see menu_names.canonical_name),
+    so spelling and price/size variants of a dish share one entry.
+
+    Backed by an append-only JSON Lines log: every add() writes one line
+    {"key", "names", "value", "source"} (value omitted for lines that only
+    record a new raw name, source only for values not from the LLM), and
+    replaying the log rebuilds the store with the last value per key
+    winning. compact() rewrites the log with one line per key, and
+    export_json() writes the legacy {raw name: classification} JSON.
+
+    Also a read-only mapping: name in store, store[name] and store.get(name)
+    accept raw names and look them up through their canonical key.
+    """
+
+    def __init__(self, log_path=None, json_path=None):
+        self.log_path = log_path
+        self.json_path = json_path
+        self._values = {}
+        self._names = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+        if log_path and os.path.exists(log_path):
+            self._replay(log_path)
+        # Seed from (or catch up with) the JSON export, e.g. after it was updated by a pull
+        if json_path and os.path.exists(json_path) and (
+                not log_path or not os.path.exists(log_path)
+                or os.path.getmtime(json_path) > os.path.getmtime(log_path)):
+            with open(json_path, "r") as f:
+                exported = json.load(f)
+            for name, value in exported.items():
+                if name not in self._names or self._values.get(self._names[name]) != value:
+                    self.add(name, value)
+            self.flush()
+
+    @classmethod
+    def from_json(cls, json_path):
+        """
+        Read-only store over an exported JSON file, without a log.
+        """
+        return cls(None, json_path)
+
+    def _replay(self, path):
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted append
+                    continue
+                self._apply(record)
+
+    def _apply(self, record):
+        key = record["key"]
+        if "value" in record:
+            self._values[key] = record["value"]
+            if record.get("source"):
+                self._sources[key] = record["source"]
+            else:
+                self._sources.pop(key, None)
+        for name in record.get("names", ()):
+            self._names[name] = key
+
+    def _append(self, record):
+        self._apply(record)
+        if self.log_path is None:
+            return
+        if self._log is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            self._log = open(self.log_path, "a")
+        self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add(self, name, value, source=None):
+        """
+        Records the classification of a raw menu name; one appended line.
+        source names where a value not from the LLM came from (a cascade tier).
+        """
+        record = {"key": canonical_name(name), "names": [name], "value": value}
+        if source:
+            record["source"] = source
+        with self._lock:
+            self._append(record)
+
+    def add_names(self, names):
+        """
+        Records raw names whose canonical key is already classified, so the
+        JSON export lists them too.
+        """
+        with self._lock:
+            for name in names:
+                if name not in self._names:
+                    self._append({"key": canonical_name(name), "names": [name]})
+
+    def flush(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.flush()
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def __contains__(self, name):
+        return canonical_name(name) in self._values
+
+    def __getitem__(self, name):
+        return self._values[canonical_name(name)]
+
+    def get(self, name, default=None):
+        return self._values.get(canonical_name(name), default)
+
+    def source(self, name):
+        """
+        The cascade tier that classified name, or None for LLM (and imported) values.
+        """
+        return self._sources.get(canonical_name(name))
+
+    def items(self):
+        """
+        (canonical key, classification) pairs.
+        """
+        return list(self._values.items())
+
+    def __len__(self):
+        return len(self._values)
+
+    def names(self):
+        """
+        Raw names with a classification.
+        """
+        return [name for name, key in self._names.items() if key in self._values]
+
+    def compact(self):
+        """
+        Rewrites the log with one line per key (atomically).
+        """
+        if self.log_path is None:
+            return
+        names_by_key = {}
+        for name, key in sorted(self._names.items()):
+            names_by_key.setdefault(key, []).append(name)
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            tmp_path = f"{self.log_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                for key in sorted(set(self._values) | set(names_by_key)):
+                    record = {"key": key, "names": names_by_key.get(key, [])}
+                    if key in self._values:
+                        record["value"] = self._values[key]
+                    if key in self._sources:
+                        record["source"] = self._sources[key]
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.log_path)
+
+    def export_json(self, path=None):
+        """
+        Writes {raw name: classification} for every classified raw name, the
+        shape menu_classification.json has always had.
+        """
+        path = path or self.json_path
+        exported = {name: self._values[self._names[name]] for name in sorted(self.names())}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(exported, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        if self.log_path and os.path.exists(self.log_path):
+            # The export now matches the log; keep it from being re-imported as newer
+            os.utime(self.log_path)
+        return len(exported)
@@ -1,119 +1,341 @@
 import os
+import sys
 import json
 import re
 import time
-import google.generativeai as genai
-from typing import List, Dict
+import heapq
+import random
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import LLM_BACKEND, MENUS_JSON_PATH, MENU_CLASSIFICATION_PATH, MENU_CLASSIFICATION_LOG_PATH
+from app.services.llm_backend import get_backend
+from scripts.etl.menu_names import parse_menu_line, canonical_name
+from scripts.etl.classification_store import ClassificationStore
+from scripts.etl.streaming import iter_json_array
+from scripts.etl.classification_cascade import ClassificationCascade, CONFIDENCE_THRESHOLD
 
 # Configuration
 API_KEY = os.environ.get("GOOGLE_API_KEY")
 MODEL_NAME = "gemini-2.0-flash-exp"
-BATCH_SIZE = 50 
-CACHE_FILE = "data/menu_classification.json"
-INPUT_FILE = "menus.json"
+BATCH_SIZE = 50
+MIN_BATCH_SIZE = 5
+MAX_BATCH_SIZE = 100
+CONCURRENCY = 4                # batches in flight
+REQUESTS_PER_SECOND = 1.0      # token bucket refill rate
+BURST = 4                      # token bucket capacity
+MAX_ATTEMPTS = 4               # per item, then it is left for the next run
+RESPONSE_BUDGET_CHARS = 12000  # keep batches below the size where responses get truncated
 
-if not API_KEY:
-    print("Warning: GOOGLE_API_KEY environment variable not set. Please set it to run classification.")
+CLASSIFICATION_FIELDS = {"cuisineType": str, "containsMeat": bool, "carbType": str, "isSpicy": bool}
 
-def load_unique_menus() -> List[str]:
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    input_path = os.path.join(base_dir, INPUT_FILE)
-    
-    with open(input_path, 'r') as f:
-        data = json.load(f)
-    
-    unique_names = set()
-    
-    for day in data:
-        for meal in ['breakfast', 'lunch', 'dinner']:
-            if meal not in day: continue
-            desc = day[meal].get('description', '')
-            if not desc: continue
-            
-            # Extract names similar to generate_knowledge_graph.py
-            lines = desc.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith("<") or line.startswith("※"):
-                    continue
-                # Remove price
-                name = re.sub(r'[:\-]?\s*[0-9,]+원.*', '', line).strip()
-                if len(name) > 1:
-                    unique_names.add(name)
-                    
-    return sorted(list(unique_names))
+if not API_KEY and LLM_BACKEND == "gemini":
+    print("Warning: GOOGLE_API_KEY environment variable not set. Please set it to run classification.")
 
-def classify_batch(names: List[str]) -> Dict[str, Dict]:
-    if not API_KEY:
-        return {} # Mock return or skip
-    
-    genai.configure(api_key=API_KEY)
-    model = genai.GenerativeModel(MODEL_NAME)
-    
-    prompt = """
+PROMPT = """
     You are a food ontology expert. Classify the following menu items (Korean university cafeteria food).
     Return a JSON object where keys are the menu names and values are objects with these properties:
     - cuisineType: String (Korean, Western, Chinese, Japanese, Other)
     - containsMeat: Boolean (true if meat/poultry/ham is main ingredient, false for vegetarian/seafood-only)
     - carbType: String (Rice, Noodle, Bread, None)
     - isSpicy: Boolean (true if spicy based on name like 'bull', 'hot', 'spicy')
-    
+
     Input items:
     {items}
-    
+
     Output JSON only.
     """
-    
+
+def load_unique_menus(input_path=MENUS_JSON_PATH) -> List[str]:
+    unique_names = set()
+
+    # Records are read one at a time; only the distinct names are kept
+    for day in iter_json_array(input_path):
+        for meal in ['breakfast', 'lunch', 'dinner']:
+            if meal not in day: continue
+            desc = day[meal].get('description', '')
+            if not desc: continue
+
+            # Same name extraction as generate_knowledge_graph.py
+            for line in desc.split('\n'):
+                parsed = parse_menu_line(line)
+                if parsed:
+                    unique_names.add(parsed[0])
+
+    return sorted(list(unique_names))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens per second, up to capacity banked.
+    A rate of 0 or less disables the limit.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until tokens are available and takes them.
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_for = (tokens - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class AdaptiveBatchSize:
+    """
+    Batch size that grows while responses come back complete and shrinks on
+    errors and partial responses, capped so the expected response (chars per
+    item seen so far) stays within RESPONSE_BUDGET_CHARS.
+    """
+
+    def __init__(self, initial=BATCH_SIZE, minimum=MIN_BATCH_SIZE, maximum=MAX_BATCH_SIZE,
+                 budget_chars=RESPONSE_BUDGET_CHARS):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.budget_chars = budget_chars
+        self.chars_per_item = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            size = self.size
+            if self.chars_per_item:
+                size = min(size, int(self.budget_chars / self.chars_per_item))
+            return max(self.minimum, min(self.maximum, size))
+
+    def record(self, requested, classified, response_chars):
+        with self._lock:
+            if classified:
+                per_item = response_chars / classified
+                # Exponential moving average of response size per item
+                self.chars_per_item = per_item if self.chars_per_item is None else 0.7 * self.chars_per_item + 0.3 * per_item
+            if classified == requested:
+                self.size = min(self.maximum, self.size + max(1, self.size // 4))
+            else:
+                self.size = max(self.minimum, self.size // 2)
+
+    def failed(self):
+        with self._lock:
+            self.size = max(self.minimum, self.size // 2)
+
+
+def _valid(entry):
+    return isinstance(entry, dict) and all(isinstance(entry.get(k), t) for k, t in CLASSIFICATION_FIELDS.items())
+
+
+def parse_response(text: str, names: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    Extracts classifications for the requested names from a model response.
+    Truncated or malformed JSON is salvaged entry by entry. Returns the valid
+    entries and the names that still need classifying.
+    """
+    text = text.strip()
+    # Cleanup json block format if present
+    text = re.sub(r"^```(?:json)?\s*", "", text)
+    text = re.sub(r"\s*```$", "", text)
+
     try:
-        response = model.generate_content(prompt.format(items=json.dumps(names, ensure_ascii=False)))
-        text = response.text.strip()
-        # Cleanup json block format if present
-        if text.startswith("```json"):
-            text = text[7:-3]
-        elif text.startswith("```"):
-            text = text[3:-3]
-            
-        return json.loads(text)
-    except Exception as e:
-        print(f"Error classifying batch: {e}")
-        return {}
-
-def run():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    cache_path = os.path.join(base_dir, CACHE_FILE)
-    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-    
-    # Load existing cache
-    known_map = {}
-    if os.path.exists(cache_path):
-        with open(cache_path, 'r') as f:
-            known_map = json.load(f)
-            
-    all_names = load_unique_menus()
-    unknown_names = [n for n in all_names if n not in known_map]
-    
-    print(f"Total items: {len(all_names)}, Known: {len(known_map)}, To classify: {len(unknown_names)}")
-    
-    if not unknown_names:
+        parsed = json.loads(text)
+        if not isinstance(parsed, dict):
+            parsed = {}
+    except ValueError:
+        parsed = {}
+        decoder = json.JSONDecoder()
+        for match in re.finditer(r'"((?:[^"\\]|\\.)*)"\s*:\s*(?=\{)', text):
+            try:
+                key = json.loads(f'"{match.group(1)}"')
+                value, _ = decoder.raw_decode(text, match.end())
+            except ValueError:
+                continue
+            parsed[key] = value
+
+    wanted = set(names)
+    results = {name: entry for name, entry in parsed.items() if name in wanted and _valid(entry)}
+    return results, [name for name in names if name not in results]
+
+
+def classify_batch(names: List[str], limiter: TokenBucket = None) -> Tuple[Dict[str, Dict], List[str], int]:
+    """
+    Classifies one batch with a single request. Returns (valid classifications,
+    names missing from the response, response length); errors propagate to
+    classify_all, which retries through the limiter.
+    """
+    backend = get_backend(MODEL_NAME, max_retries=0)
+    if limiter is not None:
+        limiter.acquire()
+    text = backend.generate(PROMPT.format(items=json.dumps(names, ensure_ascii=False)))
+    results, missing = parse_response(text, names)
+    return results, missing, len(text)
+
+
+def classify_all(names, store, concurrency=CONCURRENCY, rate=REQUESTS_PER_SECOND,
+                 burst=BURST, batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Classifies names with up to concurrency batches in flight. Names missing
+    from a response, or from a batch that failed, are re-queued after a
+    jittered exponential backoff until max_attempts. Results are appended to
+    the store as they arrive. Returns run statistics.
+    """
+    limiter = TokenBucket(rate, burst)
+    sizer = AdaptiveBatchSize(initial=batch_size)
+    # (ready_at, name, attempts): names become eligible again once their backoff passes
+    queue = [(0.0, name, 0) for name in names]
+    heapq.heapify(queue)
+    stats = {"classified": 0, "requests": 0, "failed_requests": 0, "requeued": 0, "given_up": []}
+    start = time.perf_counter()
+
+    def requeue(batch, error=False):
+        for name, attempts in batch:
+            if attempts + 1 >= max_attempts:
+                stats["given_up"].append(name)
+                continue
+            delay = min(30.0, 0.5 * 2 ** attempts) * random.uniform(0.5, 1.0) if error else 0.0
+            heapq.heappush(queue, (time.monotonic() + delay, name, attempts + 1))
+            stats["requeued"] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+        while queue or in_flight:
+            now = time.monotonic()
+            while queue and len(in_flight) < concurrency and queue[0][0] <= now:
+                size = sizer.current()
+                batch = []
+                while queue and len(batch) < size and queue[0][0] <= now:
+                    _, name, attempts = heapq.heappop(queue)
+                    batch.append((name, attempts))
+                future = pool.submit(classify_batch, [name for name, _ in batch], limiter)
+                in_flight[future] = batch
+                stats["requests"] += 1
+
+            if not in_flight:
+                # Everything left is backing off
+                time.sleep(max(0.0, queue[0][0] - time.monotonic()))
+                continue
+
+            # Wake up for a backed-off name only if a slot is free to send it
+            timeout = None
+            if queue and len(in_flight) < concurrency:
+                timeout = max(0.05, queue[0][0] - now)
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    results, missing, response_chars = future.result()
+                except Exception as e:
+                    print(f"Error classifying batch of {len(batch)}: {type(e).__name__}: {e}")
+                    stats["failed_requests"] += 1
+                    sizer.failed()
+                    requeue(batch, error=True)
+                    continue
+
+                sizer.record(len(batch), len(results), response_chars)
+                if missing:
+                    print(f"Batch of {len(batch)} returned {len(results)} valid items; re-queueing {len(missing)}.")
+                    missing = set(missing)
+                    requeue([(name, attempts) for name, attempts in batch if name in missing], error=True)
+                if results:
+                    for name, value in results.items():
+                        store.add(name, value)
+                    store.flush()
+                    stats["classified"] += len(results)
+                    elapsed = time.perf_counter() - start
+                    print(f"Saved {len(results)} items ({stats['classified']}/{len(names)}, "
+                          f"{stats['classified'] / elapsed:.1f} items/s, batch size {sizer.current()}).")
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["items_per_second"] = stats["classified"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    stats["final_batch_size"] = sizer.current()
+    return stats
+
+
+def run(menus_path=MENUS_JSON_PATH, cache_path=MENU_CLASSIFICATION_PATH, log_path=MENU_CLASSIFICATION_LOG_PATH,
+        concurrency=CONCURRENCY, rate=REQUESTS_PER_SECOND, batch_size=BATCH_SIZE,
+        threshold=CONFIDENCE_THRESHOLD, cascade=True):
+    # Classifications live in an append-only log keyed by canonical name; the
+    # JSON file is seeded from on first use and re-exported at the end
+    store = ClassificationStore(log_path, cache_path)
+
+    all_names = load_unique_menus(menus_path)
+    variants = {}
+    for name in all_names:
+        variants.setdefault(canonical_name(name), []).append(name)
+    representatives = [names[0] for names in variants.values()]
+
+    # Cache, keyword rules and nearest classified names first; the LLM only
+    # sees what they cannot classify confidently
+    if cascade:
+        resolved, unknown_names, tiers = ClassificationCascade(store, threshold).resolve(representatives)
+        for name, (value, tier) in resolved.items():
+            if tier != "cache":
+                store.add(name, value, source=tier)
+        store.flush()
+    else:
+        unknown_names = [name for name in representatives if name not in store]
+        tiers = Counter(cache=len(representatives) - len(unknown_names))
+
+    print(f"Total items: {len(all_names)} ({len(variants)} distinct), Known: {tiers['cache']}, "
+          f"Resolved locally: {sum(tiers.values()) - tiers['cache']}, To classify: {len(unknown_names)}")
+
+    stats = None
+    if unknown_names:
+        try:
+            get_backend(MODEL_NAME, max_retries=0).check()
+        except ValueError as e:
+            print(f"Cannot classify: {e}")
+            unknown_names = []
+
+    if unknown_names:
+        stats = classify_all(unknown_names, store, concurrency=concurrency, rate=rate, batch_size=batch_size)
+        print(f"Classified {stats['classified']} items in {stats['seconds']:.1f}s "
+              f"({stats['items_per_second']:.1f} items/s, {stats['requests']} requests, "
+              f"{stats['failed_requests']} failed, {stats['requeued']} re-queued).")
+        if stats["given_up"]:
+            print(f"Gave up on {len(stats['given_up'])} items after {MAX_ATTEMPTS} attempts; rerun to retry them.")
+        tiers["llm"] = stats["classified"]
+    else:
         print("All items classified.")
-        return
-
-    # Process in batches
-    for i in range(0, len(unknown_names), BATCH_SIZE):
-        batch = unknown_names[i:i+BATCH_SIZE]
-        print(f"Processing batch {i} to {i+len(batch)}...")
-        
-        results = classify_batch(batch)
-        if results:
-            known_map.update(results)
-            # Save intermediate
-            with open(cache_path, 'w') as f:
-                json.dump(known_map, f, indent=2, ensure_ascii=False)
-            print(f"Saved {len(results)} items.")
-        
-        time.sleep(1) # Rate limit courtesy
+    print("Resolved by tier: " + ", ".join(f"{tier} {count}" for tier, count in sorted(tiers.items())))
 
+    # Variants of classified names reuse their classification
+    store.add_names(name for name in all_names if name in store)
+    store.compact()
+    exported = store.export_json(cache_path)
+    store.close()
+    print(f"Exported {exported} names to {cache_path}.")
     print("Classification Done.")
+    stats = dict(stats or {}, tiers=dict(tiers))
+    return stats
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Classify menu items with the LLM backend.")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Batches in flight")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="Requests per second (0 for no limit)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Initial batch size")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD,
+                        help="Confidence needed to classify a name without the LLM")
+    parser.add_argument("--no-cascade", action="store_true", help="Send every unknown name to the LLM")
+    args = parser.parse_args()
+    run(concurrency=args.concurrency, rate=args.rate, batch_size=args.batch_size,
+        threshold=args.threshold, cascade=not args.no_cascade)
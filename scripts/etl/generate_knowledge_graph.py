@@ -1,15 +1,42 @@
 import json
 import re
 import os
+import sys
+import time
+import argparse
 import urllib.parse
 import hashlib
+import functools
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from rdflib import Graph, Literal, RDF, URIRef, Namespace
 from rdflib.namespace import XSD, RDFS, OWL
 
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import MENUS_JSON_PATH, VENUES_LOCATION_JSON_PATH, MENU_CLASSIFICATION_PATH
+from config import ABOX_FINAL_PATH, ABOX_MANIFEST_PATH, ABOX_PARTS_DIR
+from scripts.etl.menu_names import parse_menu_line
+from scripts.etl.classification_store import ClassificationStore
+from scripts.etl.streaming import iter_json_array, NTriplesWriter, WRITE_CHUNK_TRIPLES
+from app.services.time_index import parse_time_range, format_clock
+
 # Namespaces
 SNU = Namespace("http://snu.ac.kr/dining/")
 
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner']
+
+# Bump when the triples emitted for a service change, so incremental runs rebuild every part
+GENERATOR_VERSION = 3
+
+# Literals of a service repeat across items and services (classification
+# values, meal types, dates); Literals are immutable, so they are shared
+_literal = functools.lru_cache(maxsize=1 << 16, typed=True)(Literal)
+
 def make_safe_uri(base, *parts):
     # Use MD5 hash to ensure URIs are valid NCNames (safe for all parsers)
     # This avoids issues with Korean characters, spaces, or percent-encoding in PNAMEs.
@@ -19,192 +46,635 @@ def make_safe_uri(base, *parts):
     safe_id = f"x{hash_object.hexdigest()}"
     return base[safe_id]
 
-def run():
-    g = Graph()
-    g.bind("snu", SNU)
-    g.bind("owl", OWL)
-    
-    # Load raw data
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    with open(os.path.join(base_dir, 'venues_location.json'), 'r') as f:
+def load_inputs(menus_path=MENUS_JSON_PATH, venues_path=VENUES_LOCATION_JSON_PATH,
+                classification_path=MENU_CLASSIFICATION_PATH, stream=False):
+    """
+    Returns (venues, menu records, classifications). With stream=True the menu
+    records are a generator reading menus.json incrementally.
+    """
+    with open(venues_path, 'r') as f:
         venues_data = json.load(f)
-    with open(os.path.join(base_dir, 'menus.json'), 'r') as f:
-        menus_data = json.load(f)
-
-    # Load Classification Data (LLM results)
-    cls_path = os.path.join(base_dir, 'data', 'menu_classification.json')
-    menu_classification = {}
-    if os.path.exists(cls_path):
-        with open(cls_path, 'r') as f:
-            menu_classification = json.load(f)
+    if stream:
+        menus_data = iter_json_array(menus_path)
     else:
+        with open(menus_path, 'r') as f:
+            menus_data = json.load(f)
+
+    # Load Classification Data (LLM results), looked up by canonical menu name
+    menu_classification = ClassificationStore.from_json(classification_path)
+    if not os.path.exists(classification_path):
         print("Warning: menu_classification.json not found. Run classify_menus.py first.")
+    return venues_data, menus_data, menu_classification
 
-    # 1. Process Venues
-    venue_map = {} # map id to URI
-    for v in venues_data['venues']:
-        vid = v['venue_id']
-        venue_uri = make_safe_uri(SNU, "Venue", vid)
-        venue_map[vid] = venue_uri
-        
-        g.add((venue_uri, RDF.type, SNU.Venue))
-        g.add((venue_uri, SNU.venueId, Literal(vid, datatype=XSD.string)))
-        g.add((venue_uri, SNU.name, Literal(v['display_name'] or vid, datatype=XSD.string)))
-        if v.get('place_name'):
-            g.add((venue_uri, SNU.placeName, Literal(v['place_name'], datatype=XSD.string)))
-        if v.get('address'):
-            g.add((venue_uri, SNU.address, Literal(v['address'], datatype=XSD.string)))
-        if v.get('phone'):
-            g.add((venue_uri, SNU.phone, Literal(v['phone'], datatype=XSD.string)))
-        if v.get('building'):
-            g.add((venue_uri, SNU.building, Literal(v['building'], datatype=XSD.string)))
-        if v.get('floor'):
-            g.add((venue_uri, SNU.floor, Literal(v['floor'], datatype=XSD.integer)))
-        if v.get('lat') and v.get('lng'):
-            g.add((venue_uri, SNU.geoLat, Literal(v['lat'], datatype=XSD.decimal)))
-            g.add((venue_uri, SNU.geoLng, Literal(v['lng'], datatype=XSD.decimal)))
+def venue_triples(v):
+    """
+    Triples describing one entry of venues_location.json.
+    """
+    vid = v['venue_id']
+    venue_uri = make_safe_uri(SNU, "Venue", vid)
+    triples = [
+        (venue_uri, RDF.type, SNU.Venue),
+        (venue_uri, SNU.venueId, Literal(vid, datatype=XSD.string)),
+        (venue_uri, SNU.name, Literal(v['display_name'] or vid, datatype=XSD.string)),
+    ]
+    if v.get('place_name'):
+        triples.append((venue_uri, SNU.placeName, Literal(v['place_name'], datatype=XSD.string)))
+    if v.get('address'):
+        triples.append((venue_uri, SNU.address, Literal(v['address'], datatype=XSD.string)))
+    if v.get('phone'):
+        triples.append((venue_uri, SNU.phone, Literal(v['phone'], datatype=XSD.string)))
+    if v.get('building'):
+        triples.append((venue_uri, SNU.building, Literal(v['building'], datatype=XSD.string)))
+    if v.get('floor'):
+        triples.append((venue_uri, SNU.floor, Literal(v['floor'], datatype=XSD.integer)))
+    if v.get('lat') and v.get('lng'):
+        triples.append((venue_uri, SNU.geoLat, Literal(v['lat'], datatype=XSD.decimal)))
+        triples.append((venue_uri, SNU.geoLng, Literal(v['lng'], datatype=XSD.decimal)))
+    return triples
 
-    # 2. Process Menus
+def resolve_venue(rest_name, venue_map):
+    """
+    Returns (venue_uri, extra_triples). Restaurants missing from
+    venues_location.json get an ad-hoc Venue described by extra_triples.
+    """
+    # Try finding venue by name mapping (venue_id)
+    # Note: raw data venue_id matches rest_name usually
+    venue_uri = venue_map.get(rest_name)
+    if venue_uri:
+        return venue_uri, []
+    # Fallback for unknown venues in menu (create ad-hoc)
+    venue_uri = make_safe_uri(SNU, "Venue", rest_name)
+    return venue_uri, [
+        (venue_uri, RDF.type, SNU.Venue),
+        (venue_uri, SNU.name, Literal(rest_name, datatype=XSD.string)),
+    ]
+
+def iter_services(menus_data, venue_map):
+    """
+    Yields (date, restaurant, meal_type, service_data, venue_uri, venue_extra)
+    for every non-empty meal service in menus.json.
+    """
     for m in menus_data:
         date_str = m['date']
         raw_rest_name = m['restaurant']
         # Clean restaurant name (remove "* " prefix)
         rest_name = raw_rest_name.replace("* ", "").strip()
-        
-        # Try finding venue by name mapping (venue_id)
-        # Note: raw data venue_id matches rest_name usually
-        venue_uri = venue_map.get(rest_name)
-        if not venue_uri:
-            # Fallback for unknown venues in menu (create ad-hoc)
-            venue_uri = make_safe_uri(SNU, "Venue", rest_name)
-            g.add((venue_uri, RDF.type, SNU.Venue))
-            g.add((venue_uri, SNU.name, Literal(rest_name, datatype=XSD.string)))
-
-        for meal_type in ['breakfast', 'lunch', 'dinner']:
+        venue_uri, venue_extra = resolve_venue(rest_name, venue_map)
+
+        for meal_type in MEAL_TYPES:
             if meal_type not in m:
                 continue
-            
+
             service_data = m[meal_type]
             # Skip if empty
             if not service_data.get('description') and not service_data.get('items') and not service_data.get('time'):
                 continue
-            
-            # Create MealService URI
-            service_uri = make_safe_uri(SNU, "Service", date_str, rest_name, meal_type)
-            g.add((service_uri, RDF.type, SNU.MealService))
-            g.add((service_uri, SNU.providedAt, venue_uri))
-            g.add((venue_uri, SNU.offers, service_uri))
-            g.add((service_uri, SNU.date, Literal(date_str, datatype=XSD.date)))
-            g.add((service_uri, SNU.mealType, Literal(meal_type, datatype=XSD.string)))
-            
-            # Time parsing
-            raw_time = service_data.get('time')
-            if raw_time:
-                g.add((service_uri, SNU.timeRange, Literal(raw_time, datatype=XSD.string)))
-                # Regex for HH:MM~HH:MM or HH:MM
-                time_match = re.search(r'(\d{1,2}:\d{2})\s*~\s*(\d{1,2}:\d{2})', raw_time)
-                if time_match:
-                    start_t, end_t = time_match.groups()
-                    # format to HH:MM:00 for xsd:time
-                    if len(start_t) == 4: start_t = '0' + start_t
-                    if len(end_t) == 4: end_t = '0' + end_t
-                    g.add((service_uri, SNU.timeStart, Literal(f"{start_t}:00", datatype=XSD.time)))
-                    g.add((service_uri, SNU.timeEnd, Literal(f"{end_t}:00", datatype=XSD.time)))
-
-            description = service_data.get('description', '')
-            if description:
-                g.add((service_uri, SNU.description, Literal(description, datatype=XSD.string)))
-                
-                # Check for "Buffet"
-                if "뷔페" in description or "세미뷔페" in description:
-                    g.add((service_uri, SNU.serviceStyle, Literal("Buffet", datatype=XSD.string)))
-                
-                # Check for Crowd Time
-                # Pattern: ※ 혼잡시간 : 11:30~12:30
-                crowd_match = re.search(r'혼잡시간\s*[:]\s*([0-9:~]+)', description)
-                if crowd_match:
-                    g.add((service_uri, SNU.crowdTimeRange, Literal(crowd_match.group(1), datatype=XSD.string)))
-
-            # 3. Process MenuItems from Description
-            # Many menus are in description line by line e.g. "Name : Price"
-            lines = description.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if not line: continue
-                if line.startswith("<") or line.startswith("※"):
-                    continue
-
-                # Pattern: capture name and price
-                price_match = re.search(r'([0-9,]+)원', line)
-                price = None
-                name = line
-                if price_match:
-                    price_str = price_match.group(1).replace(',', '')
-                    if price_str.isdigit():
-                        price = int(price_str)
-                    name = re.sub(r'[:\-]?\s*[0-9,]+원.*', '', line).strip()
-                
-                if not name: continue
-                if len(name) < 2: continue # Ignore short noise
-
-                # Create MenuItem
-                # Hash based on name+service to be unique
-                import hashlib
-                item_hash = hashlib.md5(f"{service_uri}_{name}".encode('utf-8')).hexdigest()[:8]
-                item_uri = SNU[f"Item_{item_hash}"]
-                
-                g.add((item_uri, RDF.type, SNU.MenuItem))
-                g.add((item_uri, SNU.partOfService, service_uri))
-                g.add((service_uri, SNU.hasMenu, item_uri))
-                g.add((item_uri, SNU.menuName, Literal(name, datatype=XSD.string)))
-                if price:
-                    g.add((item_uri, SNU.price, Literal(price, datatype=XSD.integer)))
-                
-                # --- LLM-Based Classification ---
-                is_mapped = False
-                if name in menu_classification:
-                    is_mapped = True
-                    info = menu_classification[name]
-                    
-                    # 1. Cuisine Type
-                    if info.get('cuisineType'):
-                        g.add((item_uri, SNU.cuisineType, Literal(info['cuisineType'], datatype=XSD.string)))
-                        # Backward compat logic for SNU.category
-                        if info['cuisineType'] == 'Korean':
-                            g.add((item_uri, SNU.category, Literal("Korean", datatype=XSD.string)))
-                        elif info['cuisineType'] in ['Western', 'Chinese', 'Japanese']:
-                            g.add((item_uri, SNU.category, Literal(info['cuisineType'], datatype=XSD.string)))
-
-                    # 2. Meat
-                    if 'containsMeat' in info:
-                        g.add((item_uri, SNU.containsMeat, Literal(info['containsMeat'], datatype=XSD.boolean)))
-                        if info['containsMeat']:
-                            g.add((item_uri, SNU.category, Literal("Meat", datatype=XSD.string))) # Legacy
-                    
-                    # 3. Carb Type
-                    if info.get('carbType'):
-                         g.add((item_uri, SNU.carbType, Literal(info['carbType'], datatype=XSD.string)))
-                         if info['carbType'] == 'Noodle':
-                              g.add((item_uri, SNU.category, Literal("Noodle", datatype=XSD.string)))
-                         elif info['carbType'] == 'Rice':
-                              g.add((item_uri, SNU.category, Literal("Rice", datatype=XSD.string)))
-
-                    # 4. Spicy
-                    if 'isSpicy' in info:
-                        g.add((item_uri, SNU.isSpicy, Literal(info['isSpicy'], datatype=XSD.boolean)))
-                        if info['isSpicy']:
-                            g.add((item_uri, SNU.tag, Literal("Spicy", datatype=XSD.string)))
-                
-                # --- Fallback Heuristics (only if not mapped or limited info) ---
-                # Still enable basic tags like Takeout from description
-                if "Take-Out" in description or "TAKE-OUT" in description or "테이크아웃" in name:
-                    g.add((item_uri, SNU.consumptionMode, Literal("Takeout", datatype=XSD.string)))
+            yield date_str, rest_name, meal_type, service_data, venue_uri, venue_extra
+
+def service_triples(date_str, rest_name, meal_type, service_data, venue_uri, menu_classification):
+    """
+    Triples of one MealService and its MenuItems.
+    """
+    triples = []
+    add = triples.append
+
+    # Create MealService URI
+    service_uri = make_safe_uri(SNU, "Service", date_str, rest_name, meal_type)
+    add((service_uri, RDF.type, SNU.MealService))
+    add((service_uri, SNU.providedAt, venue_uri))
+    add((venue_uri, SNU.offers, service_uri))
+    add((service_uri, SNU.date, _literal(date_str, datatype=XSD.date)))
+    add((service_uri, SNU.mealType, _literal(meal_type, datatype=XSD.string)))
+
+    # Time parsing
+    raw_time = service_data.get('time')
+    if raw_time:
+        add((service_uri, SNU.timeRange, _literal(raw_time, datatype=XSD.string)))
+        # "HH:MM~HH:MM", or a start only ("17:00", "11")
+        time_range = parse_time_range(raw_time)
+        if time_range:
+            start_t, end_t = time_range
+            add((service_uri, SNU.timeStart, _literal(format_clock(start_t), datatype=XSD.time)))
+            if end_t is not None:
+                add((service_uri, SNU.timeEnd, _literal(format_clock(end_t), datatype=XSD.time)))
+
+    description = service_data.get('description', '')
+    if description:
+        add((service_uri, SNU.description, _literal(description, datatype=XSD.string)))
+
+        # Check for "Buffet"
+        if "뷔페" in description or "세미뷔페" in description:
+            add((service_uri, SNU.serviceStyle, _literal("Buffet", datatype=XSD.string)))
+
+        # Check for Crowd Time
+        # Pattern: ※ 혼잡시간 : 11:30~12:30
+        crowd_match = re.search(r'혼잡시간\s*[:]\s*([0-9:~]+)', description)
+        if crowd_match:
+            add((service_uri, SNU.crowdTimeRange, _literal(crowd_match.group(1), datatype=XSD.string)))
+
+    takeout_service = "Take-Out" in description or "TAKE-OUT" in description
+
+    # Process MenuItems from Description
+    # Many menus are in description line by line e.g. "Name : Price"
+    for line in description.split('\n'):
+        parsed = parse_menu_line(line)
+        if parsed is None:
+            continue
+        name, price = parsed
+
+        # Create MenuItem
+        # Hash based on name+service to be unique
+        item_hash = hashlib.md5(f"{service_uri}_{name}".encode('utf-8')).hexdigest()[:8]
+        item_uri = SNU[f"Item_{item_hash}"]
+
+        add((item_uri, RDF.type, SNU.MenuItem))
+        add((item_uri, SNU.partOfService, service_uri))
+        add((service_uri, SNU.hasMenu, item_uri))
+        add((item_uri, SNU.menuName, _literal(name, datatype=XSD.string)))
+        if price:
+            add((item_uri, SNU.price, _literal(price, datatype=XSD.integer)))
+
+        # --- LLM-Based Classification ---
+        info = menu_classification.get(name)
+        if info is not None:
+
+            # 1. Cuisine Type
+            if info.get('cuisineType'):
+                add((item_uri, SNU.cuisineType, _literal(info['cuisineType'], datatype=XSD.string)))
+                # Backward compat logic for SNU.category
+                if info['cuisineType'] == 'Korean':
+                    add((item_uri, SNU.category, _literal("Korean", datatype=XSD.string)))
+                elif info['cuisineType'] in ['Western', 'Chinese', 'Japanese']:
+                    add((item_uri, SNU.category, _literal(info['cuisineType'], datatype=XSD.string)))
+
+            # 2. Meat
+            if 'containsMeat' in info:
+                add((item_uri, SNU.containsMeat, _literal(info['containsMeat'], datatype=XSD.boolean)))
+                if info['containsMeat']:
+                    add((item_uri, SNU.category, _literal("Meat", datatype=XSD.string))) # Legacy
+
+            # 3. Carb Type
+            if info.get('carbType'):
+                add((item_uri, SNU.carbType, _literal(info['carbType'], datatype=XSD.string)))
+                if info['carbType'] == 'Noodle':
+                    add((item_uri, SNU.category, _literal("Noodle", datatype=XSD.string)))
+                elif info['carbType'] == 'Rice':
+                    add((item_uri, SNU.category, _literal("Rice", datatype=XSD.string)))
+
+            # 4. Spicy
+            if 'isSpicy' in info:
+                add((item_uri, SNU.isSpicy, _literal(info['isSpicy'], datatype=XSD.boolean)))
+                if info['isSpicy']:
+                    add((item_uri, SNU.tag, _literal("Spicy", datatype=XSD.string)))
+
+        # --- Fallback Heuristics (only if not mapped or limited info) ---
+        # Still enable basic tags like Takeout from description
+        if takeout_service or "테이크아웃" in name:
+            add((item_uri, SNU.consumptionMode, _literal("Takeout", datatype=XSD.string)))
+
+    return triples
+
+def build_graph(venues_data, menus_data, menu_classification):
+    g = Graph()
+    g.bind("snu", SNU)
+    g.bind("owl", OWL)
+
+    # 1. Process Venues
+    venue_map = {} # map id to URI
+    for v in venues_data['venues']:
+        triples = venue_triples(v)
+        venue_map[v['venue_id']] = triples[0][0]
+        for t in triples:
+            g.add(t)
+
+    # 2. Process Menus
+    for date_str, rest_name, meal_type, service_data, venue_uri, venue_extra in iter_services(menus_data, venue_map):
+        for t in venue_extra:
+            g.add(t)
+        for t in service_triples(date_str, rest_name, meal_type, service_data, venue_uri, menu_classification):
+            g.add(t)
+    return g
+
+def run(output_path=ABOX_FINAL_PATH, menus_path=MENUS_JSON_PATH):
+    venues_data, menus_data, menu_classification = load_inputs(menus_path)
+    g = build_graph(venues_data, menus_data, menu_classification)
 
     # Save
-    output_path = os.path.join(base_dir, 'abox_final.ttl')
-    g.serialize(destination=output_path, format='turtle')
+    g.serialize(destination=str(output_path), format='turtle')
     print(f"Generated ABox at {output_path} with {len(g)} triples.")
+    return len(g)
+
+
+# --- Streaming mode ---
+#
+# Reads menus.json record by record and writes each service's triples as
+# N-Triples as soon as they are built, in chunks of chunk_triples, so memory
+# does not grow with the size of the archive. Instead of a Graph, duplicates
+# are removed per service (and ad-hoc venues are described once); triples
+# shared across services (a repeated service record, colliding 8-hex item ids)
+# repeat their lines, which collapse on load.
+
+def build_venue_map(venues_data):
+    """
+    Returns ({venue_id: venue URI}, venue triples) for venues_location.json.
+    """
+    venue_map, triples = {}, []
+    for v in venues_data['venues']:
+        venue = venue_triples(v)
+        venue_map[v['venue_id']] = venue[0][0]
+        triples.extend(venue)
+    return venue_map, triples
+
+def _write_services(menus_data, venue_map, menu_classification, writer, adhoc_venues):
+    """
+    Writes the triples of every service in menus_data, deduplicated per service.
+    Ad-hoc venues are collected in adhoc_venues ({uri: triples}) for the caller
+    to write once. Returns the number of services.
+    """
+    services = 0
+    for date_str, rest_name, meal_type, service_data, venue_uri, venue_extra in iter_services(menus_data, venue_map):
+        if venue_extra:
+            adhoc_venues.setdefault(venue_uri, venue_extra)
+        writer.write(dict.fromkeys(service_triples(date_str, rest_name, meal_type, service_data, venue_uri,
+                                                   menu_classification)))
+        services += 1
+    return services
+
+def run_streaming(menus_path=MENUS_JSON_PATH, venues_path=VENUES_LOCATION_JSON_PATH,
+                  classification_path=MENU_CLASSIFICATION_PATH, output_path=ABOX_FINAL_PATH,
+                  chunk_triples=WRITE_CHUNK_TRIPLES):
+    """
+    Writes the same triples as run() to output_path (N-Triples, which is valid
+    Turtle) without building a Graph. Returns a summary dict; "lines" counts the
+    lines written, including triples repeated across services.
+    """
+    start = time.perf_counter()
+    venues_data, menus_data, menu_classification = load_inputs(menus_path, venues_path, classification_path, stream=True)
+    summary = {"services": 0, "lines": 0}
+
+    with NTriplesWriter(output_path, chunk_triples) as writer:
+        venue_map, venue_part = build_venue_map(venues_data)
+        writer.write(dict.fromkeys(venue_part))
+        adhoc_venues = {}
+        summary["services"] = _write_services(menus_data, venue_map, menu_classification, writer, adhoc_venues)
+        for triples in adhoc_venues.values():
+            writer.write(triples)
+        summary["lines"] = writer.count
+
+    summary["seconds"] = time.perf_counter() - start
+    print(f"Streamed ABox: {summary['services']} services, {summary['lines']} lines "
+          f"in {summary['seconds']:.2f}s -> {output_path}")
+    return summary
+
+
+# --- Sharded mode ---
+#
+# Streams menus.json in shards of dates_per_shard consecutive dates to a
+# process pool; each worker writes its shard's N-Triples to a file, and the
+# venue part and the shard files are concatenated in order. At most two shards
+# per worker are in flight, so memory stays bounded like --stream.
+
+DATES_PER_SHARD = 7
+
+_shard_context = None
+
+def _init_shard_worker(venues_path, classification_path):
+    global _shard_context
+    with open(venues_path, 'r') as f:
+        venues_data = json.load(f)
+    venue_map, _ = build_venue_map(venues_data)
+    _shard_context = (venue_map, ClassificationStore.from_json(classification_path))
+
+def _generate_shard(shard_path, records, chunk_triples):
+    """
+    Process-pool worker: writes one shard. Returns (services, lines, ad-hoc venues).
+    """
+    venue_map, menu_classification = _shard_context
+    adhoc_venues = {}
+    with NTriplesWriter(shard_path, chunk_triples) as writer:
+        services = _write_services(records, venue_map, menu_classification, writer, adhoc_venues)
+    return services, writer.count, adhoc_venues
+
+def _date_shards(records, dates_per_shard):
+    shard, dates = [], set()
+    for record in records:
+        if record['date'] not in dates and len(dates) == dates_per_shard:
+            yield shard
+            shard, dates = [], set()
+        dates.add(record['date'])
+        shard.append(record)
+    if shard:
+        yield shard
+
+def _concatenate(paths, output_path):
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(tmp_path, output_path)
+
+def run_sharded(menus_path=MENUS_JSON_PATH, venues_path=VENUES_LOCATION_JSON_PATH,
+                classification_path=MENU_CLASSIFICATION_PATH, output_path=ABOX_FINAL_PATH,
+                workers=None, dates_per_shard=DATES_PER_SHARD, turtle=False, chunk_triples=WRITE_CHUNK_TRIPLES):
+    """
+    Writes the same triples as run() with menus.json split by date across
+    worker processes. The output is N-Triples unless turtle=True, which parses
+    it back and serializes Turtle as run() does. Returns a summary dict; "lines"
+    counts the N-Triples lines written, and with turtle=True "triples" the
+    distinct triples of the parsed graph.
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    output_path = str(output_path)
+    with open(venues_path, 'r') as f:
+        venues_data = json.load(f)
+    _, venue_part = build_venue_map(venues_data)
+    summary = {"services": 0, "lines": 0, "shards": 0, "workers": workers}
+    adhoc_venues = {}
+
+    shards_dir = tempfile.mkdtemp(prefix="abox_shards_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        def collect(result):
+            services, lines, adhoc = result
+            summary["services"] += services
+            summary["lines"] += lines
+            for uri, extra in adhoc.items():
+                adhoc_venues.setdefault(uri, extra)
+
+        shard_paths = []
+        init_args = (str(venues_path), str(classification_path))
+        if workers == 1:
+            _init_shard_worker(*init_args)
+            for index, records in enumerate(_date_shards(iter_json_array(menus_path), dates_per_shard)):
+                shard_paths.append(os.path.join(shards_dir, f"{index:06d}.nt"))
+                collect(_generate_shard(shard_paths[-1], records, chunk_triples))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_shard_worker, initargs=init_args) as pool:
+                in_flight = deque()
+                for index, records in enumerate(_date_shards(iter_json_array(menus_path), dates_per_shard)):
+                    shard_paths.append(os.path.join(shards_dir, f"{index:06d}.nt"))
+                    in_flight.append(pool.submit(_generate_shard, shard_paths[-1], records, chunk_triples))
+                    while len(in_flight) >= 2 * workers:
+                        collect(in_flight.popleft().result())
+                while in_flight:
+                    collect(in_flight.popleft().result())
+        summary["shards"] = len(shard_paths)
+
+        venues_nt = os.path.join(shards_dir, "venues.nt")
+        with NTriplesWriter(venues_nt, chunk_triples) as writer:
+            writer.write(dict.fromkeys(venue_part))
+            for triples in adhoc_venues.values():
+                writer.write(triples)
+        summary["lines"] += writer.count
+
+        if turtle:
+            nt_path = os.path.join(shards_dir, "abox.nt")
+            _concatenate([venues_nt] + shard_paths, nt_path)
+            g = Graph()
+            g.bind("snu", SNU)
+            g.bind("owl", OWL)
+            g.parse(nt_path, format='nt')
+            g.serialize(destination=output_path, format='turtle')
+            summary["triples"] = len(g)
+        else:
+            _concatenate([venues_nt] + shard_paths, output_path)
+    finally:
+        shutil.rmtree(shards_dir, ignore_errors=True)
+
+    summary["seconds"] = time.perf_counter() - start
+    print(f"Sharded ABox: {summary['services']} services in {summary['shards']} shard(s) on {workers} worker(s), "
+          f"{summary['lines']} lines in {summary['seconds']:.2f}s -> {output_path}")
+    return summary
+
+
+# --- Incremental mode ---
+#
+# The ABox is kept as one N-Triples part per menu date plus one for the venues
+# (N-Triples is valid Turtle, so abox_final.ttl is just their concatenation).
+# menus.json is streamed twice at most: the first pass only digests each date's
+# raw records; a date whose records, restaurants' venues and menu names'
+# classifications are unchanged since the last run is skipped without looking
+# at its services. The second pass reads back only the dates that changed,
+# whose services are hashed to count new / changed / removed ones and whose
+# parts are regenerated. New dates are appended to abox_final.ttl; any other
+# change re-concatenates the parts. Both passes still read the whole archive,
+# since menus.json is a single JSON array.
+
+MANIFEST_FORMAT = 2
+
+def _digest(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+def service_key(date_str, rest_name, meal_type):
+    return f"{date_str}|{rest_name}|{meal_type}"
+
+def _menu_names(service_data):
+    return [parsed[0] for parsed in map(parse_menu_line, service_data.get('description', '').split('\n')) if parsed]
+
+def service_hash(service_data, venue_uri, menu_classification):
+    """
+    Hash of everything a service's triples depend on: its record, its venue
+    and the classification of the menu names it contains.
+    """
+    return _digest({
+        "generator": GENERATOR_VERSION,
+        "service": service_data,
+        "venue": str(venue_uri),
+        "classification": {name: menu_classification.get(name) for name in _menu_names(service_data)},
+    })
+
+def _date_dependencies(restaurants, names, venue_map, menu_classification):
+    """
+    Digest of what a date's triples depend on besides its records: how its
+    restaurants resolve to venues and how its menu names are classified.
+    """
+    return _digest({
+        "generator": GENERATOR_VERSION,
+        "venues": {rest: str(resolve_venue(rest, venue_map)[0]) + ("?" if rest not in venue_map else "")
+                   for rest in restaurants},
+        "classification": {name: menu_classification.get(name) for name in names},
+    })
+
+def _raw_digests(menus_path):
+    """
+    {date: digest of its records in file order}, streaming menus.json.
+    """
+    hashers = {}
+    for record in iter_json_array(menus_path):
+        hasher = hashers.get(record['date'])
+        if hasher is None:
+            hasher = hashers[record['date']] = hashlib.sha256(str(GENERATOR_VERSION).encode('utf-8'))
+        hasher.update(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return {date_str: hasher.hexdigest() for date_str, hasher in hashers.items()}
+
+def _write_part(path, triples):
+    part = Graph()
+    for t in triples:
+        part.add(t)
+    tmp_path = f"{path}.tmp"
+    part.serialize(destination=tmp_path, format='nt', encoding='utf-8')
+    os.replace(tmp_path, path)
+    return len(part)
+
+def _assemble(parts_dir, output_path):
+    parts = ["venues.nt"] + sorted(name for name in os.listdir(parts_dir) if name != "venues.nt" and name.endswith(".nt"))
+    _concatenate([os.path.join(parts_dir, name) for name in parts], output_path)
+
+def _append(paths, output_path):
+    with open(output_path, 'ab') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+
+def _output_stamp(output_path):
+    if not os.path.exists(output_path):
+        return None
+    stat = os.stat(output_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def run_incremental(menus_path=MENUS_JSON_PATH, venues_path=VENUES_LOCATION_JSON_PATH,
+                    classification_path=MENU_CLASSIFICATION_PATH, output_path=ABOX_FINAL_PATH,
+                    manifest_path=ABOX_MANIFEST_PATH, parts_dir=ABOX_PARTS_DIR):
+    """
+    Brings abox_final.ttl up to date by regenerating only the dates whose
+    records or dependencies changed since the last run, appending the parts
+    of new dates to it when nothing else changed. Unchanged dates cost one
+    digest of their raw records. Returns a summary dict.
+    """
+    start = time.perf_counter()
+    venues_data, _, menu_classification = load_inputs(menus_path, venues_path, classification_path, stream=True)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    manifest = {"format": MANIFEST_FORMAT, "venues": None, "dates": {}, "output": None}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            stored = json.load(f)
+        # Manifests of another format are rebuilt from scratch
+        if stored.get("format") == MANIFEST_FORMAT:
+            manifest = stored
+
+    summary = {"new": 0, "changed": 0, "removed": 0, "unchanged": 0, "dates_written": 0, "triples_written": 0,
+               "output": None}
+
+    venue_map = {}
+    venue_parts = []
+    for v in venues_data['venues']:
+        triples = venue_triples(v)
+        venue_map[v['venue_id']] = triples[0][0]
+        venue_parts.extend(triples)
+    venues_hash = _digest({"generator": GENERATOR_VERSION, "venues": venues_data['venues']})
+    venues_path_nt = os.path.join(parts_dir, "venues.nt")
+    # New date parts can be appended only to an output assembled from the manifest's parts
+    appendable = manifest.get("output") is not None and manifest.get("output") == _output_stamp(output_path)
+    if manifest.get("venues") != venues_hash or not os.path.exists(venues_path_nt):
+        summary["triples_written"] += _write_part(venues_path_nt, venue_parts)
+        manifest["venues"] = venues_hash
+        appendable = False
+
+    # First pass: dates whose records and dependencies are unchanged are skipped
+    raw = _raw_digests(menus_path)
+    old_dates = manifest["dates"]
+    dirty = set()
+    for date_str, digest in raw.items():
+        entry = old_dates.get(date_str)
+        if (entry is None or entry["raw"] != digest
+                or not os.path.exists(os.path.join(parts_dir, f"{date_str}.nt"))
+                or entry["dependencies"] != _date_dependencies(entry["restaurants"], entry["names"],
+                                                               venue_map, menu_classification)):
+            dirty.add(date_str)
+        else:
+            summary["unchanged"] += len(entry["services"])
+
+    for date_str in sorted(set(old_dates) - set(raw)):
+        summary["removed"] += len(old_dates.pop(date_str)["services"])
+        part_path = os.path.join(parts_dir, f"{date_str}.nt")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        appendable = False
+
+    # Second pass: only the records of changed dates are kept and regenerated
+    records = {}
+    if dirty:
+        for record in iter_json_array(menus_path):
+            if record['date'] in dirty:
+                records.setdefault(record['date'], []).append(record)
+
+    appended = []
+    for date_str in sorted(dirty):
+        services, triples, restaurants, names = {}, [], set(), set()
+        for d, rest_name, meal_type, service_data, venue_uri, venue_extra in iter_services(records[date_str], venue_map):
+            services[service_key(d, rest_name, meal_type)] = service_hash(service_data, venue_uri, menu_classification)
+            restaurants.add(rest_name)
+            names.update(_menu_names(service_data))
+            triples.extend(venue_extra)
+            triples.extend(service_triples(d, rest_name, meal_type, service_data, venue_uri, menu_classification))
+
+        old = old_dates.get(date_str, {}).get("services", {})
+        added = [k for k in services if k not in old]
+        changed = [k for k in services if k in old and old[k] != services[k]]
+        summary["new"] += len(added)
+        summary["changed"] += len(changed)
+        summary["removed"] += len([k for k in old if k not in services])
+        summary["unchanged"] += len(services) - len(added) - len(changed)
+
+        part_path = os.path.join(parts_dir, f"{date_str}.nt")
+        if date_str in old_dates:
+            appendable = False
+        else:
+            appended.append(part_path)
+        summary["triples_written"] += _write_part(part_path, triples)
+        summary["dates_written"] += 1
+        restaurants, names = sorted(restaurants), sorted(names)
+        old_dates[date_str] = {
+            "raw": raw[date_str],
+            "restaurants": restaurants,
+            "names": names,
+            "dependencies": _date_dependencies(restaurants, names, venue_map, menu_classification),
+            "services": services,
+        }
+
+    if appendable and appended:
+        _append(appended, output_path)
+        summary["output"] = "appended"
+    elif not appendable:
+        _assemble(parts_dir, output_path)
+        summary["output"] = "assembled"
+    manifest["output"] = _output_stamp(output_path)
+
+    tmp_manifest = f"{manifest_path}.tmp"
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_manifest, manifest_path)
+
+    summary["seconds"] = time.perf_counter() - start
+    print(f"Incremental ABox: {summary['new']} new, {summary['changed']} changed, {summary['removed']} removed, "
+          f"{summary['unchanged']} unchanged services; rewrote {summary['dates_written']} date part(s) "
+          f"({summary['triples_written']} triples) in {summary['seconds']:.2f}s -> {output_path}"
+          f"{' (' + summary['output'] + ')' if summary['output'] else ''}")
+    return summary
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Generate the ABox (abox_final.ttl) from menus.json.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only regenerate services that changed since the last incremental run")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read menus.json incrementally and write N-Triples in bounded chunks")
+    parser.add_argument("--menus", default=str(MENUS_JSON_PATH), help="Menu records (JSON array)")
+    parser.add_argument("--output", default=str(ABOX_FINAL_PATH), help="ABox output path")
+    parser.add_argument("--chunk-triples", type=int, default=WRITE_CHUNK_TRIPLES,
+                        help="Triples buffered between writes in --stream and --workers modes")
+    parser.add_argument("--workers", type=int,
+                        help="Generate N-Triples in this many processes, sharding menus.json by date")
+    parser.add_argument("--dates-per-shard", type=int, default=DATES_PER_SHARD)
+    parser.add_argument("--turtle", action="store_true", help="With --workers, convert the output to Turtle")
+    args = parser.parse_args()
+    if args.incremental:
+        run_incremental(menus_path=args.menus, output_path=args.output)
+    elif args.workers:
+        run_sharded(menus_path=args.menus, output_path=args.output, workers=args.workers,
+                    dates_per_shard=args.dates_per_shard, turtle=args.turtle, chunk_triples=args.chunk_triples)
+    elif args.stream:
+        run_streaming(menus_path=args.menus, output_path=args.output, chunk_triples=args.chunk_triples)
+    else:
+        run(output_path=args.output, menus_path=args.menus)
@@ -0,0 +1,66 @@
+import re
+import unicodedata
+
+# "name : 4,500 원", "name - 4500원 (Take-Out)", ...
+PRICE_SUFFIX = re.compile(r'\s*[:\-]?\s*[0-9][0-9,]*\s*원.*$')
+# Portion/size markers that do not change what the dish is: (L), (소), (大), (3p), (2인분)
+SIZE_MARKER = re.compile(r'\(\s*(?:[SMLsml]|소|중|대|小|中|大|\d+\s*[pP]|\d+\s*인분?|추가)\s*\)')
+# Parenthesised markers without any letters, e.g. (#), (*)
+SYMBOL_MARKER = re.compile(r'\([^\w]*\)')
+DECORATION = " \t*#~·.:<>[]"
+
+
+def parse_menu_line(line):
+    """
+    Returns (name, price) for a menu line of a service description, or None
+    for headers, notes and noise. price is None when the line has no price.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("<") or line.startswith("※"):
+        return None
+
+    # Pattern: capture name and price
+    price_match = re.search(r'([0-9,]+)원', line)
+    price = None
+    name = line
+    if price_match:
+        price_str = price_match.group(1).replace(',', '')
+        if price_str.isdigit():
+            price = int(price_str)
+        name = re.sub(r'[:\-]?\s*[0-9,]+원.*', '', line).strip()
+
+    if not name:
+        return None
+    if len(name) < 2: # Ignore short noise
+        return None
+    return name, price
+
+
+def _strip_enclosing_parens(name):
+    while name.startswith("(") and name.endswith(")"):
+        depth = 0
+        for i, ch in enumerate(name):
+            depth += ch == "("
+            depth -= ch == ")"
+            if depth == 0 and i < len(name) - 1:
+                # The first "(" closes before the end: not one enclosing pair
+                return name
+        name = name[1:-1].strip()
+    return name
+
+
+def canonical_name(name):
+    """
+    Lookup key for a menu name. Variants of one dish share a key: "*떡만두국*",
+    "(짬뽕+짜장+볶음밥)", "짜장면 : 4,500 원", "눈꽃 치즈 돈까스", "연어 비빔밥(L)".
+    Only used for classification lookups; menuName literals keep the raw name.
+    """
+    name = unicodedata.normalize("NFKC", name)
+    name = PRICE_SUFFIX.sub("", name)
+    name = SIZE_MARKER.sub("", name)
+    name = SYMBOL_MARKER.sub("", name)
+    name = _strip_enclosing_parens(name.strip(DECORATION))
+    name = re.sub(r"\s+", "", name.strip(DECORATION))
+    return name.lower()
@@ -0,0 +1,129 @@
+import os
+import json
+
+from rdflib import Literal
+from rdflib.plugins.serializers.nt import _quoteLiteral
+
+READ_CHUNK_CHARS = 1 << 16
+WRITE_CHUNK_TRIPLES = 10000
+TERM_CACHE_SIZE = 1 << 16
+
+
+def iter_json_array(path, chunk_chars=READ_CHUNK_CHARS):
+    """
+    Yields the elements of a file holding one top-level JSON array (menus.json)
+    one at a time, reading it in chunks, so memory is bounded by the largest
+    element rather than the file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof, started = "", 0, False, False
+
+        def more(size):
+            nonlocal buffer, pos, eof
+            chunk = f.read(size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+                more(chunk_chars)
+                continue
+
+            char = buffer[pos]
+            if not started:
+                if char != "[":
+                    raise ValueError(f"{path}: expected a JSON array, found {char!r}")
+                started = True
+                pos += 1
+            elif char == "]":
+                return
+            elif char == ",":
+                pos += 1
+            else:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    # Element continues past the buffer; read at least as much again
+                    more(max(chunk_chars, len(buffer)))
+                    continue
+                after = end
+                while after < len(buffer) and buffer[after] in " \t\r\n":
+                    after += 1
+                if not eof and (after == len(buffer) or buffer[after] not in ",]"):
+                    # A bare number ("0" of "0.5") could go on in the next chunk
+                    more(max(chunk_chars, len(buffer)))
+                    continue
+                pos = end
+                yield value
+
+
+class NTriplesWriter:
+    """
+    Writes triples as N-Triples (the same lines rdflib's nt serializer writes),
+    buffering at most chunk_triples of them. The file appears atomically on close().
+    """
+
+    def __init__(self, path, chunk_triples=WRITE_CHUNK_TRIPLES):
+        self.path = str(path)
+        self.chunk_triples = chunk_triples
+        self.count = 0
+        self._buffer = []
+        # Subjects, predicates and common values repeat from line to line
+        self._terms = {}
+        self._tmp_path = f"{self.path}.tmp"
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+
+    def _term(self, term):
+        text = self._terms.get(term)
+        if text is None:
+            # As rdflib's _nt_row formats them
+            text = _quoteLiteral(term) if isinstance(term, Literal) else term.n3()
+            if len(self._terms) >= TERM_CACHE_SIZE:
+                self._terms.clear()
+            self._terms[term] = text
+        return text
+
+    def add(self, triple):
+        s, p, o = triple
+        self._buffer.append(f"{self._term(s)} {self._term(p)} {self._term(o)} .\n")
+        self.count += 1
+        if len(self._buffer) >= self.chunk_triples:
+            self._flush()
+
+    def write(self, triples):
+        for triple in triples:
+            self.add(triple)
+
+    def _flush(self):
+        self._file.write("".join(self._buffer))
+        self._buffer = []
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush()
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import LLM_RECORDINGS_PATH
+from app.services.llm_backend import RecordedResponses, split_chunks
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """
+    Serves POST /generate for HTTPBackend with recorded or canned responses.
+    HTTP/1.1 so clients can keep connections alive between requests.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        server = self.server
+
+        time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+        text = server.responses.respond(request["prompt"])
+
+        if not request.get("stream"):
+            body = json.dumps({"text": text}, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in split_chunks(text):
+            time.sleep(server.chunk_delay)
+            line = (json.dumps({"text": chunk}, ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host, port, recordings=LLM_RECORDINGS_PATH, latency=0.0, jitter=0.0, chunk_delay=0.0, verbose=False):
+    """
+    Builds (but does not start) the stand-in server. Latencies are in seconds.
+    """
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.responses = RecordedResponses(recordings)
+    server.latency = latency
+    server.jitter = jitter
+    server.chunk_delay = chunk_delay
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local LLM stand-in for offline load tests (use with LLM_BACKEND=http).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recordings", default=str(LLM_RECORDINGS_PATH), help="JSON file of recorded responses")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Delay before the first byte")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--chunk-delay-ms", type=float, default=20.0, help="Delay between streamed chunks")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.recordings, args.latency_ms / 1000,
+                         args.jitter_ms / 1000, args.chunk_delay_ms / 1000, args.verbose)
+    print(f"LLM stand-in listening on http://{args.host}:{args.port} "
+          f"({len(server.responses.recordings)} recordings, latency {args.latency_ms:.0f}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+from collections import Counter, defaultdict
+
+import owlrl
+from owlrl.XsdDatatypes import OWL_RL_Datatypes
+from owlrl.AxiomaticTriples import OWLRL_Datatypes_Disjointness
+from rdflib import Graph, Literal
+from rdflib.namespace import RDF, RDFS, OWL
+
+SAME_AS = OWL.sameAs
+
+# TBox constructs whose OWL-RL rules are not compiled here; a TBox using any of
+# them has to go through the full owlrl closure instead
+UNSUPPORTED_PREDICATES = (
+    OWL.propertyChainAxiom, OWL.hasKey, OWL.someValuesFrom, OWL.allValuesFrom, OWL.hasValue,
+    OWL.intersectionOf, OWL.unionOf, OWL.oneOf, OWL.maxCardinality, OWL.maxQualifiedCardinality,
+)
+UNSUPPORTED_TYPES = (OWL.TransitiveProperty, OWL.FunctionalProperty, OWL.InverseFunctionalProperty)
+
+# Asserting these in the ABox would change the compiled rules
+SCHEMA_PREDICATES = (
+    RDFS.subClassOf, RDFS.subPropertyOf, RDFS.domain, RDFS.range, OWL.inverseOf,
+    OWL.equivalentClass, OWL.equivalentProperty,
+)
+
+
+def schema_closure(tbox):
+    """
+    OWL-RL closure of the TBox alone, without Literal-subject triples. It is
+    small, so owlrl is cheap here; the ABox is handled by the compiled rules.
+    """
+    closure = Graph()
+    closure += tbox
+    owlrl.DeductiveClosure(owlrl.OWLRL_Semantics).expand(closure)
+    for t in [t for t in closure if isinstance(t[0], Literal)]:
+        closure.remove(t)
+    return closure
+
+
+def unsupported_axioms(tbox):
+    """
+    Lists the TBox axioms the materializer cannot compile.
+    """
+    found = [(s, p, o) for p in UNSUPPORTED_PREDICATES for s, o in tbox.subject_objects(p)]
+    found += [(s, RDF.type, t) for t in UNSUPPORTED_TYPES for s in tbox.subjects(RDF.type, t)]
+    return found
+
+
+def _index(closure, predicate, include_self=False):
+    index = defaultdict(set)
+    for s, o in closure.subject_objects(predicate):
+        if include_self or s != o:
+            index[s].add(o)
+    return dict(index)
+
+
+class Materializer:
+    """
+    Forward-chaining materializer for the OWL-RL rules that the TBox actually
+    triggers on ABox triples:
+
+        prp-inv1/2, prp-symp  (x p y), p inverseOf q    -> (y q x)
+        prp-spo1              (x p y), p subPropertyOf q -> (x q y)
+        prp-dom               (x p y), p domain C        -> (x a C)
+        prp-rng               (x p y), p range C         -> (y a C)   y not a literal
+        cax-sco               (x a C), C subClassOf D    -> (x a D)
+        eq-ref                (s p o)                    -> (s sameAs s), (p sameAs p), (o sameAs o)
+
+    plus owlrl's datatype disjointness axioms for the datatypes the literals use.
+
+    The rule tables come from the owlrl closure of the TBox, so subclass,
+    subproperty and domain/range propagation is already transitive. Every rule
+    has a single premise, so a worklist visits each closure triple once and the
+    full materialization is linear in the size of the result.
+    """
+
+    def __init__(self, tbox):
+        unsupported = unsupported_axioms(tbox)
+        if unsupported:
+            raise ValueError(f"TBox uses axioms the materializer does not compile: {unsupported[:3]}")
+        self.tbox = tbox
+        self.schema = schema_closure(tbox)
+
+        inverse = defaultdict(set)
+        for p, q in self.schema.subject_objects(OWL.inverseOf):
+            inverse[p].add(q)
+            inverse[q].add(p)
+        for p in self.schema.subjects(RDF.type, OWL.SymmetricProperty):
+            inverse[p].add(p)
+        self.inverse = dict(inverse)
+        self.super_properties = _index(self.schema, RDFS.subPropertyOf)
+        self.super_classes = _index(self.schema, RDFS.subClassOf)
+        self.domain = _index(self.schema, RDFS.domain, include_self=True)
+        self.range = _index(self.schema, RDFS.range, include_self=True)
+
+        self.asserted = set()
+        self.closure = set()
+        self._by_node = defaultdict(set)
+        self._datatypes = Counter()
+
+    def _consequences(self, t):
+        s, p, o = t
+        out = [(s, SAME_AS, s), (p, SAME_AS, p)]
+        for q in self.super_properties.get(p, ()):
+            out.append((s, q, o))
+        for c in self.domain.get(p, ()):
+            out.append((s, RDF.type, c))
+        if not isinstance(o, Literal):
+            out.append((o, SAME_AS, o))
+            for q in self.inverse.get(p, ()):
+                out.append((o, q, s))
+            for c in self.range.get(p, ()):
+                out.append((o, RDF.type, c))
+            if p == RDF.type:
+                for d in self.super_classes.get(o, ()):
+                    out.append((s, RDF.type, d))
+        return out
+
+    @staticmethod
+    def _datatype(t):
+        # Datatype a triple puts in use, for owlrl's datatype disjointness axioms
+        s, p, o = t
+        if isinstance(o, Literal):
+            return o.datatype if o.datatype in OWL_RL_Datatypes else None
+        return o if p == RDF.type and o in OWL_RL_Datatypes else None
+
+    def _add(self, t):
+        self.closure.add(t)
+        self._by_node[t[0]].add(t)
+        self._by_node[t[1]].add(t)
+        if not isinstance(t[2], Literal):
+            self._by_node[t[2]].add(t)
+        datatype = self._datatype(t)
+        if datatype is not None:
+            self._datatypes[datatype] += 1
+
+    def _discard(self, t):
+        if t not in self.closure:
+            return
+        self.closure.discard(t)
+        datatype = self._datatype(t)
+        if datatype is not None:
+            self._datatypes[datatype] -= 1
+            if not self._datatypes[datatype]:
+                del self._datatypes[datatype]
+        for node in t:
+            bucket = self._by_node.get(node)
+            if bucket is not None:
+                bucket.discard(t)
+                if not bucket:
+                    del self._by_node[node]
+
+    def _check_asserted(self, t):
+        s, p, o = t
+        if isinstance(s, Literal):
+            raise ValueError(f"Literal subject in asserted triple: {t}")
+        if p in SCHEMA_PREDICATES or (p == SAME_AS and s != o):
+            raise ValueError(f"Asserted triple needs the full OWL-RL closure: {t}")
+
+    def _insert(self, triples, asserted):
+        """
+        Adds triples and everything they entail; returns the triples new to the closure.
+        """
+        work = []
+        for t in triples:
+            if asserted:
+                self._check_asserted(t)
+                self.asserted.add(t)
+            if t not in self.closure:
+                self._add(t)
+                work.append(t)
+        added = list(work)
+        while work:
+            for u in self._consequences(work.pop()):
+                if u not in self.closure:
+                    self._add(u)
+                    work.append(u)
+                    added.append(u)
+        return added
+
+    def _derivable(self, t):
+        # Every rule premise mentions the subject of its conclusion (as subject,
+        # predicate or object), so the candidates are the live triples around it
+        return any(t in self._consequences(u) for u in self._by_node.get(t[0], ()))
+
+    def materialize(self, triples):
+        """
+        Computes the closure of an ABox from scratch and returns it as a set.
+        """
+        self.asserted = set()
+        self.closure = set()
+        self._by_node = defaultdict(set)
+        self._datatypes = Counter()
+        self._insert(triples, asserted=True)
+        return self.closure
+
+    def update(self, added=(), removed=()):
+        """
+        Applies a delta of asserted triples with delete-and-rederive (DRed):
+        everything entailed by the removed triples is retracted, then the parts
+        that still follow from the remaining triples are restored. Only the
+        inferences around the delta are touched. Returns (added, removed) net
+        changes to the closure.
+        """
+        removed = [t for t in set(removed) if t in self.asserted]
+        for t in removed:
+            self.asserted.discard(t)
+
+        # Overdelete; asserted triples stay and so do their consequences
+        doomed = set()
+        work = list(removed)
+        while work:
+            t = work.pop()
+            if t in doomed or t in self.asserted or t not in self.closure:
+                continue
+            doomed.add(t)
+            work.extend(self._consequences(t))
+        for t in doomed:
+            self._discard(t)
+
+        self._insert([t for t in doomed if self._derivable(t)], asserted=False)
+        inserted = self._insert(added, asserted=True)
+
+        net_added = {t for t in inserted if t not in doomed}
+        net_removed = {t for t in doomed if t not in self.closure}
+        return net_added, net_removed
+
+    def datatype_axioms(self):
+        """
+        Disjointness axioms between the datatypes in use, with their own
+        consequences (owlrl adds these only for datatypes the graph uses).
+        """
+        axioms = {t for t in OWLRL_Datatypes_Disjointness
+                  if t[0] in self._datatypes and t[2] in self._datatypes}
+        work = list(axioms)
+        while work:
+            for u in self._consequences(work.pop()):
+                if u not in axioms and u not in self.closure:
+                    axioms.add(u)
+                    work.append(u)
+        return axioms
+
+    def inferred_graph(self):
+        """
+        The ABox closure plus the schema-level inferences, minus the TBox itself:
+        the same triples as owlrl over ABox + TBox with Literal subjects and the
+        TBox removed.
+        """
+        g = Graph()
+        for prefix, namespace in self.tbox.namespaces():
+            g.bind(prefix, namespace, override=False)
+        for t in self.closure:
+            g.add(t)
+        for t in self.schema:
+            g.add(t)
+        for t in self.datatype_axioms():
+            g.add(t)
+        for t in self.tbox:
+            g.remove(t)
+        return g
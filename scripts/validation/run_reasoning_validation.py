@@ -4,12 +4,64 @@ from rdflib import Graph, Namespace, URIRef
 from rdflib.namespace import RDF, OWL
 from rdflib import Literal as RdflibLiteral
 import os
+import sys
+import time
+import argparse
 
-def run():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    abox_path = os.path.join(base_dir, 'abox_final.ttl')
-    tbox_path = os.path.join(base_dir, 'ontology', 'tbox.ttl')
-    shacl_path = os.path.join(base_dir, 'ontology', 'shacl.ttl')
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from config import ABOX_FINAL_PATH, TBOX_PATH, SHACL_PATH, ABOX_INFERRED_PATH, SHACL_STATE_PATH, GRAPH_STATS_PATH
+from app.services.graph_snapshot import snapshot_key
+from app.services.graph_stats import compute_stats, save_stats
+from scripts.validation.materializer import Materializer
+from scripts.validation.shacl_shards import validate_sharded
+
+
+def owlrl_closure(g, g_tbox):
+    """
+    Full OWL-RL closure of ABox + TBox, cleaned up for serialization as the inferred ABox.
+    """
+    g_combined = g + g_tbox
+    owlrl.DeductiveClosure(owlrl.OWLRL_Semantics).expand(g_combined)
+    print(f"Graph expanded to {len(g_combined)} triples.")
+    
+    # Clean up 1: Remove triples where subject is a Literal (invalid in Turtle)
+    triples_to_remove = []
+    for s, p, o in g_combined:
+        if isinstance(s, RdflibLiteral):
+            triples_to_remove.append((s, p, o))
+    
+    if triples_to_remove:
+        print(f"Removing {len(triples_to_remove)} invalid triples (Literal subjects)...")
+        for t in triples_to_remove:
+            g_combined.remove(t)
+
+    # Clean up 2: Subtract TBox triples so we don't duplicate them in ABox file
+    # outcomes: ABox file will depend on TBox file.
+    initial_len = len(g_combined)
+    g_combined -= g_tbox
+    print(f"Removed {initial_len - len(g_combined)} TBox triples from inferred graph.")
+    return g_combined
+
+
+def materialized_closure(g, g_tbox):
+    """
+    Same triples as owlrl_closure, from rules compiled out of the TBox.
+    """
+    materializer = Materializer(g_tbox)
+    materializer.materialize(g)
+    g_inferred = materializer.inferred_graph()
+    for prefix, namespace in g.namespaces():
+        g_inferred.bind(prefix, namespace, override=False)
+    print(f"Materialized {len(g_inferred) - len(g)} inferred triples.")
+    return g_inferred
+
+
+def run(use_owlrl=False, full_shacl=False, changed_only=False, shards=None):
+    abox_path = ABOX_FINAL_PATH
+    tbox_path = TBOX_PATH
+    shacl_path = str(SHACL_PATH)
     
     print("Loading Graphs...")
     # Load TBox separately to know what to subtract later
@@ -26,15 +78,23 @@ def run():
     print(f"Loaded {len(g_combined)} triples (ABox + TBox).")
 
     # 1. SHACL Validation (on combined)
-    print("Running SHACL Validation...")
-    conforms, report_graph, report_text = pyshacl.validate(
-        data_graph=g_combined,
-        shacl_graph=shacl_path,
-        inference='rdfs',
-        abort_on_first=False,
-        meta_shacl=False,
-        debug=False
-    )
+    print(f"Running SHACL Validation ({'full graph' if full_shacl else 'sharded'})...")
+    start = time.perf_counter()
+    if full_shacl:
+        conforms, report_graph, report_text = pyshacl.validate(
+            data_graph=g_combined,
+            shacl_graph=shacl_path,
+            inference='rdfs',
+            abort_on_first=False,
+            meta_shacl=False,
+            debug=False
+        )
+    else:
+        conforms, report_graph, report_text, stats = validate_sharded(
+            g_combined, SHACL_PATH, shards=shards, state_path=SHACL_STATE_PATH if changed_only else None)
+        print(f"Validated {stats['validated']} of {stats['focus_nodes']} focus nodes in {stats['shards']} shard(s)"
+              f" ({stats['reused']} unchanged since the last run)")
+    print(f"SHACL Validation took {time.perf_counter() - start:.2f}s")
     
     if conforms:
         print("SHACL Validation Passed!")
@@ -43,26 +103,13 @@ def run():
         print(report_text[:500] + "...") # Truncate log
 
     # 2. OWLRL Reasoning
-    print("Running OWLRL Reasoning...")
-    owlrl.DeductiveClosure(owlrl.OWLRL_Semantics).expand(g_combined)
-    print(f"Graph expanded to {len(g_combined)} triples.")
-    
-    # Clean up 1: Remove triples where subject is a Literal (invalid in Turtle)
-    triples_to_remove = []
-    for s, p, o in g_combined:
-        if isinstance(s, RdflibLiteral):
-            triples_to_remove.append((s, p, o))
-    
-    if triples_to_remove:
-        print(f"Removing {len(triples_to_remove)} invalid triples (Literal subjects)...")
-        for t in triples_to_remove:
-            g_combined.remove(t)
-
-    # Clean up 2: Subtract TBox triples so we don't duplicate them in ABox file
-    # outcomes: ABox file will depend on TBox file.
-    initial_len = len(g_combined)
-    g_combined -= g_tbox
-    print(f"Removed {initial_len - len(g_combined)} TBox triples from inferred graph.")
+    print(f"Running OWLRL Reasoning ({'owlrl' if use_owlrl else 'compiled rules'})...")
+    start = time.perf_counter()
+    if use_owlrl:
+        g_combined = owlrl_closure(g, g_tbox)
+    else:
+        g_combined = materialized_closure(g, g_tbox)
+    print(f"Reasoning took {time.perf_counter() - start:.2f}s")
 
     # Add Ontology Declaration and Import for ABox
     SNU_NS = "http://snu.ac.kr/dining/"
@@ -73,10 +120,18 @@ def run():
     g_combined.add((ABOX_URI, OWL.imports, TBOX_URI))
 
     # Save Inferred
-    inferred_path = os.path.join(base_dir, 'abox_inferred.ttl')
+    inferred_path = ABOX_INFERRED_PATH
     g_combined.serialize(destination=inferred_path, format='turtle')
     print(f"Saved inferred graph to {inferred_path} (Ontology URI: {ABOX_URI})")
 
+    # Value statistics for the schema summary, keyed like the graph snapshot
+    # so the service reads them instead of recomputing at startup
+    start = time.perf_counter()
+    g_loaded = g_combined + g_tbox
+    g_loaded.bind("", SNU_NS)
+    save_stats(compute_stats(g_loaded), GRAPH_STATS_PATH, snapshot_key(TBOX_PATH, ABOX_INFERRED_PATH))
+    print(f"Saved graph statistics to {GRAPH_STATS_PATH} ({time.perf_counter() - start:.2f}s)")
+
     # 3. Simple SPARQL check
     print("Running check query...")
     # Need to query the combined graph again for verification, or re-add logic.
@@ -98,4 +153,11 @@ def run():
         print(f"Cheap Item: {row.name} ({row.price} won)")
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Validate the ABox with SHACL and write the inferred ABox.")
+    parser.add_argument("--owlrl", action="store_true", help="Use the full owlrl closure instead of the compiled rules")
+    parser.add_argument("--full-shacl", action="store_true", help="Validate the whole graph in one pyshacl run")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Revalidate only focus nodes changed since the last --changed-only run")
+    parser.add_argument("--shards", type=int, help="SHACL shards (default: one per CPU)")
+    args = parser.parse_args()
+    run(args.owlrl, args.full_shacl, args.changed_only, args.shards)
@@ -0,0 +1,257 @@
+import re
+import os
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pyshacl
+from rdflib import Graph, BNode, Literal, URIRef, Namespace
+from rdflib.namespace import RDF, RDFS
+
+from app.services.graph_snapshot import snapshot_key, load_snapshot, save_snapshot
+
+SH = Namespace("http://www.w3.org/ns/shacl#")
+
+# Bump when the state layout below changes so stale state is ignored
+STATE_FORMAT = 1
+
+# Constraint parameters that only look at the focus node's own values (and the
+# types of those values, for sh:class); shapes using anything else need the full run
+LOCAL_PARAMETERS = {
+    SH.path, SH.minCount, SH.maxCount, SH.datatype, SH["class"], SH["in"], SH.nodeKind,
+    SH.minInclusive, SH.maxInclusive, SH.minExclusive, SH.maxExclusive,
+    SH.minLength, SH.maxLength, SH.pattern, SH.flags, SH.hasValue,
+    SH.name, SH.description, SH.message, SH.severity, SH.order, SH.group, SH.deactivated,
+}
+
+
+def shape_classes(shapes):
+    """
+    Returns (target classes, sh:class values) of a shapes graph, raising
+    ValueError if a shape cannot be validated one focus node at a time.
+    """
+    targets = set(shapes.objects(None, SH.targetClass))
+    for target in (SH.targetNode, SH.targetSubjectsOf, SH.targetObjectsOf, SH.target):
+        if (None, target, None) in shapes:
+            raise ValueError(f"Sharded validation supports sh:targetClass only, found {target}")
+    for shape in shapes.objects(None, SH.property):
+        path = shapes.value(shape, SH.path)
+        if not isinstance(path, URIRef):
+            raise ValueError(f"Sharded validation supports predicate paths only, found {path!r}")
+        for p in shapes.predicates(shape, None):
+            if p not in LOCAL_PARAMETERS:
+                raise ValueError(f"Sharded validation does not support {p} on property shapes")
+    return targets, set(shapes.objects(None, SH["class"]))
+
+
+def _transitive(pairs):
+    direct = defaultdict(set)
+    for s, o in pairs:
+        direct[s].add(o)
+    closed = {}
+    for start in direct:
+        seen, stack = set(), [start]
+        while stack:
+            for nxt in direct.get(stack.pop(), ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        closed[start] = seen
+    return closed
+
+
+class FocusIndex:
+    """
+    RDFS view of the data graph restricted to what the shapes look at: the
+    classes of every node (explicit, rdfs:domain/rdfs:range, rdfs:subClassOf,
+    rdfs:subPropertyOf) and, per focus node, the small graph a shard needs to
+    validate it exactly as pyshacl would with inference="rdfs" on the whole graph.
+    """
+
+    def __init__(self, data, shapes):
+        targets, value_classes = shape_classes(shapes)
+        self.data = data
+        self.targets = targets
+        relevant = targets | value_classes
+
+        self.super_properties = _transitive(data.subject_objects(RDFS.subPropertyOf))
+        super_classes = _transitive(data.subject_objects(RDFS.subClassOf))
+        domain, range_ = defaultdict(set), defaultdict(set)
+        for p, c in data.subject_objects(RDFS.domain):
+            domain[p].add(c)
+        for p, c in data.subject_objects(RDFS.range):
+            range_[p].add(c)
+
+        types = defaultdict(set)
+        for s, p, o in data:
+            if p == RDF.type:
+                types[s].add(o)
+            for q in self._properties(p):
+                types[s].update(domain.get(q, ()))
+                if not isinstance(o, Literal):
+                    types[o].update(range_.get(q, ()))
+        self.types = {}
+        for node, classes in types.items():
+            closed = set(classes)
+            for c in classes:
+                closed.update(super_classes.get(c, ()))
+            closed &= relevant
+            if closed:
+                self.types[node] = closed
+
+        self.focus_nodes = sorted(node for node, classes in self.types.items() if classes & targets)
+        blank = [node for node in self.focus_nodes if not isinstance(node, URIRef)]
+        if blank:
+            raise ValueError(f"Sharded validation needs IRI focus nodes, found {len(blank)} blank nodes")
+
+    def _properties(self, p):
+        return (p, *self.super_properties.get(p, ()))
+
+    def node_triples(self, node):
+        """
+        The focus node's values (with subproperty entailments) and the classes
+        of the node and of its values.
+        """
+        triples = [(node, RDF.type, c) for c in self.types.get(node, ())]
+        for _, p, o in self.data.triples((node, None, None)):
+            for q in self._properties(p):
+                triples.append((node, q, o))
+            for c in self.types.get(o, ()):
+                triples.append((o, RDF.type, c))
+        return triples
+
+    def digest(self, node):
+        """
+        Content hash of everything the node's validation depends on.
+        """
+        lines = sorted(" ".join(term.n3() for term in t) for t in set(self.node_triples(node)))
+        return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def _split_blocks(text):
+    # pyshacl's text report: a header, then one block per result whose first
+    # line is unindented and the rest tab-indented
+    body = text.split("\n", 3)[3] if "\nResults (" in text else ""
+    return re.findall(r"^[^\t\n].*\n(?:\t.*\n)*", body, re.MULTILINE)
+
+
+def _reachable(report, node):
+    # A result node and everything hanging off it through blank nodes
+    # (source shape clones, sh:in lists)
+    triples, stack, seen = [], [node], {node}
+    while stack:
+        for s, p, o in report.triples((stack.pop(), None, None)):
+            triples.append((s, p, o))
+            if isinstance(o, BNode) and o not in seen:
+                seen.add(o)
+                stack.append(o)
+    return triples
+
+
+def _validate_shard(payload):
+    """
+    Process-pool worker: validates one shard and returns its results grouped by focus node.
+    """
+    triples, namespaces, shapes, focus_nodes = payload
+    graph = Graph()
+    for prefix, namespace in namespaces:
+        graph.bind(prefix, namespace, override=True, replace=True)
+    for t in triples:
+        graph.add(t)
+    _, report, text = pyshacl.validate(graph, shacl_graph=shapes, inference="none", focus_nodes=focus_nodes)
+
+    labels = {node.n3(graph.namespace_manager): node for node in focus_nodes}
+    results = {node: ([], []) for node in focus_nodes}
+    for block in _split_blocks(text):
+        match = re.search(r"^\tFocus Node: (.*)$", block, re.MULTILINE)
+        results[labels[match.group(1)]][1].append(block)
+    for result in report.objects(None, SH.result):
+        results[report.value(result, SH.focusNode)][0].append((result, _reachable(report, result)))
+    return results
+
+
+def assemble_report(results, shapes):
+    """
+    Builds pyshacl's (conforms, report graph, report text) from per-focus-node results.
+    """
+    report = Graph(bind_namespaces="core")
+    for prefix, namespace in shapes.namespaces():
+        report.bind(prefix, namespace)
+    blocks = []
+    root = BNode()
+    for node_results, node_blocks in results.values():
+        for result, triples in node_results:
+            report.add((root, SH.result, result))
+            for t in triples:
+                report.add(t)
+        blocks.extend(node_blocks)
+
+    # Like pyshacl with the default allow_warnings=False, any result is a failure
+    conforms = not blocks
+    report.add((root, RDF.type, SH.ValidationReport))
+    report.add((root, SH.conforms, Literal(conforms)))
+    text = f"Validation Report\nConforms: {conforms}\n"
+    if blocks:
+        text += f"Results ({len(blocks)}):\n"
+    return conforms, report, text + "".join(sorted(blocks))
+
+
+def _chunks(items, count):
+    size = -(-len(items) // count) if items else 1
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def validate_sharded(data, shapes_path, shards=None, workers=None, state_path=None):
+    """
+    SHACL-validates data (ABox + TBox) against shapes_path with the focus nodes
+    split into shards that run in a process pool. The merged report is the
+    same as pyshacl.validate(data, shacl_graph=shapes_path, inference="rdfs").
+
+    With state_path, each focus node's content hash and results are kept
+    between runs, and only the nodes whose hash changed (or that are new) are
+    revalidated. The state is discarded if the shapes file changed.
+
+    Returns (conforms, report_graph, report_text, stats).
+    """
+    key = snapshot_key(shapes_path)
+    state = load_snapshot(state_path, key) if state_path else None
+    if state is not None and state.get("format") != STATE_FORMAT:
+        state = None
+    # Reusing the pickled shapes graph keeps the blank node ids that stored results refer to
+    shapes = state["shapes"] if state else Graph().parse(str(shapes_path), format="turtle")
+
+    index = FocusIndex(data, shapes)
+    digests = {node: index.digest(node) for node in index.focus_nodes}
+    previous = state["results"] if state else {}
+    previous_digests = state["digests"] if state else {}
+    results = {node: previous[node] for node in index.focus_nodes
+               if node in previous and previous_digests.get(node) == digests[node]}
+    pending = [node for node in index.focus_nodes if node not in results]
+
+    shards = max(1, min(shards or os.cpu_count() or 1, len(pending) or 1))
+    namespaces = list(data.namespaces())
+    payloads = [
+        ([t for node in chunk for t in index.node_triples(node)], namespaces, shapes, chunk)
+        for chunk in _chunks(pending, shards) if chunk
+    ]
+    if len(payloads) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers or min(len(payloads), os.cpu_count() or 1)) as pool:
+            shard_results = list(pool.map(_validate_shard, payloads))
+    else:
+        shard_results = [_validate_shard(payload) for payload in payloads]
+    for shard in shard_results:
+        results.update(shard)
+
+    results = {node: results[node] for node in index.focus_nodes}
+    if state_path:
+        save_snapshot({"format": STATE_FORMAT, "shapes": shapes, "digests": digests, "results": results},
+                      state_path, key)
+
+    conforms, report, text = assemble_report(results, shapes)
+    stats = {
+        "focus_nodes": len(index.focus_nodes),
+        "validated": len(pending),
+        "reused": len(index.focus_nodes) - len(pending),
+        "shards": len(payloads),
+    }
+    return conforms, report, text, stats
@@ -0,0 +1,78 @@
+import time
+import threading
+
+import pytest
+
+from app.services.chat_pipeline import Stage, run_dag
+from app.services.llm_backend import LLMBackend
+
+
+def sleeper(seconds, value):
+    def fn(**deps):
+        time.sleep(seconds)
+        return (value, sorted(deps))
+    return fn
+
+
+def test_independent_stages_overlap():
+    stages = [
+        Stage("sparql", sleeper(0.1, "q")),
+        Stage("raw_data", sleeper(0.2, "rows"), ("sparql",)),
+        Stage("explanation", sleeper(0.3, "why"), ("sparql",)),
+        Stage("answer", sleeper(0.2, "text"), ("raw_data",)),
+    ]
+    result = run_dag(stages)
+
+    assert result.results["answer"] == ("text", ["raw_data"])
+    assert result.results["explanation"] == ("why", ["sparql"])
+    # Sequential would be 0.8s; the critical path is sparql -> raw_data -> answer
+    assert result.total < 0.7
+    assert result.timings["explanation"].start < result.timings["raw_data"].end
+    critical, path = result.critical_path(stages)
+    assert path == ["sparql", "raw_data", "answer"]
+    assert critical == pytest.approx(0.5, abs=0.1)
+
+
+def test_callbacks_run_on_the_calling_thread():
+    caller = threading.get_ident()
+    seen = []
+    stages = [Stage("a", lambda: 1), Stage("b", lambda a: a + 1, ("a",))]
+    result = run_dag(stages, lambda name, value, timing: seen.append((name, value, threading.get_ident())))
+    assert seen == [("a", 1, caller), ("b", 2, caller)]
+    assert result.results == {"a": 1, "b": 2}
+
+
+def test_stage_errors_propagate():
+    def boom(a):
+        raise RuntimeError("model unavailable")
+
+    stages = [Stage("a", lambda: 1), Stage("b", boom, ("a",)), Stage("c", lambda b: b, ("b",))]
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        run_dag(stages)
+
+
+class FakeBackend(LLMBackend):
+    def stream(self, prompt):
+        for word in ["학생회관식당", " 김밥", " 2,500원"]:
+            time.sleep(0.02)
+            yield word
+
+
+def test_streamed_answer_records_first_token(monkeypatch):
+    from app.services import rag_pipeline, chat_pipeline
+    monkeypatch.setattr(rag_pipeline, "get_backend", lambda model_name: FakeBackend())
+    monkeypatch.setattr(chat_pipeline, "generate_sparql", lambda question, schema, version=None: "SELECT * WHERE { ?s ?p ?o }")
+    monkeypatch.setattr(chat_pipeline, "execute_sparql", lambda query, graph: [{"name": "김밥"}])
+
+    caller = threading.get_ident()
+    chunks = []
+    graph_version = type("GV", (), {"schema": "", "graph": None})()
+    result = chat_pipeline.answer_question(
+        "김밥 어디서 팔아?", graph_version,
+        on_chunk=lambda name, chunk: chunks.append((name, chunk, threading.get_ident())))
+
+    assert result.results["answer"] == "학생회관식당 김밥 2,500원"
+    assert [c for name, c, _ in chunks if name == "answer"] == ["학생회관식당", " 김밥", " 2,500원"]
+    assert {thread for _, _, thread in chunks} == {caller}
+    timing = result.stream_timings["answer"]
+    assert 0 < timing["ttft"] < timing["total"]
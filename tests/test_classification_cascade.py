@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from app.services.llm_backend import LLMBackend, use_backend
+from scripts.etl import classify_menus
+from scripts.etl.classification_store import ClassificationStore
+from scripts.etl.classification_cascade import ClassificationCascade, NgramIndex, rule_fields
+
+KIMCHI_STEW = {"cuisineType": "Korean", "containsMeat": True, "carbType": "None", "isSpicy": True}
+JJAMPPONG = {"cuisineType": "Chinese", "containsMeat": True, "carbType": "Noodle", "isSpicy": True}
+UDON = {"cuisineType": "Japanese", "containsMeat": False, "carbType": "Noodle", "isSpicy": False}
+MARINATED_CHICKEN = {"cuisineType": "Korean", "containsMeat": True, "carbType": "None", "isSpicy": False}
+OTHER = {"cuisineType": "Other", "containsMeat": False, "carbType": "None", "isSpicy": False}
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("김치우동", {"carbType": "Noodle", "cuisineType": "Japanese"}),
+    ("육개짬뽕밥", {"carbType": "Rice", "cuisineType": "Chinese", "isSpicy": True}),
+    ("버섯불고기", {"cuisineType": "Korean", "containsMeat": True}),
+    ("김치찌개(밥포함)", {"carbType": "Rice", "cuisineType": "Korean", "isSpicy": True}),
+    ("숯불양념치킨덮밥", {"carbType": "Rice", "containsMeat": True}),
+    ("돈까스&매운우동 : 7,000 원", {"carbType": "None", "containsMeat": True}),
+    ("오늘의차", {}),
+])
+def test_rule_fields(name, expected):
+    assert {field: value for field, (value, _) in rule_fields(name).items()} == expected
+
+
+def test_ngram_index_nearest():
+    index = NgramIndex([("김치찌개", KIMCHI_STEW), ("짬뽕", JJAMPPONG), ("유부우동", UDON)])
+    neighbours = index.nearest("참치김치찌개")
+    assert [key for _, key, _ in neighbours] == ["김치찌개"]
+    assert neighbours[0][0] == pytest.approx(2 * 4 / (7 + 5))
+    assert index.nearest("김치찌개", exclude="김치찌개") == []
+
+
+def test_cascade_tiers():
+    store = ClassificationStore()
+    for name, value in [("김치찌개", KIMCHI_STEW), ("매운양념치킨", dict(MARINATED_CHICKEN, isSpicy=True)),
+                        ("양념치킨", MARINATED_CHICKEN), ("짬뽕", JJAMPPONG)]:
+        store.add(name, value)
+    store.add("로컬추측", OTHER, source="rules")
+    cascade = ClassificationCascade(store, threshold=0.8)
+    # Local guesses are never neighbours
+    assert len(cascade.index) == 4
+
+    resolved, pending, tiers = cascade.resolve(["김치 찌개", "돼지김치찌개", "매운양념치킨버거", "해물짬뽕", "오늘의차"])
+
+    assert resolved["김치 찌개"] == (KIMCHI_STEW, "cache")
+    assert resolved["돼지김치찌개"] == (KIMCHI_STEW, "rules+neighbour")
+    assert resolved["매운양념치킨버거"] == ({"cuisineType": "Western", "containsMeat": True,
+                                           "carbType": "Bread", "isSpicy": True}, "rules+neighbour")
+    # Nothing says whether seafood jjamppong has meat
+    assert pending == ["해물짬뽕", "오늘의차"]
+    assert tiers == {"cache": 1, "rules+neighbour": 2}
+    # Without a spicy keyword, "매운양념치킨" does not vote on isSpicy
+    value, _, _ = cascade.classify("간장양념치킨")
+    assert value["isSpicy"] is False
+
+
+class RecordingBackend(LLMBackend):
+    name = "recording"
+
+    def __init__(self):
+        self.requested = []
+
+    def generate(self, prompt):
+        names = json.loads(prompt.split("Input items:")[1].split("Output JSON")[0])
+        self.requested.extend(names)
+        return json.dumps({name: OTHER for name in names}, ensure_ascii=False)
+
+
+def test_run_sends_only_low_confidence_names_to_llm(tmp_path):
+    menus = [{"lunch": {"description": "김치찌개 : 5,000 원\n돼지김치찌개 : 6,000 원\n오늘의차"}},
+             {"dinner": {"description": "김치 찌개 : 5,000 원\n해물짬뽕"}}]
+    menus_path = tmp_path / "menus.json"
+    menus_path.write_text(json.dumps(menus, ensure_ascii=False))
+    cache_path = tmp_path / "menu_classification.json"
+    cache_path.write_text(json.dumps({"김치찌개": KIMCHI_STEW, "짬뽕": JJAMPPONG}, ensure_ascii=False))
+    backend = RecordingBackend()
+    use_backend(classify_menus.MODEL_NAME, backend)
+    try:
+        stats = classify_menus.run(menus_path, cache_path, tmp_path / "menu_classification.jsonl",
+                                   rate=1000, threshold=0.8)
+    finally:
+        use_backend(classify_menus.MODEL_NAME, None)
+
+    assert sorted(backend.requested) == ["오늘의차", "해물짬뽕"]
+    assert stats["tiers"] == {"cache": 1, "rules+neighbour": 1, "llm": 2}
+    exported = json.loads(cache_path.read_text())
+    assert set(exported) == {"짬뽕", "김치찌개", "김치찌개 : 5,000 원", "김치 찌개 : 5,000 원",
+                             "돼지김치찌개 : 6,000 원", "해물짬뽕", "오늘의차"}
+    store = ClassificationStore(tmp_path / "menu_classification.jsonl")
+    assert store.source("돼지김치찌개") == "rules+neighbour" and store.source("오늘의차") is None
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from scripts.etl.menu_names import canonical_name, parse_menu_line
+from scripts.etl.classification_store import ClassificationStore
+
+KOREAN = {"cuisineType": "Korean", "containsMeat": False, "carbType": "None", "isSpicy": False}
+CHINESE = {"cuisineType": "Chinese", "containsMeat": True, "carbType": "Noodle", "isSpicy": True}
+
+
+@pytest.mark.parametrize("variant, canonical", [
+    ("*떡만두국*", "떡만두국"),
+    ("(짬뽕+짜장+볶음밥)", "짬뽕+짜장+볶음밥"),
+    ("짜장면 : 4,500 원", "짜장면"),
+    ("짬짜볶: 7,700 원", "짬짜볶"),
+    ("치킨탕수육 (大) : 8,900 원", "치킨탕수육"),
+    ("눈꽃 치즈 돈까스", "눈꽃치즈돈까스"),
+    ("연어 비빔밥(L)", "연어비빔밥"),
+    ("낙지쭈꾸미콩나물찜(#)", "낙지쭈꾸미콩나물찜"),
+    ("키친101\xa0비빔밥(야채)", "키친101비빔밥(야채)"),
+    ("김치찌개(밥포함)", "김치찌개(밥포함)"),
+    ("(소)떡(소)떡", "떡떡"),
+    ("Pork Cutlet", "porkcutlet"),
+])
+def test_canonical_name(variant, canonical):
+    assert canonical_name(variant) == canonical
+
+
+def test_parse_menu_line():
+    assert parse_menu_line("짜장면 : 4,500원") == ("짜장면", 4500)
+    assert parse_menu_line("※ 운영시간 변경") is None
+    assert parse_menu_line("김") is None
+
+
+def test_variants_share_one_classification(tmp_path):
+    store = ClassificationStore(tmp_path / "log.jsonl")
+    store.add("짜장면 : 4,500 원", CHINESE)
+    assert "짜장면" in store and store["*짜장면*"] == CHINESE
+    assert store.get("짬뽕") is None
+    store.add_names(["짜장면", "짬뽕"])
+    assert sorted(store.names()) == ["짜장면", "짜장면 : 4,500 원"]
+
+
+def test_log_replay_compact_and_export(tmp_path):
+    log = tmp_path / "log.jsonl"
+    store = ClassificationStore(log)
+    store.add("떡만두국", KOREAN)
+    store.add("짜장면", KOREAN)
+    store.add("짜장면 : 4,500 원", CHINESE)
+    store.close()
+    assert len(log.read_text().splitlines()) == 3
+    # A torn final line is ignored on replay
+    with open(log, "a") as f:
+        f.write('{"key": "짬')
+
+    store = ClassificationStore(log)
+    assert store["짜장면"] == CHINESE and len(store) == 2
+    store.compact()
+    assert len(log.read_text().splitlines()) == 2
+
+    exported = tmp_path / "menu_classification.json"
+    assert store.export_json(exported) == 3
+    assert json.loads(exported.read_text()) == {
+        "떡만두국": KOREAN, "짜장면": CHINESE, "짜장면 : 4,500 원": CHINESE,
+    }
+
+
+def test_seeds_from_json_export(tmp_path):
+    exported = tmp_path / "menu_classification.json"
+    exported.write_text(json.dumps({"*떡만두국*": KOREAN}, ensure_ascii=False))
+    log = tmp_path / "log.jsonl"
+
+    store = ClassificationStore(log, exported)
+    assert store["떡만두국"] == KOREAN and log.exists()
+    store.close()
+    assert ClassificationStore.from_json(exported).get("떡 만두국") == KOREAN
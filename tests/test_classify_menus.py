@@ -0,0 +1,153 @@
+import json
+import time
+import threading
+
+import pytest
+
+from app.services import llm_backend
+from app.services.llm_backend import LLMBackend, use_backend
+from scripts.etl import classify_menus
+from scripts.etl.classify_menus import (
+    MODEL_NAME, TokenBucket, AdaptiveBatchSize, parse_response, classify_all,
+)
+from scripts.etl.classification_store import ClassificationStore
+from scripts.utils import llm_standin_server
+
+ENTRY = {"cuisineType": "Korean", "containsMeat": True, "carbType": "Rice", "isSpicy": False}
+
+
+class FlakyBackend(LLMBackend):
+    """
+    Fails the first call, truncates the second response, and drops one item
+    from every batch larger than 3 on the first try.
+    """
+    name = "flaky"
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.seen = set()
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        names = json.loads(prompt.split("Input items:")[1].split("Output JSON")[0])
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.02)
+            if call == 1:
+                raise ConnectionError("reset by peer")
+            response = {name: ENTRY for name in names}
+            if len(names) > 3 and names[0] not in self.seen:
+                self.seen.add(names[0])
+                del response[names[-1]]
+            text = "```json\n" + json.dumps(response, ensure_ascii=False) + "\n```"
+            return text[:len(text) // 2] if call == 2 else text
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def backend():
+    fake = FlakyBackend()
+    use_backend(MODEL_NAME, fake)
+    yield fake
+    use_backend(MODEL_NAME, None)
+
+
+def test_parse_response_salvages_truncated_json():
+    names = ["김치찌개", "돈까스", "우동"]
+    text = json.dumps({"김치찌개": ENTRY, "돈까스": dict(ENTRY, isSpicy="no"), "우동": ENTRY}, ensure_ascii=False)
+    results, missing = parse_response(text[:-20], names)
+    assert results == {"김치찌개": ENTRY}
+    assert missing == ["돈까스", "우동"]
+
+    results, missing = parse_response("```json\n" + json.dumps({"우동": ENTRY, "기타": ENTRY}) + "\n```", names)
+    assert list(results) == ["우동"] and missing == ["김치찌개", "돈까스"]
+    assert parse_response("Sorry, I cannot help.", names) == ({}, names)
+
+
+def test_adaptive_batch_size():
+    sizer = AdaptiveBatchSize(initial=20, minimum=5, maximum=40, budget_chars=3000)
+    sizer.record(20, 20, 2000)
+    assert sizer.current() == 25
+    sizer.record(25, 10, 1000)
+    assert sizer.current() == 12
+    sizer.failed()
+    assert sizer.current() == 6
+    # Large responses cap the size regardless of success
+    for _ in range(10):
+        sizer.record(sizer.current(), sizer.current(), sizer.current() * 500)
+    assert sizer.current() == 6
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    # Two from the burst, five at 50/s
+    assert time.monotonic() - start >= 0.09
+
+
+def test_token_bucket_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0, capacity=1)
+    start = time.monotonic()
+    for _ in range(100):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_classify_all_requeues_failures(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(classify_menus.random, "uniform", lambda a, b: 0.0)
+    names = [f"메뉴{i}" for i in range(40)]
+    store = ClassificationStore(tmp_path / "menu_classification.jsonl")
+    store.add("기존메뉴", ENTRY)
+
+    stats = classify_all(names, store, concurrency=3, rate=1000, burst=10, batch_size=8)
+
+    assert stats["classified"] == 40 and not stats["given_up"]
+    assert stats["failed_requests"] == 1 and stats["requeued"] > 0
+    assert stats["items_per_second"] > 0
+    assert backend.max_in_flight > 1
+    store.close()
+    saved = ClassificationStore(tmp_path / "menu_classification.jsonl")
+    assert set(saved.names()) == set(names) | {"기존메뉴"}
+
+
+def test_rate_limited_retries_go_through_the_bucket(tmp_path, monkeypatch):
+    monkeypatch.setattr(classify_menus.random, "uniform", lambda a, b: 0.0)
+    monkeypatch.setattr(llm_backend.time, "sleep", lambda seconds: None)
+    received = []
+
+    def too_many_requests(handler):
+        handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+        received.append(time.monotonic())
+        handler.send_error(429)
+
+    monkeypatch.setattr(llm_standin_server.StandinHandler, "do_POST", too_many_requests)
+    server = llm_standin_server.make_server("127.0.0.1", 0, None)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("LLM_BACKEND", "http")
+    monkeypatch.setenv("LLM_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(llm_backend, "_backends", {})
+    try:
+        start = time.monotonic()
+        store = ClassificationStore(tmp_path / "menu_classification.jsonl")
+        stats = classify_all([f"메뉴{i}" for i in range(12)], store, concurrency=3, rate=20, burst=2,
+                             batch_size=4, max_attempts=3)
+        elapsed = time.monotonic() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Every attempt is one request, taken from the bucket and seen by the scheduler
+    assert len(received) == stats["requests"] == stats["failed_requests"] > 3
+    assert len(received) <= 2 + 20 * elapsed + 1
+    assert len(stats["given_up"]) == 12
@@ -0,0 +1,95 @@
+from collections import Counter
+
+import pytest
+from rdflib.plugins.sparql import prepareQuery
+
+from app.services.rag_pipeline import load_graph
+from app.services.columnar import try_execute
+
+PREFIXES = """
+PREFIX : <http://snu.ac.kr/dining/>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+"""
+
+# Queries the fast path must answer, in the shapes the competency questions produce
+FAST_QUERIES = [
+    """SELECT DISTINCT ?vName WHERE {
+         ?s a :MealService ; :mealType ?mt ; :providedAt ?v .
+         ?v :name ?vName .
+         FILTER(STR(?mt) = "breakfast") }""",
+    """SELECT ?vName WHERE {
+         ?s a :MealService ; :mealType "breakfast"^^xsd:string ; :providedAt ?v .
+         ?v a :Venue ; :name ?vName . }""",
+    # Plain literal does not match the xsd:string values in rdflib's triple index
+    """SELECT ?s WHERE { ?s :mealType "breakfast" }""",
+    """SELECT ?mName ?price ?vName WHERE {
+         ?m a :MenuItem ; :price ?price ; :menuName ?mName ; :partOfService ?s .
+         ?s :mealType ?mt ; :providedAt ?v . ?v :name ?vName .
+         FILTER(?price <= 5000 && STR(?mt) = "lunch") }""",
+    """SELECT DISTINCT ?vName WHERE {
+         ?v :offers ?s . ?s :hasMenu ?m . ?v :name ?vName .
+         ?m :carbType ?c . FILTER(STR(?c) = "Noodle") }""",
+    """SELECT ?mName ?vName WHERE {
+         ?m :isSpicy true ; :cuisineType "Korean"^^xsd:string ; :menuName ?mName ; :partOfService ?s .
+         ?s :providedAt ?v . ?v :building ?b ; :name ?vName .
+         FILTER(CONTAINS(?b, "학생회관")) }""",
+    """SELECT ?mName WHERE { ?m :containsMeat false ; :menuName ?mName . }""",
+    # Both 800 won items, cut before the 1000 won ones
+    """SELECT DISTINCT ?name ?price WHERE { ?m :menuName ?name ; :price ?price . } ORDER BY ?price LIMIT 2""",
+    """SELECT ?name ?price WHERE { ?m :menuName ?name ; :price ?price . FILTER(?price > 15000) } ORDER BY DESC(?price)""",
+    """SELECT (MIN(?p) AS ?minP) (MAX(?p) AS ?maxP) (COUNT(?m) AS ?n) (COUNT(DISTINCT ?p) AS ?d)
+       WHERE { ?m :price ?p . FILTER(?p < 6000) }""",
+    """SELECT (COUNT(*) AS ?n) (MIN(?p) AS ?minP) WHERE { ?m :price ?p . FILTER(?p < 0) }""",
+    """SELECT ?v (COUNT(?m) AS ?c) WHERE { ?m :partOfService ?s . ?s :providedAt ?v . }
+       GROUP BY ?v ORDER BY DESC(?c)""",
+    """SELECT ?s ?d WHERE { ?s a :MealService ; :date ?d ; :timeEnd ?end .
+         FILTER(?end >= "18:30:00"^^xsd:time) }""",
+    # Filters on a node variable (index-backed extension functions) run once per subject
+    """SELECT DISTINCT ?vName WHERE { ?s a :MealService ; :providedAt ?v . ?v :name ?vName .
+         FILTER(:openAfter(?s, "18:30")) }""",
+    """SELECT ?mName ?vName WHERE { ?m :menuName ?mName ; :partOfService ?s . ?s :providedAt ?v .
+         ?v :name ?vName . FILTER(:withinRadius(?v, "301동", 500)) }""",
+]
+
+# Shapes that must be left to rdflib
+FALLBACK_QUERIES = [
+    """SELECT ?m ?cat WHERE { ?m :category ?cat }""",
+    """SELECT ?name WHERE { ?m :menuName ?name } LIMIT 5""",
+    # Several 19000 won rows tie across the cut, so which ones rdflib keeps is arbitrary
+    """SELECT ?name ?price WHERE { ?m :menuName ?name ; :price ?price . } ORDER BY DESC(?price) LIMIT 3""",
+    """SELECT ?v WHERE { ?m :partOfService/:providedAt ?v }""",
+    """SELECT ?m WHERE { ?m :price ?p ; :menuName ?n . FILTER(?p > STRLEN(?n)) }""",
+    """SELECT ?m WHERE { ?m :price ?p . OPTIONAL { ?m :cuisineType ?c } }""",
+    """SELECT ?s WHERE { ?s a :MealService . FILTER(:openAt(?s, NOW())) }""",
+]
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return load_graph()
+
+
+def _prepare(graph, text):
+    return prepareQuery(PREFIXES + text, initNs=dict(graph.namespaces()))
+
+
+@pytest.mark.parametrize("text", FAST_QUERIES)
+def test_fast_path_matches_rdflib(graph, text):
+    query = _prepare(graph, text)
+    fast = try_execute(query, graph)
+    assert fast is not None
+
+    variables, rows = fast
+    expected = graph.query(query)
+    expected_rows = [tuple(row[v] for v in expected.vars) for row in expected]
+    assert variables == list(expected.vars)
+    assert Counter(rows) == Counter(expected_rows)
+
+    if "ORDER BY" in text:
+        key = len(variables) - 1 if "COUNT" in text else variables.index(next(v for v in variables if str(v) == "price"))
+        assert [r[key] for r in rows] == [r[key] for r in expected_rows]
+
+
+@pytest.mark.parametrize("text", FALLBACK_QUERIES)
+def test_unsupported_shapes_fall_back(graph, text):
+    assert try_execute(_prepare(graph, text), graph) is None
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from scripts.benchmark.competency import summarize, compare, RECORDINGS_PATH
+from app.services.llm_backend import RecordedResponses
+
+
+def test_summarize_percentiles():
+    stats = summarize([0.001 * i for i in range(1, 101)])
+    assert stats["n"] == 100
+    assert stats["p50_ms"] == pytest.approx(51.0)
+    assert stats["p99_ms"] == pytest.approx(100.0)
+    assert stats["min_ms"] == pytest.approx(1.0)
+
+
+def test_compare_flags_only_real_slowdowns():
+    def report(**p50s):
+        return {"meta": {}, "results": {name: {"p50_ms": value} for name, value in p50s.items()}}
+
+    baseline = report(a=10.0, b=10.0, c=0.2, d=5.0)
+    current = report(a=13.0, b=11.0, c=0.6, e=1.0)
+    regressions = compare(baseline, current, threshold=1.2, min_delta_ms=1.0)
+    # c tripled but by less than 1ms; d and e are not in both runs
+    assert [name for name, *_ in regressions] == ["a"]
+
+
+def test_every_competency_question_has_recordings():
+    with open(RECORDINGS_PATH) as f:
+        questions = json.load(f)["questions"]
+    responses = RecordedResponses(RECORDINGS_PATH)
+    for question in questions:
+        assert responses.respond(f"into a SPARQL\n{question}").startswith("PREFIX")
+        assert not responses.respond(f"cafeteria info\n{question}").startswith("요청하신")
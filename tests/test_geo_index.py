@@ -0,0 +1,74 @@
+import random
+
+import pytest
+from rdflib import Graph, Literal, RDF
+
+from app.services.rag_pipeline import execute_sparql
+from app.services.geo_index import SNU, GridIndex, geo_index_for, haversine_m, place_aliases
+
+VENUES = {
+    "v301": ("301동 (제1공학관)", "301동식당 (889-8955)", 37.4502, 126.9526),
+    "v302": ("302동 (제2공학관)", "302동식당 (880-1939)", 37.4488, 126.9525),
+    "student": ("학생회관", "학생회관식당 (880-5543)", 37.4594, 126.9507),
+    "dongwon": ("동원관", "동원관식당 (880-8697)", 37.4651, 126.9518),
+}
+
+PREFIX = "PREFIX : <http://snu.ac.kr/dining/>\n"
+
+
+def make_graph():
+    g = Graph()
+    g.bind("", SNU)
+    for key, (building, name, lat, lng) in VENUES.items():
+        venue = SNU[key]
+        g.add((venue, RDF.type, SNU.Venue))
+        g.add((venue, SNU.building, Literal(building)))
+        g.add((venue, SNU.name, Literal(name)))
+        g.add((venue, SNU.geoLat, Literal(lat)))
+        g.add((venue, SNU.geoLng, Literal(lng)))
+    return g
+
+
+def test_place_aliases():
+    assert place_aliases("301동 (제1공학관)") == {"301동제1공학관", "301동", "제1공학관", "301"}
+    assert place_aliases("301동식당 (889-8955)") == {"301동식당"}
+
+
+def test_grid_matches_brute_force():
+    rng = random.Random(7)
+    points = {i: (37.44 + rng.random() * 0.03, 126.94 + rng.random() * 0.03) for i in range(300)}
+    grid = GridIndex(points)
+    for _ in range(20):
+        lat, lng = 37.44 + rng.random() * 0.03, 126.94 + rng.random() * 0.03
+        brute = sorted((haversine_m(lat, lng, *p), key) for key, p in points.items())
+        assert grid.nearest(lat, lng, 5) == brute[:5]
+        assert grid.within(lat, lng, 400) == [hit for hit in brute if hit[0] <= 400]
+
+
+def test_locate():
+    index = geo_index_for(make_graph())
+    assert index.locate("301동") == index.locate("제1공학관") == index.locate("301") == (37.4502, 126.9526)
+    assert index.locate("301동 근처") == (37.4502, 126.9526)
+    assert index.locate(SNU.student) == index.locate("학생회관식당") == (37.4594, 126.9507)
+    assert index.locate("중앙도서관") is None
+
+
+def test_sparql_functions():
+    g = make_graph()
+    near = execute_sparql(PREFIX + """
+        SELECT ?name WHERE { ?v a :Venue ; :name ?name . FILTER(:withinRadius(?v, "301동", 500)) }
+        ORDER BY :distance(?v, "301동")
+    """, g)
+    assert [row["name"] for row in near] == ["301동식당 (889-8955)", "302동식당 (880-1939)"]
+
+    nearest = execute_sparql(PREFIX + """
+        SELECT ?name ?d WHERE { ?v a :Venue ; :name ?name . FILTER(:nearest(?v, "동원관", 2))
+                                BIND(:distance(?v, "동원관") AS ?d) } ORDER BY ?d
+    """, g)
+    assert [row["name"] for row in nearest] == ["동원관식당 (880-8697)", "학생회관식당 (880-5543)"]
+    assert float(nearest[1]["d"]) == pytest.approx(haversine_m(37.4651, 126.9518, 37.4594, 126.9507), abs=0.1)
+
+    # Unknown places match nothing rather than failing the query
+    assert execute_sparql(PREFIX + """
+        SELECT ?v WHERE { ?v a :Venue . FILTER(:withinRadius(?v, "중앙도서관", 500)) }
+    """, g) == []
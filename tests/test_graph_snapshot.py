@@ -0,0 +1,53 @@
+import gc
+
+import rdflib
+from rdflib import URIRef, Literal
+
+from app.services.graph_snapshot import snapshot_key, load_snapshot, save_snapshot, GraphRegistry
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_key_tracks_file_contents(tmp_path):
+    tbox = _write(tmp_path / "tbox.ttl", "@prefix : <http://snu.ac.kr/dining/> .\n")
+    abox = _write(tmp_path / "abox.ttl", ":a :b :c .\n")
+    key = snapshot_key(tbox, abox)
+
+    assert snapshot_key(tbox, abox) == key
+    _write(abox, ":a :b :d .\n")
+    assert snapshot_key(tbox, abox) != key
+
+
+def test_round_trip_and_stale_key(tmp_path):
+    g = rdflib.Graph()
+    g.bind("", "http://snu.ac.kr/dining/")
+    g.add((URIRef("http://snu.ac.kr/dining/v1"), URIRef("http://snu.ac.kr/dining/name"), Literal("학생회관식당")))
+    path = tmp_path / "cache" / "graph.pkl"
+
+    save_snapshot(g, path, "k1")
+    loaded = load_snapshot(path, "k1")
+
+    assert set(loaded) == set(g)
+    assert dict(loaded.namespaces())[""] == URIRef("http://snu.ac.kr/dining/")
+    assert load_snapshot(path, "k2") is None
+    assert load_snapshot(tmp_path / "missing.pkl", "k1") is None
+
+
+def test_registry_keeps_copies_of_one_snapshot_apart(tmp_path):
+    graph = rdflib.Graph()
+    graph.add((URIRef("http://snu.ac.kr/dining/a"), rdflib.RDF.type, URIRef("http://snu.ac.kr/dining/Venue")))
+    path = tmp_path / "snapshot.pkl"
+    save_snapshot(graph, path, "k")
+    old, new = load_snapshot(path, "k"), load_snapshot(path, "k")
+    assert old == new  # same identifier, so equality alone cannot tell them apart
+
+    registry = GraphRegistry()
+    registry[old] = "old"
+    registry[new] = "new"
+    assert registry.get(old) == "old"
+    del old
+    gc.collect()
+    assert registry.get(new) == "new"
@@ -0,0 +1,69 @@
+from rdflib import Graph, Literal, RDF, OWL, XSD
+
+from app.services.graph_snapshot import register_version
+from app.services.graph_stats import SNU, compute_stats, format_stats, load_stats, save_stats, stats_for
+from app.services.rag_pipeline import extract_schema_info
+
+
+def make_graph():
+    g = Graph()
+    g.bind("", SNU)
+    for cls in (SNU.Venue, SNU.MealService, SNU.MenuItem):
+        g.add((cls, RDF.type, OWL.Class))
+    g.add((SNU.offers, RDF.type, OWL.ObjectProperty))
+    g.add((SNU.venue, RDF.type, SNU.Venue))
+    g.add((SNU.venue, SNU.floor, Literal(2)))
+    for i, (meal, day) in enumerate([("lunch", "2026-01-15"), ("dinner", "2026-01-15"), ("lunch", "2026-01-16")]):
+        service = SNU[f"service{i}"]
+        g.add((service, RDF.type, SNU.MealService))
+        g.add((service, SNU.mealType, Literal(meal, datatype=XSD.string)))
+        g.add((service, SNU.date, Literal(day, datatype=XSD.date)))
+        g.add((SNU.venue, SNU.offers, service))
+    for i, (carb, price) in enumerate([("Noodle", 4000), ("Rice", 5000), ("Noodle", 7000), ("Bread", 3000)]):
+        item = SNU[f"item{i}"]
+        g.add((item, RDF.type, SNU.MenuItem))
+        g.add((item, SNU.carbType, Literal(carb)))
+        g.add((item, SNU.price, Literal(price)))
+    g.add((SNU.item0, SNU.tag, Literal("Spicy")))
+    return g
+
+
+def test_compute_stats():
+    stats = compute_stats(make_graph())
+    assert stats["classes"] == {":MealService": 3, ":MenuItem": 4, ":Venue": 1}
+    # Every value, most frequent first
+    assert stats["categorical"][":carbType"] == {"Noodle": 2, "Bread": 1, "Rice": 1}
+    assert stats["categorical"][":mealType"] == {"lunch": 2, "dinner": 1}
+    assert stats["categorical"][":tag"] == {"Spicy": 1}
+    assert stats["numeric"][":price"] == {"min": 3000, "max": 7000, "mean": 4750.0, "count": 4}
+    assert stats["numeric"][":floor"]["max"] == 2
+    assert stats["dates"] == {"first": "2026-01-15", "last": "2026-01-16", "days": 2}
+    assert stats["relations"] == [":venue :offers :service0"]
+
+
+def test_persisted_per_version(tmp_path):
+    path = str(tmp_path / "graph_stats.json")
+    save_stats({"classes": {}}, path, "v1")
+    assert load_stats(path, "v1") == {"classes": {}}
+    assert load_stats(path, "v2") is None
+
+    g = make_graph()
+    register_version(g, "v2")
+    stats = stats_for(g, path)
+    assert load_stats(path, "v2") == stats
+    # A fresh graph of the same version reads the file instead of computing
+    other = Graph()
+    register_version(other, "v2")
+    assert stats_for(other, path) == stats
+
+
+def test_schema_summary_lists_all_values():
+    g = make_graph()
+    schema = extract_schema_info(g, compute_stats(g))
+    assert 'Unique Values for :carbType (with counts): {"Noodle": 2, "Bread": 1, "Rice": 1}' in schema
+    assert ":price: 3000 ~ 7000" in schema
+    assert ":date: 2026-01-15 ~ 2026-01-16 (2 days)" in schema
+    assert ":venue :offers :service0" in schema
+
+    pruned = format_stats(compute_stats(g), {":price", ":MenuItem"})
+    assert pruned == "## Class Cardinalities\n:MenuItem: 4\n\n## Value Ranges\n:price: 3000 ~ 7000 (mean 4750.0, 4 values)"
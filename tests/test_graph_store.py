@@ -0,0 +1,130 @@
+import time
+import threading
+
+import pytest
+
+from app.services.graph_store import GraphStore, GraphVersion
+
+
+class Sources:
+    """
+    Stand-in for the Turtle files: a content key and a loader that counts calls.
+    """
+
+    def __init__(self, key="v1"):
+        self.key = key
+        self.loads = 0
+        self.fail = False
+
+    def load(self):
+        self.loads += 1
+        if self.fail:
+            raise RuntimeError("parse error")
+        time.sleep(0.05)
+        return GraphVersion(self.key, [f"triples of {self.key}"], f"schema of {self.key}", time.time())
+
+
+def make_store(sources, refresh_seconds=60):
+    return GraphStore(sources.load, refresh_seconds, lambda: sources.key)
+
+
+def test_first_load_happens_once():
+    sources = Sources()
+    store = make_store(sources)
+    assert not store.is_loaded()
+
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(store.current())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sources.loads == 1
+    assert store.is_loaded()
+    assert {version.version for version in seen} == {"v1"}
+
+
+def test_refresh_is_a_no_op_while_sources_are_unchanged():
+    sources = Sources()
+    store = make_store(sources)
+    first = store.current()
+    assert store.refresh() is first
+    assert sources.loads == 1
+
+
+def test_swap_keeps_the_version_readers_hold():
+    sources = Sources()
+    store = make_store(sources)
+    pinned = store.current()
+
+    sources.key = "v2"
+    swapped = store.refresh()
+    assert swapped.version == "v2" and store.current() is swapped
+    # A request that started on v1 keeps answering from v1
+    assert pinned.version == "v1" and pinned.graph == ["triples of v1"]
+
+
+def test_maybe_refresh_checks_once_per_interval():
+    sources = Sources()
+    store = make_store(sources, refresh_seconds=0.2)
+    first = store.current()
+
+    sources.key = "v2"
+    assert store.maybe_refresh() is first
+    assert sources.loads == 1
+    time.sleep(0.25)
+    assert store.maybe_refresh().version == "v2"
+    assert sources.loads == 2
+
+
+def test_failed_reload_keeps_the_current_version():
+    sources = Sources()
+    store = make_store(sources)
+    first = store.current()
+
+    sources.key, sources.fail = "v2", True
+    assert store.refresh() is first
+    # Not pinned: the next check retries
+    sources.fail = False
+    assert store.refresh().version == "v2"
+
+    failing = Sources()
+    failing.fail = True
+    with pytest.raises(RuntimeError):
+        make_store(failing).current()
+
+
+def test_unversioned_graph_is_not_published(monkeypatch):
+    from rdflib import Graph
+    from app.services import graph_store
+    # load_graph() leaves a partially parsed graph without a version
+    monkeypatch.setattr(graph_store, "load_graph", lambda **kwargs: Graph())
+    with pytest.raises(RuntimeError, match="partial graph"):
+        graph_store._load_version()
+
+
+def test_partitioned_load_indexes_only_the_view(monkeypatch, tmp_path):
+    import gc
+    import weakref
+    from app.services import graph_store, rag_pipeline, columnar, text_index
+
+    merged = []
+
+    def load_graph(build_indexes=True):
+        graph = rag_pipeline.load_graph(build_indexes=build_indexes)
+        merged.append((weakref.ref(graph), columnar._projections.get(graph), text_index._indexes.get(graph)))
+        return graph
+
+    monkeypatch.setattr(graph_store, "load_graph", load_graph)
+    monkeypatch.setattr(graph_store, "GRAPH_PARTITIONED", True)
+    monkeypatch.setattr(graph_store, "PARTITION_ARCHIVE_DIR", tmp_path)
+    version = graph_store._load_version()
+    gc.collect()
+
+    (ref, projection, index), = merged
+    assert projection is None and index is None
+    # The merged graph is released once split; the view has its own indexes
+    assert ref() is None
+    assert columnar._projections.get(version.graph) is not None
+    assert text_index._indexes.get(version.graph) is not None
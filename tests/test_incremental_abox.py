@@ -0,0 +1,92 @@
+import json
+import copy
+
+import pytest
+from rdflib import Graph
+
+from config import MENUS_JSON_PATH, VENUES_LOCATION_JSON_PATH, MENU_CLASSIFICATION_PATH
+from scripts.etl.generate_knowledge_graph import load_inputs, build_graph, run_incremental
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    menus = json.loads(MENUS_JSON_PATH.read_text())
+    (tmp_path / "menus.json").write_text(json.dumps(menus, ensure_ascii=False))
+    paths = dict(
+        menus_path=tmp_path / "menus.json",
+        venues_path=VENUES_LOCATION_JSON_PATH,
+        classification_path=MENU_CLASSIFICATION_PATH,
+        output_path=tmp_path / "abox_final.ttl",
+        manifest_path=tmp_path / "abox_manifest.json",
+        parts_dir=tmp_path / "abox_parts",
+    )
+    return menus, paths
+
+
+def _full(paths):
+    return build_graph(*load_inputs(paths["menus_path"], paths["venues_path"], paths["classification_path"]))
+
+
+def _assert_same(paths):
+    incremental = Graph().parse(paths["output_path"], format="turtle")
+    full = _full(paths)
+    assert len(incremental) == len(full)
+    assert not (incremental - full) and not (full - incremental)
+
+
+def test_first_run_matches_full_build(workspace):
+    menus, paths = workspace
+    summary = run_incremental(**paths)
+    assert summary["new"] > 0 and summary["dates_written"] == len({m["date"] for m in menus})
+    _assert_same(paths)
+
+    again = run_incremental(**paths)
+    assert again["dates_written"] == 0 and again["triples_written"] == 0
+    assert again["unchanged"] == summary["new"]
+
+
+def test_only_touched_dates_are_rewritten(workspace):
+    menus, paths = workspace
+    run_incremental(**paths)
+    dates = sorted({m["date"] for m in menus})
+
+    # A new day, one edited service on another day, and one restaurant dropped from a third day
+    new_day = [dict(copy.deepcopy(m), date="2026-01-17") for m in menus if m["date"] == dates[-1]]
+    edited = next(m for m in menus if m["date"] == dates[0] and m.get("lunch", {}).get("description"))
+    edited["lunch"]["description"] += "\n새메뉴 : 4,500원"
+    dropped = next(m for m in menus if m["date"] == dates[1])
+    menus = [m for m in menus if m is not dropped] + new_day
+    paths["menus_path"].write_text(json.dumps(menus, ensure_ascii=False))
+
+    summary = run_incremental(**paths)
+    assert summary["changed"] == 1
+    assert summary["removed"] >= 1
+    assert summary["new"] > 0
+    assert summary["dates_written"] == 3
+    _assert_same(paths)
+
+    # Removing a whole date deletes its part
+    menus = [m for m in menus if m["date"] != "2026-01-17"]
+    paths["menus_path"].write_text(json.dumps(menus, ensure_ascii=False))
+    run_incremental(**paths)
+    assert not (paths["parts_dir"] / "2026-01-17.nt").exists()
+    _assert_same(paths)
+
+
+def test_new_dates_are_appended_without_hashing_old_ones(workspace, monkeypatch):
+    from scripts.etl import generate_knowledge_graph
+    menus, paths = workspace
+    run_incremental(**paths)
+    last = max(m["date"] for m in menus)
+    new_day = [dict(copy.deepcopy(m), date="2026-01-17") for m in menus if m["date"] == last]
+    paths["menus_path"].write_text(json.dumps(menus + new_day, ensure_ascii=False))
+
+    hashed = []
+    service_hash = generate_knowledge_graph.service_hash
+    monkeypatch.setattr(generate_knowledge_graph, "service_hash",
+                        lambda service_data, *args: hashed.append(service_data) or service_hash(service_data, *args))
+    summary = run_incremental(**paths)
+    # Only the new day's services were looked at
+    assert len(hashed) == summary["new"] and summary["dates_written"] == 1
+    assert summary["output"] == "appended"
+    _assert_same(paths)
@@ -0,0 +1,136 @@
+import json
+import threading
+
+import pytest
+
+from app.services.llm_backend import HTTPBackend, HTTPStatusError, ReplayBackend, RecordedResponses, _with_retries
+from scripts.utils.llm_standin_server import make_server
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    path = tmp_path / "recordings.json"
+    path.write_text(json.dumps({"responses": [
+        {"contains": ["into a SPARQL", "아침"], "text": 'SELECT ?v WHERE { ?s :mealType "breakfast" ; :providedAt ?v }'},
+        {"contains": ["cafeteria info"], "text": "자하연식당 2층에서 아침을 드실 수 있습니다. 운영 시간은 8시부터입니다."},
+    ]}, ensure_ascii=False))
+    return path
+
+
+@pytest.fixture
+def standin(recordings):
+    server = make_server("127.0.0.1", 0, recordings, latency=0.01)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_recordings_match_on_all_fragments(recordings):
+    responses = RecordedResponses(recordings)
+    assert "breakfast" in responses.respond("Convert ... into a SPARQL 1.1 query. # Question 아침 먹을 곳")
+    # Unrecorded prompts get deterministic canned responses
+    assert responses.respond("Convert ... into a SPARQL query. 점심").startswith("SELECT ?vName")
+    assert responses.respond("hello") == responses.respond("hello")
+    classified = json.loads(responses.respond('food ontology expert\nInput items:\n["김밥", "라면"]\nOutput JSON only.'))
+    assert set(classified) == {"김밥", "라면"}
+
+
+def test_http_backend_generate_and_stream(standin):
+    backend = HTTPBackend(standin, "test-model", timeout=5, max_retries=0)
+    prompt = "cafeteria info question"
+    text = backend.generate(prompt)
+    assert text.startswith("자하연식당 2층")
+
+    chunks = list(backend.stream(prompt))
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    # Both requests went over one pooled keep-alive connection
+    assert backend._pool.qsize() == 1
+
+
+def test_http_backend_concurrent_requests(standin):
+    backend = HTTPBackend(standin, "test-model", timeout=5, max_retries=0, pool_size=4)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(backend.generate("cafeteria info"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 8 and len(set(results)) == 1
+    assert backend._pool.qsize() <= 4
+
+
+def test_replay_backend_streams_recorded_text(recordings):
+    backend = ReplayBackend(recordings)
+    assert "".join(backend.stream("cafeteria info")) == backend.generate("cafeteria info")
+
+
+def test_retries_only_retriable_errors(monkeypatch):
+    monkeypatch.setattr("app.services.llm_backend.time.sleep", lambda seconds: None)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionResetError("reset")
+        return "ok"
+
+    assert _with_retries(flaky, 2, lambda e: isinstance(e, OSError), "test") == "ok"
+    with pytest.raises(ValueError):
+        _with_retries(lambda: (_ for _ in ()).throw(ValueError("bad")), 5, lambda e: isinstance(e, OSError), "test")
+
+
+def test_http_backend_retries_retriable_statuses(standin, monkeypatch):
+    monkeypatch.setattr("app.services.llm_backend.time.sleep", lambda seconds: None)
+    from scripts.utils import llm_standin_server
+
+    statuses = [503, 429]
+    original = llm_standin_server.StandinHandler.do_POST
+
+    def failing_post(handler):
+        if statuses:
+            length = int(handler.headers.get("Content-Length", 0))
+            handler.rfile.read(length)
+            handler.send_error(statuses.pop(0))
+            return
+        original(handler)
+
+    monkeypatch.setattr(llm_standin_server.StandinHandler, "do_POST", failing_post)
+    backend = HTTPBackend(standin, "test-model", timeout=5, max_retries=2)
+    assert backend.generate("cafeteria info").startswith("자하연식당 2층")
+    assert statuses == []
+
+    statuses.append(400)
+    with pytest.raises(HTTPStatusError) as excinfo:
+        backend.generate("cafeteria info")
+    assert excinfo.value.status == 400 and statuses == []
+
+
+def test_http_backend_retries_truncated_bodies(standin, monkeypatch):
+    monkeypatch.setattr("app.services.llm_backend.time.sleep", lambda seconds: None)
+    from scripts.utils import llm_standin_server
+
+    truncated = [b'{"text": "\xec\x9e\x90\xed\x95\x98', b'{"text": 1']
+    original = llm_standin_server.StandinHandler.do_POST
+
+    def truncating_post(handler):
+        if not truncated:
+            return original(handler)
+        handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+        body = truncated.pop(0)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        # The first body is cut short of its Content-Length, the second is complete but not JSON
+        handler.send_header("Content-Length", str(len(body) + (100 if len(truncated) == 1 else 0)))
+        handler.end_headers()
+        handler.wfile.write(body)
+        handler.close_connection = True
+
+    monkeypatch.setattr(llm_standin_server.StandinHandler, "do_POST", truncating_post)
+    backend = HTTPBackend(standin, "test-model", timeout=5, max_retries=2)
+    assert backend.generate("cafeteria info").startswith("자하연식당 2층")
+    assert truncated == []
+    # Only the connection of the successful response went back to the pool
+    assert backend._pool.qsize() == 1
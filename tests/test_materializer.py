@@ -0,0 +1,83 @@
+import io
+import contextlib
+
+import pytest
+from rdflib import Graph, Literal, Namespace
+from rdflib.namespace import RDF, OWL, XSD
+
+from config import TBOX_PATH
+from scripts.validation.materializer import Materializer
+from scripts.validation.run_reasoning_validation import owlrl_closure
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+
+@pytest.fixture(scope="module")
+def tbox():
+    return Graph().parse(TBOX_PATH, format="turtle")
+
+
+def _abox():
+    g = Graph()
+    g.add((SNU.v1, RDF.type, SNU.Venue))
+    g.add((SNU.v1, SNU.name, Literal("학생회관식당", datatype=XSD.string)))
+    g.add((SNU.v1, SNU.geoLat, Literal("37.4590", datatype=XSD.decimal)))
+    # Only one direction of each inverse pair, and no explicit types for s1/m1/m2
+    g.add((SNU.v1, SNU.offers, SNU.s1))
+    g.add((SNU.s1, SNU.hasMenu, SNU.m1))
+    g.add((SNU.m2, SNU.partOfService, SNU.s1))
+    g.add((SNU.s1, SNU.mealType, Literal("lunch", datatype=XSD.string)))
+    g.add((SNU.m1, SNU.price, Literal(5000, datatype=XSD.integer)))
+    g.add((SNU.m2, SNU.isSpicy, Literal(True)))
+    return g
+
+
+def test_matches_owlrl(tbox):
+    abox = _abox()
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = owlrl_closure(abox, tbox)
+    materializer = Materializer(tbox)
+    materializer.materialize(abox)
+    inferred = materializer.inferred_graph()
+
+    assert set(inferred) == set(expected)
+    assert (SNU.s1, SNU.providedAt, SNU.v1) in inferred
+    assert (SNU.s1, SNU.hasMenu, SNU.m2) in inferred
+    assert (SNU.m1, RDF.type, SNU.MenuItem) in inferred
+    assert (SNU.m1, RDF.type, OWL.Thing) in inferred
+
+
+def test_delta_matches_rematerialization(tbox):
+    abox = set(_abox())
+    materializer = Materializer(tbox)
+    materializer.materialize(abox)
+
+    removed = {(SNU.v1, SNU.offers, SNU.s1), (SNU.m2, SNU.isSpicy, Literal(True))}
+    added = {(SNU.s2, SNU.providedAt, SNU.v1), (SNU.m1, SNU.partOfService, SNU.s2)}
+    net_added, net_removed = materializer.update(added=added, removed=removed)
+
+    fresh = Materializer(tbox)
+    fresh.materialize((abox - removed) | added)
+    assert materializer.closure == fresh.closure
+    assert set(materializer.inferred_graph()) == set(fresh.inferred_graph())
+    assert (SNU.s1, SNU.providedAt, SNU.v1) in net_removed
+    assert (SNU.v1, SNU.offers, SNU.s2) in net_added
+    # m1 still typed through hasMenu from s1
+    assert (SNU.m1, RDF.type, SNU.MenuItem) in materializer.closure
+
+    # Retracting an asserted triple that is also entailed keeps it in the closure
+    materializer.update(added=[(SNU.s1, SNU.providedAt, SNU.v1)])
+    _, net_removed = materializer.update(removed=[(SNU.s2, SNU.providedAt, SNU.v1)],
+                                         added=[(SNU.v1, SNU.offers, SNU.s2)])
+    assert (SNU.s2, SNU.providedAt, SNU.v1) in materializer.closure
+    assert not net_removed
+
+
+def test_rejects_uncompiled_axioms(tbox):
+    g = Graph()
+    g += tbox
+    g.add((SNU.offers, RDF.type, OWL.TransitiveProperty))
+    with pytest.raises(ValueError):
+        Materializer(g)
+    with pytest.raises(ValueError):
+        Materializer(tbox).materialize([(SNU.v1, OWL.sameAs, SNU.v2)])
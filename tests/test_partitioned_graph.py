@@ -0,0 +1,98 @@
+from datetime import date
+
+import pytest
+from rdflib import Graph, Literal, RDF, RDFS, XSD
+
+from app.services.graph_snapshot import graph_version
+from app.services.graph_store import GraphVersion, scoped_graph
+from app.services.partitioned_graph import SNU, PartitionedGraph, date_window, split_by_date
+
+DATES = [date(2026, 1, 1), date(2026, 1, 10), date(2026, 1, 14), date(2026, 1, 15), date(2026, 1, 16)]
+
+
+def make_graph():
+    g = Graph()
+    g.bind("", SNU)
+    g.add((SNU.MealService, RDF.type, RDFS.Class))
+    g.add((SNU.venue, RDF.type, SNU.Venue))
+    g.add((SNU.venue, RDFS.label, Literal("학생회관")))
+    for day in DATES:
+        service, item = SNU[f"service_{day}"], SNU[f"item_{day}"]
+        g.add((service, RDF.type, SNU.MealService))
+        g.add((service, SNU.date, Literal(day.isoformat(), datatype=XSD.date)))
+        g.add((SNU.venue, SNU.offers, service))
+        g.add((item, SNU.partOfService, service))
+        g.add((item, RDFS.label, Literal(f"메뉴 {day}")))
+    return g
+
+
+def items(graph):
+    return sorted(str(label) for label in graph.objects(None, RDFS.label) if str(label).startswith("메뉴"))
+
+
+def test_split_by_date_covers_graph():
+    g = make_graph()
+    static, partitions = split_by_date(g)
+    assert sorted(partitions) == DATES
+    assert all(len(triples) == 5 for triples in partitions.values())
+    assert set(static) | {t for triples in partitions.values() for t in triples} == set(g)
+    assert (SNU.venue, RDFS.label, Literal("학생회관")) in static
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("오늘 점심 뭐야?", ("2026-01-16", "2026-01-16")),
+    ("어제 저녁 메뉴", ("2026-01-15", "2026-01-15")),
+    ("그제 나온 돈까스", ("2026-01-14", "2026-01-14")),
+    ("1월 10일 학생회관", ("2026-01-10", "2026-01-10")),
+    ("2026-01-01 메뉴", ("2026-01-01", "2026-01-01")),
+    ("이번 주 메뉴", ("2026-01-12", "2026-01-18")),
+    ("지난주 수요일", ("2026-01-07", "2026-01-07")),
+    ("최근 3일 동안", ("2026-01-14", "2026-01-16")),
+    ("지난달 메뉴", ("2025-12-01", "2025-12-31")),
+    ("매운 음식 있는 식당", None),
+    ("1/15(목) 점심", ("2026-01-15", "2026-01-15")),
+    ("1/2 인분 메뉴", None),
+    ("2026-13-45 메뉴", None),
+])
+def test_date_window(question, expected):
+    window = date_window(question, date(2026, 1, 16))
+    assert window == (expected and tuple(map(date.fromisoformat, expected)))
+
+
+def test_retention_archives_and_loads_lazily(tmp_path):
+    g = make_graph()
+    partitioned = PartitionedGraph(g, "v1", tmp_path, retention_days=3, today=date(2026, 1, 16))
+    assert sorted(partitioned.partitions) == DATES[2:]
+    assert sorted(partitioned.archived) == DATES[:2]
+    assert sorted(p.name for p in (tmp_path / "v1").iterdir()) == ["2026-01-01.nt", "2026-01-10.nt"]
+    assert len(partitioned.dataset) == len(g) - 10
+
+    retained = partitioned.view()
+    assert items(retained) == ["메뉴 2026-01-14", "메뉴 2026-01-15", "메뉴 2026-01-16"]
+    assert partitioned.graph_for("어제 메뉴") is not retained
+    assert items(partitioned.graph_for("어제 메뉴")) == ["메뉴 2026-01-15"]
+
+    history = partitioned.graph_for("1월 10일 메뉴")
+    assert items(history) == ["메뉴 2026-01-10"]
+    assert (SNU.venue, SNU.offers, SNU["service_2026-01-10"]) in history
+    assert partitioned.view((date(2025, 12, 1), date(2026, 1, 31))).isomorphic(g)
+    # Views are cached per set of partitions and versioned apart from each other
+    assert partitioned.graph_for("1/10 메뉴") is history
+    assert graph_version(history) != graph_version(retained)
+
+
+def test_today_is_the_real_date(tmp_path):
+    partitioned = PartitionedGraph(make_graph(), "v1", tmp_path, retention_days=3, today=date(2026, 10, 18))
+    # Retention follows the newest loaded date; "오늘" stays today, with no menus yet
+    assert sorted(partitioned.partitions) == DATES[2:]
+    assert partitioned.window("오늘 메뉴") == (date(2026, 10, 18), date(2026, 10, 18))
+    assert items(partitioned.graph_for("오늘 메뉴")) == []
+
+
+def test_scoped_graph():
+    g = make_graph()
+    partitioned = PartitionedGraph(g, "v1", today=date(2026, 1, 16))
+    version = GraphVersion("v1", partitioned.view(), "", 0.0, partitioned)
+    assert scoped_graph(version, "매운 음식") is version.graph
+    assert items(scoped_graph(version, "오늘 메뉴")) == ["메뉴 2026-01-16"]
+    assert scoped_graph(GraphVersion("v1", g, "", 0.0), "오늘 메뉴") is g
@@ -0,0 +1,57 @@
+from app.services.query_cache import QueryResultCache, canonicalize, is_volatile
+
+NS = {"": "http://snu.ac.kr/dining/"}
+
+
+def test_equivalent_queries_share_a_key():
+    a = """PREFIX : <http://snu.ac.kr/dining/>
+    SELECT ?vName WHERE {
+      ?s :mealType ?mt ; :providedAt ?v .   # breakfast venues
+      ?v :name ?vName .
+      FILTER(STR(?mt) = "breakfast")
+    }"""
+    b = 'prefix d: <http://snu.ac.kr/dining/> select ?n where { ?x d:mealType ?t ; d:providedAt ?y . ?y d:name ?n . filter(str(?t) = "breakfast") }'
+    c = 'SELECT ?n WHERE { ?x :mealType ?t ; :providedAt ?y . ?y :name ?n . FILTER(STR(?t) = "breakfast") }'
+
+    key_a, names_a = canonicalize(a, NS)
+    assert canonicalize(b, NS)[0] == key_a
+    assert canonicalize(c, NS)[0] == key_a
+    assert names_a == {"vName": "v0", "s": "v1", "mt": "v2", "v": "v3"}
+
+
+def test_literals_and_numbers_stay_significant():
+    base = 'SELECT ?m WHERE { ?m :price ?p FILTER(?p <= 5000) }'
+    assert canonicalize(base, NS)[0] != canonicalize(base.replace("5000", "50 00"), NS)[0]
+    assert canonicalize('SELECT ?s WHERE { ?s :name "Select  #x" }', NS)[0].endswith('"Select  #x" }')
+
+
+def test_volatile_queries():
+    assert is_volatile("SELECT ?s WHERE { ?s a :MealService . FILTER(:openAt(?s, now())) }")
+    assert is_volatile("SELECT (RAND() AS ?r) WHERE {}")
+    assert not is_volatile('SELECT ?s WHERE { ?s :name "now" ; :known ?k }')
+
+
+def test_hits_are_renamed_to_the_callers_variables():
+    cache = QueryResultCache(max_entries=4, max_bytes=1 << 20)
+    key, names = canonicalize("SELECT ?name WHERE { ?m :menuName ?name }", NS)
+    cache.put(key, "g1", names, [{"name": "김밥"}])
+
+    other_key, other_names = canonicalize("SELECT ?menu WHERE { ?x :menuName ?menu }", NS)
+    assert other_key == key
+    assert cache.get(other_key, "g1", other_names) == [{"menu": "김밥"}]
+    # A regenerated graph is a different version and misses
+    assert cache.get(key, "g2", names) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_respects_entry_and_byte_bounds():
+    cache = QueryResultCache(max_entries=2, max_bytes=1 << 20)
+    for i in range(3):
+        cache.put(f"q{i}", "g", {}, [{"x": str(i)}])
+    assert cache.get("q0", "g", {}) is None
+    assert cache.get("q2", "g", {}) == [{"x": "2"}]
+    assert cache.stats()["evictions"] == 1
+
+    small = QueryResultCache(max_entries=100, max_bytes=4000)
+    small.put("big", "g", {}, [{"x": "y" * 10}] * 100)
+    assert small.stats()["entries"] == 0
@@ -0,0 +1,92 @@
+import re
+import json
+from collections import Counter
+
+import pytest
+from rdflib import Graph, Literal, OWL, RDF, RDFS, Variable, XSD
+from rdflib.plugins.sparql import prepareQuery
+
+from config import SPARQL_EXAMPLES_PATH
+from app.services.graph_stats import SNU, compute_stats
+from app.services.query_optimizer import drop_implied_types, optimize_query, order_triples
+from app.services.rag_pipeline import load_graph
+
+PREFIX = "PREFIX : <http://snu.ac.kr/dining/>\n"
+
+
+def make_graph():
+    g = Graph()
+    g.bind("", SNU)
+    for cls in (SNU.Venue, SNU.MealService, SNU.MenuItem):
+        g.add((cls, RDF.type, OWL.Class))
+    g.add((SNU.providedAt, RDFS.domain, SNU.MealService))
+    g.add((SNU.providedAt, RDFS.range, SNU.Venue))
+    g.add((SNU.mealType, RDFS.domain, SNU.MealService))
+    for v in range(3):
+        venue = SNU[f"venue{v}"]
+        g.add((venue, RDF.type, SNU.Venue))
+        g.add((venue, SNU.name, Literal(f"식당{v}")))
+        for i, meal in enumerate(["breakfast", "lunch", "dinner"]):
+            service = SNU[f"service{v}_{i}"]
+            g.add((service, RDF.type, SNU.MealService))
+            g.add((service, SNU.providedAt, venue))
+            # The ETL writes xsd:string; one venue has a plain literal
+            g.add((service, SNU.mealType, Literal(meal, datatype=XSD.string if v else None)))
+    return g
+
+
+def rows(graph, query):
+    return Counter(tuple(row) for row in graph.query(query))
+
+
+@pytest.mark.parametrize("condition", [
+    'STR(?mt) = "lunch"',
+    '"dinner" = STR(?mt)',
+    '?mt = "lunch"',
+    'STR(?mt) IN ("lunch", "dinner")',
+    'STR(?mt) = "breakfast" || STR(?mt) = "dinner"',
+    'STR(?mt) = "brunch"',
+])
+def test_equality_pushdown(condition):
+    g = make_graph()
+    text = PREFIX + f"""SELECT ?name ?mt WHERE {{ ?s a :MealService ; :mealType ?mt ; :providedAt ?v .
+        ?v :name ?name . FILTER({condition}) }}"""
+    expected = rows(g, prepareQuery(text, initNs=dict(g.namespaces())))
+    query = prepareQuery(text, initNs=dict(g.namespaces()))
+    changes = optimize_query(query, g, compute_stats(g))
+    assert changes["pushed"] == 1
+    assert rows(g, query) == expected
+
+
+def test_drop_implied_types():
+    implied = compute_stats(make_graph())["implied_types"]
+    s, v = Variable("s"), Variable("v")
+    triples = [(s, RDF.type, SNU.MealService), (s, SNU.providedAt, v), (v, RDF.type, SNU.Venue),
+               (v, RDF.type, SNU.MenuItem)]
+    # MenuItem is not implied by :providedAt and stays
+    assert drop_implied_types(triples, implied) == [(s, SNU.providedAt, v), (v, RDF.type, SNU.MenuItem)]
+
+
+def test_order_triples_follows_joins():
+    stats = compute_stats(make_graph())
+    s, v, name, mt = Variable("s"), Variable("v"), Variable("name"), Variable("mt")
+    triples = [(s, SNU.mealType, mt), (s, SNU.providedAt, v), (v, SNU.name, name)]
+    # Smallest first, then only patterns joined to what is already bound
+    assert order_triples(triples, stats) == [(v, SNU.name, name), (s, SNU.providedAt, v), (s, SNU.mealType, mt)]
+    assert order_triples(triples, stats, {mt})[0] == (s, SNU.mealType, mt)
+
+
+def test_examples_unchanged_on_full_graph():
+    graph = load_graph()
+    namespaces = dict(graph.namespaces())
+    with open(SPARQL_EXAMPLES_PATH, encoding="utf-8") as f:
+        examples = json.load(f)
+    optimized = 0
+    for example in examples:
+        # Without LIMIT, rows do not depend on evaluation order
+        text = PREFIX + re.sub(r"\bLIMIT\s+\d+", "", example["sparql"])
+        query = prepareQuery(text, initNs=namespaces)
+        changes = optimize_query(query, graph)
+        optimized += any(changes.values())
+        assert rows(graph, query) == rows(graph, prepareQuery(text, initNs=namespaces)), example["question"]
+    assert optimized >= len(examples) // 2
@@ -0,0 +1,108 @@
+import datetime
+
+import pytest
+
+from config import VENUES_LOCATION_JSON_PATH
+from app.services.question_cache import QuestionCache, normalize_question, match_template, load_venue_gazetteer
+
+GAZETTEER = load_venue_gazetteer(VENUES_LOCATION_JSON_PATH)
+
+TEMPLATE_QUESTIONS = [
+    ("지금 아침 식사 되는 식당 어디야?", ['STR(?mealType) = "breakfast"', "SELECT DISTINCT ?venueName WHERE"]),
+    ("5,000원 이하로 점심 먹을 수 있는 곳 있어?", ["?price <= 5000", '"lunch"']),
+    ("오늘 면 요리(Noodle) 먹고 싶은데 어디로 가면 돼?", ['"Noodle"']),
+    ("오늘 매콤한 한식 땡기는데, 학생회관 근처에 그런 메뉴 있어?", ['"Korean"', ":isSpicy true", 'CONTAINS(?venueKey, "학생회관")']),
+    ("오늘 고기 없는 식단(채식) 있어?", [":containsMeat false"]),
+    ("오늘 저녁 6시 30분 이후에도 밥 먹을 수 있는 곳 있어?", [':openAfter(?service, "18:30")']),
+    ("나 매운 거 못 먹는데, 안 매운 걸로 추천해줘.", [":isSpicy false"]),
+    ("오늘 나온 메뉴 중에 제일 싼 게 뭐야?", ["ORDER BY ASC(?price)\nLIMIT 1"]),
+    ("301동식당 일식 메뉴", ['"Japanese"', ':name ?venueKey . FILTER(CONTAINS(?venueKey, "301동식당"))']),
+]
+
+# Unrecognized words (or ambiguous ones like 중식: lunch or Chinese?) leave the question to the LLM
+LLM_QUESTIONS = [
+    "바쁜데 빨리 받아서 갈 수 있는(테이크아웃) 점심 메뉴 추천해줘.",
+    "301동(공대) 근처에 일식 파는 식당 찾아줘.",
+    "중식 메뉴 알려줘",
+    "점심이랑 저녁 둘 다 하는 곳",
+    "오늘 뭐 먹지?",
+]
+
+
+def test_normalize_question():
+    assert normalize_question("  5,000원 이하로   점심?! ") == "5000원 이하로 점심"
+    assert normalize_question("오늘 면 요리(Noodle)") == normalize_question("오늘 면 요리 noodle")
+
+
+@pytest.mark.parametrize("question,fragments", TEMPLATE_QUESTIONS)
+def test_template_slots(question, fragments):
+    query = match_template(question, GAZETTEER)
+    assert query is not None
+    for fragment in fragments:
+        assert fragment in query
+
+
+def test_now_and_today_constrain_the_template():
+    now = match_template("지금 아침 식사 되는 식당 어디야?", GAZETTEER)
+    assert "FILTER(:openAt(?service, NOW()))" in now
+    today = match_template("오늘 고기 없는 식단(채식) 있어?", GAZETTEER, today=datetime.date(2026, 1, 15))
+    assert 'FILTER(STR(?serviceDate) = "2026-01-15")' in today
+    assert "NOW()" not in match_template("아침 식사 되는 식당 어디야?", GAZETTEER)
+
+
+@pytest.mark.parametrize("question", LLM_QUESTIONS)
+def test_unmatched_questions_fall_through(question):
+    assert match_template(question, GAZETTEER) is None
+
+
+def test_promoted_queries_persist(tmp_path):
+    path = tmp_path / "question_cache.json"
+    cache = QuestionCache(path, VENUES_LOCATION_JSON_PATH)
+    question = "301동(공대) 근처에 일식 파는 식당 찾아줘."
+    query = 'SELECT ?v WHERE { ?v a :Venue ; :building ?b . FILTER(CONTAINS(?b, "301")) }'
+
+    assert cache.match(question) == (None, None)
+    assert not cache.promote(question, "SELECT ?v WHERE {")
+    assert cache.promote(question, query)
+
+    reloaded = QuestionCache(path, VENUES_LOCATION_JSON_PATH)
+    assert reloaded.match("301동 (공대) 근처에 일식 파는 식당 찾아줘") == (query, "exact")
+    assert reloaded.match("오늘 고기 없는 식단(채식) 있어?")[1] == "template"
+
+
+def test_entries_are_per_graph_version_and_bounded(tmp_path):
+    cache = QuestionCache(tmp_path / "question_cache.json", VENUES_LOCATION_JSON_PATH, max_entries=2)
+    query = 'SELECT ?v WHERE { ?v a :Venue }'
+
+    assert cache.promote("식당 목록 보여줘", query, "v1")
+    assert cache.match("식당 목록 보여줘", "v1") == (query, "exact")
+    # Not served on another graph version, and dropped once that version promotes
+    assert cache.match("식당 목록 보여줘", "v2") == (None, None)
+    assert cache.promote("건물 목록 보여줘", query, "v2")
+    assert cache.match("식당 목록 보여줘", "v1") == (None, None)
+
+    # Template questions are not pinned; the least used entry goes first
+    assert not cache.promote("오늘 고기 없는 식단(채식) 있어?", query, "v2")
+    cache.match("건물 목록 보여줘", "v2")
+    assert cache.promote("층별 식당 보여줘", query, "v2")
+    assert cache.promote("운영 시간 보여줘", query, "v2")
+    assert cache.match("건물 목록 보여줘", "v2") == (query, "exact")
+    assert cache.match("층별 식당 보여줘", "v2") == (None, None)
+
+
+def test_chat_promotes_only_queries_with_rows(tmp_path, monkeypatch):
+    from app.services import rag_pipeline, chat_pipeline
+    cache = QuestionCache(tmp_path / "question_cache.json", VENUES_LOCATION_JSON_PATH)
+    monkeypatch.setattr(rag_pipeline, "question_cache", cache)
+    monkeypatch.setattr(chat_pipeline, "generate_sparql", lambda question, schema, version=None: "SELECT ?v WHERE { ?v a :Venue }")
+    monkeypatch.setattr(chat_pipeline, "generate_answer", lambda question, raw_data: "")
+    monkeypatch.setattr(chat_pipeline, "generate_explanation", lambda question, sparql: "")
+    graph_version = type("GV", (), {"schema": "", "graph": None, "version": "v1"})()
+
+    monkeypatch.setattr(chat_pipeline, "execute_sparql", lambda query, graph: [])
+    chat_pipeline.answer_question("식당 목록 보여줘", graph_version)
+    assert cache.match("식당 목록 보여줘", "v1") == (None, None)
+
+    monkeypatch.setattr(chat_pipeline, "execute_sparql", lambda query, graph: [{"v": "301동식당"}])
+    chat_pipeline.answer_question("식당 목록 보여줘", graph_version)
+    assert cache.match("식당 목록 보여줘", "v1")[1] == "exact"
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from config import SPARQL_EXAMPLES_PATH
+from app.services.rag_pipeline import load_graph, build_schema_catalog, sparql_prompt, execute_sparql
+from app.services.schema_selector import CORE_TERMS, TERM_REQUIREMENTS, estimate_tokens, load_examples, query_terms
+from app.services.llm_backend import RecordedResponses
+from scripts.benchmark.competency import RECORDINGS_PATH
+
+PREFIX = "PREFIX : <http://snu.ac.kr/dining/>\n"
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return build_schema_catalog(load_graph())
+
+
+def test_query_terms():
+    query = 'SELECT ?n WHERE { ?m a :MenuItem ; :menuName ?n . FILTER(:textMatch(?n, "a :b")) } # <http://x/:y>'
+    assert query_terms(query) == {":MenuItem", ":menuName", ":textMatch"}
+    assert estimate_tokens("학생회관 menu") == 4 + 2
+
+
+def test_examples_run_and_use_known_terms(catalog):
+    examples = load_examples(SPARQL_EXAMPLES_PATH)
+    known = set(catalog.classes) | set(catalog.properties) | set(catalog.functions)
+    assert len(examples) >= 20
+    assert len({example.question for example in examples}) == len(examples)
+    for example in examples:
+        assert example.terms <= known, example.question
+        rows = execute_sparql(PREFIX + example.sparql, catalog.graph)
+        # NOW() depends on the clock; everything else must find data
+        assert rows or "NOW()" in example.sparql, example.question
+
+
+@pytest.mark.parametrize("question, terms, example", [
+    ("301동 근처에 일식 파는 곳", {":withinRadius", ":cuisineType", ":building"}, "301동 근처에 일식"),
+    ("지금 열려있는 식당", {":openAt"}, "지금 문 연 식당"),
+    ("돈가스 파는 곳 알려줘", {":textMatch"}, "김치찌게 파는 곳"),
+    ("5000원 이하 아침 메뉴", {":price", ":mealType"}, "5000원 이하 메뉴"),
+])
+def test_select(catalog, question, terms, example):
+    selection = catalog.select(question)
+    assert terms | CORE_TERMS <= selection.terms
+    assert example in [e.question for e in selection.examples]
+    assert len(selection.examples) <= catalog.max_examples
+    # Unrelated features stay out
+    assert ":crowdedAt" not in selection.terms
+    assert "## Sample Relations" not in selection.schema
+
+
+def test_pruned_prompt_covers_recorded_queries(catalog):
+    with open(RECORDINGS_PATH) as f:
+        questions = json.load(f)["questions"]
+    responses = RecordedResponses(RECORDINGS_PATH)
+    full_tokens = pruned_tokens = 0
+    for question in questions:
+        query = responses.respond(f"into a SPARQL\n{question}")
+        assert query_terms(query) <= catalog.select(question).terms, question
+        full_tokens += estimate_tokens(sparql_prompt(question, str(catalog)))
+        pruned = sparql_prompt(question, catalog)
+        assert "into a SPARQL" in pruned and question in pruned
+        pruned_tokens += estimate_tokens(pruned)
+    assert pruned_tokens < 0.7 * full_tokens
+
+
+def test_full_schema_prompt(catalog):
+    prompt = sparql_prompt("아무 질문", str(catalog))
+    assert "## Sample Relations" in prompt
+    for line in TERM_REQUIREMENTS.values():
+        assert line in prompt
+    assert prompt.count("User: ") == 4
@@ -0,0 +1,71 @@
+import pyshacl
+import pytest
+from rdflib import Graph, Literal, Namespace
+from rdflib.compare import isomorphic
+from rdflib.namespace import RDF, XSD
+
+from config import TBOX_PATH, SHACL_PATH
+from scripts.validation.shacl_shards import validate_sharded
+
+SNU = Namespace("http://snu.ac.kr/dining/")
+
+
+@pytest.fixture
+def data():
+    g = Graph().parse(TBOX_PATH, format="turtle")
+    g.bind("snu", SNU)
+    g.add((SNU.v1, RDF.type, SNU.Venue))
+    g.add((SNU.v1, SNU.venueId, Literal("v1", datatype=XSD.string)))
+    g.add((SNU.v1, SNU.name, Literal("학생회관식당", datatype=XSD.string)))
+    # Venue typed only through rdfs:range, missing its venueId
+    g.add((SNU.v2, SNU.name, Literal("두레미담", datatype=XSD.string)))
+    for i, meal in enumerate(["lunch", "brunch", "dinner"]):
+        service = SNU[f"s{i}"]
+        # MealService typed only through rdfs:domain
+        g.add((service, SNU.providedAt, SNU.v1 if i else SNU.v2))
+        g.add((service, SNU.date, Literal("2025-12-01", datatype=XSD.date)))
+        g.add((service, SNU.mealType, Literal(meal)))
+        g.add((SNU[f"m{i}"], SNU.partOfService, service))
+        g.add((SNU[f"m{i}"], SNU.menuName, Literal(f"메뉴{i}", datatype=XSD.string)))
+        g.add((SNU[f"m{i}"], SNU.price, Literal(-100 if i == 2 else 5000)))
+    return g
+
+
+def _full(g):
+    return pyshacl.validate(g, shacl_graph=str(SHACL_PATH), inference="rdfs")
+
+
+def _assert_same(sharded, full):
+    conforms, report, text = full
+    assert sharded[0] == conforms
+    assert sharded[2] == text
+    assert isomorphic(sharded[1], report)
+
+
+def test_sharded_report_matches_full_run(data):
+    full = _full(data)
+    assert not full[0]
+    sharded = validate_sharded(data, SHACL_PATH, shards=3, workers=1)
+    _assert_same(sharded, full)
+    assert sharded[3]["focus_nodes"] == 8 and sharded[3]["shards"] == 3
+
+
+def test_changed_only_revalidates_touched_nodes(data, tmp_path):
+    state = tmp_path / "shacl_state.pkl"
+    first = validate_sharded(data, SHACL_PATH, shards=2, workers=1, state_path=state)
+    assert first[3]["validated"] == 8
+
+    again = validate_sharded(data, SHACL_PATH, shards=2, workers=1, state_path=state)
+    assert again[3]["validated"] == 0
+    _assert_same(again, _full(data))
+
+    # Fix one violation, add a new venue, and drop a menu item
+    data.remove((SNU.s1, SNU.mealType, Literal("brunch")))
+    data.add((SNU.s1, SNU.mealType, Literal("lunch")))
+    data.add((SNU.v3, RDF.type, SNU.Venue))
+    for t in list(data.triples((SNU.m0, None, None))):
+        data.remove(t)
+    changed = validate_sharded(data, SHACL_PATH, shards=2, workers=1, state_path=state)
+    assert changed[3]["validated"] == 2
+    assert changed[3]["focus_nodes"] == 8
+    _assert_same(changed, _full(data))
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+
+from config import MENUS_JSON_PATH, VENUES_LOCATION_JSON_PATH, MENU_CLASSIFICATION_PATH
+from scripts.etl.streaming import iter_json_array, NTriplesWriter
+from scripts.etl.generate_knowledge_graph import load_inputs, build_graph, run, run_streaming, run_sharded
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 7, 1 << 16])
+def test_iter_json_array_matches_json_load(tmp_path, chunk_chars):
+    records = [{"description": "짜장면 : 4,500 원\n[세트] {A}", "time": None}, 12345, [1, [2]], "]", 0.5, True, {}]
+    path = tmp_path / "records.json"
+    path.write_text(json.dumps(records, ensure_ascii=False, indent=1))
+    assert list(iter_json_array(path, chunk_chars)) == records
+
+    path.write_text(" [ ] ")
+    assert list(iter_json_array(path, chunk_chars)) == []
+
+
+def test_iter_json_array_rejects_malformed(tmp_path):
+    path = tmp_path / "records.json"
+    path.write_text('{"not": "an array"}')
+    with pytest.raises(ValueError):
+        list(iter_json_array(path))
+    path.write_text('[{"date": "2026-01-14"}, {"date": "2026-')
+    records = iter_json_array(path, 8)
+    assert next(records) == {"date": "2026-01-14"}
+    with pytest.raises(ValueError):
+        next(records)
+
+
+def test_ntriples_writer_chunks(tmp_path):
+    path = tmp_path / "out.nt"
+    triples = [(URIRef(f"http://example.org/s{i}"), URIRef("http://example.org/p"), Literal(f"줄\n{i}"))
+               for i in range(25)]
+    with NTriplesWriter(path, chunk_triples=10) as writer:
+        writer.write(triples)
+        assert not path.exists()
+    assert writer.count == 25
+    assert set(Graph().parse(path, format="nt")) == set(triples)
+
+    with pytest.raises(RuntimeError):
+        with NTriplesWriter(path) as writer:
+            writer.add(triples[0])
+            raise RuntimeError("interrupted")
+    # The previous output survives an interrupted write
+    assert len(Graph().parse(path, format="nt")) == 25
+
+
+def test_streaming_matches_full_build(tmp_path):
+    output_path = tmp_path / "abox_final.ttl"
+    summary = run_streaming(output_path=output_path, chunk_triples=100)
+    streamed = Graph().parse(output_path, format="turtle")
+    full = build_graph(*load_inputs(MENUS_JSON_PATH, VENUES_LOCATION_JSON_PATH, MENU_CLASSIFICATION_PATH))
+    # No triple repeats across services in the sample data
+    assert summary["lines"] == len(full) == len(streamed)
+    assert not (streamed - full) and not (full - streamed)
+
+
+def test_sharded_matches_full_build(tmp_path):
+    summary = run_sharded(output_path=tmp_path / "abox.nt", workers=2, dates_per_shard=1)
+    assert summary["shards"] == 3
+    sharded = Graph().parse(tmp_path / "abox.nt", format="nt")
+    full = build_graph(*load_inputs(MENUS_JSON_PATH, VENUES_LOCATION_JSON_PATH, MENU_CLASSIFICATION_PATH))
+    assert summary["lines"] == len(full) == len(sharded)
+    assert not (sharded - full) and not (full - sharded)
+
+    # The Turtle conversion serializes exactly like the Graph build
+    summary = run_sharded(output_path=tmp_path / "abox_sharded.ttl", workers=1, turtle=True)
+    assert summary["triples"] == len(full)
+    run(output_path=tmp_path / "abox_full.ttl")
+    assert (tmp_path / "abox_sharded.ttl").read_bytes() == (tmp_path / "abox_full.ttl").read_bytes()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["abox.nt", "abox_full.ttl", "abox_sharded.ttl"]
+
+
+def test_lines_count_repeated_triples(tmp_path):
+    records = list(iter_json_array(MENUS_JSON_PATH))
+    menus_path = tmp_path / "menus.json"
+    menus_path.write_text(json.dumps(records + records[:1], ensure_ascii=False))
+    summary = run_streaming(menus_path=menus_path, output_path=tmp_path / "abox.nt")
+    streamed = Graph().parse(tmp_path / "abox.nt", format="nt")
+    # The repeated service is written twice and collapses on load
+    assert summary["lines"] > len(streamed)
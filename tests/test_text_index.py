@@ -0,0 +1,96 @@
+import pytest
+from rdflib import Graph, Literal, RDF, XSD
+from rdflib.plugins.sparql import prepareQuery
+
+from app.services.rag_pipeline import execute_sparql, load_graph
+from app.services.text_index import SNU, TextIndex, _indexes, jamo, rewrite_text_filters, substring_distance, text_index_for
+
+PREFIX = "PREFIX : <http://snu.ac.kr/dining/>\n"
+
+MENUS = ["김치찌개(밥포함)", "돼지김치찌개", "된장찌개", "김치 필라프", "돈까스 & 소스", "유부우동", "제육덮밥"]
+
+
+def make_graph():
+    g = Graph()
+    g.bind("", SNU)
+    for i, name in enumerate(MENUS):
+        item = SNU[f"item{i}"]
+        g.add((item, RDF.type, SNU.MenuItem))
+        g.add((item, SNU.menuName, Literal(name, datatype=XSD.string)))
+        g.add((item, SNU.price, Literal(5000 + 500 * i)))
+    venue = SNU.venue
+    g.add((venue, SNU.name, Literal("301동식당 (889-8955)")))
+    g.add((venue, SNU.building, Literal("301동 (제1공학관)")))
+    return g
+
+
+def test_jamo_distance():
+    assert jamo("개") == "ㄱㅐ"
+    assert substring_distance(jamo("찌게"), jamo("김치찌개")) == 1
+    assert substring_distance("abc", "xxabcxx") == 0
+
+
+def test_contains():
+    index = TextIndex(make_graph())
+    assert {str(t) for t in index.contains("김치")} == {"김치찌개(밥포함)", "돼지김치찌개", "김치 필라프"}
+    assert {str(t) for t in index.contains("301", SNU.building)} == {"301동 (제1공학관)"}
+    assert {str(t) for t in index.contains("동")} == {"유부우동", "301동식당 (889-8955)", "301동 (제1공학관)"}
+    assert index.contains("김치찌개밥") == frozenset()
+    # Bigrams that occur nowhere, alone or next to indexed ones
+    assert index.contains("짬뽕국물") == frozenset()
+    assert index.contains("김치짬뽕") == frozenset()
+    assert index.fuzzy("짬") == []
+
+
+def test_fuzzy():
+    index = TextIndex(make_graph())
+    # Spacing
+    assert [str(t) for _, t in index.fuzzy("김치필라프")] == ["김치 필라프"]
+    assert [str(t) for _, t in index.fuzzy("돈까스&소스")] == ["돈까스 & 소스"]
+    # One-jamo typos (개/게, 까/가)
+    assert [(d, str(t)) for d, t in index.fuzzy("김치찌게")] == [(1, "김치찌개(밥포함)"), (1, "돼지김치찌개")]
+    assert [str(t) for _, t in index.fuzzy("돈가스")] == ["돈까스 & 소스"]
+    # Short queries must match exactly
+    assert index.fuzzy("두") == []
+
+
+@pytest.mark.parametrize("condition", [
+    'CONTAINS(?n, "김치")',
+    'CONTAINS(STR(?n), "김치") && ?p > 5000',
+    'CONTAINS(?n, "우동") || CONTAINS(?n, "덮밥")',
+    ':textMatch(?n, "김치 찌게")',
+])
+def test_rewrite_matches_rdflib(condition):
+    g = make_graph()
+    # OPTIONAL keeps the query off the columnar fast path
+    text = PREFIX + f"""SELECT ?n ?p WHERE {{ ?m :menuName ?n ; :price ?p .
+        OPTIONAL {{ ?m :cuisineType ?c }} FILTER({condition}) }}"""
+    expected = sorted(tuple(row) for row in g.query(text))
+    query = prepareQuery(text, initNs=dict(g.namespaces()))
+    assert rewrite_text_filters(query, g) == 1
+    assert sorted(tuple(row) for row in g.query(query)) == expected
+    assert expected
+
+
+def test_rewrite_skips_optional_and_broad_filters():
+    g = make_graph()
+    namespaces = dict(g.namespaces())
+    optional = prepareQuery(PREFIX + """SELECT ?m WHERE { ?m :price ?p . OPTIONAL { ?m :menuName ?n }
+        FILTER(CONTAINS(?n, "김치")) }""", initNs=namespaces)
+    assert rewrite_text_filters(optional, g) == 0
+    broad = prepareQuery(PREFIX + 'SELECT ?m WHERE { ?m :menuName ?n . FILTER(CONTAINS(?n, "")) }', initNs=namespaces)
+    assert rewrite_text_filters(broad, g) == 0
+
+
+def test_text_match_function():
+    g = make_graph()
+    text_index_for(g)
+    rows = execute_sparql(PREFIX + 'SELECT ?n WHERE { ?m :menuName ?n . FILTER(:textMatch(?n, "된장 찌게")) }', g)
+    assert rows == [{"n": "된장찌개"}]
+
+
+def test_built_at_graph_load():
+    load_graph()
+    # The second load comes from the snapshot
+    g = load_graph()
+    assert _indexes.get(g) is not None
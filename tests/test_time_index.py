@@ -0,0 +1,113 @@
+import random
+import datetime
+
+import pytest
+from rdflib import Graph, Literal, RDF, XSD
+
+from app.services.rag_pipeline import execute_sparql
+from app.services.time_index import SNU, IntervalIndex, moment, parse_time_range, time_index_for
+
+PREFIX = "PREFIX : <http://snu.ac.kr/dining/>\n"
+
+# name: (date, timeRange, timeStart/timeEnd written by the ETL?, crowdTimeRange)
+SERVICES = {
+    "breakfast": ("2026-01-15", "08:00~09:30", True, None),
+    "lunch": ("2026-01-15", "11:00~14:00", True, "11:50~12:30"),
+    "dinner": ("2026-01-15", "17:00", False, None),
+    "late": ("2026-01-15", "17:30~19:00", True, "17:50~18:20"),
+    "next_lunch": ("2026-01-16", "11:30~13:30", True, None),
+}
+
+
+def make_graph():
+    g = Graph()
+    g.bind("", SNU)
+    for name, (day, time_range, typed, crowd) in SERVICES.items():
+        service = SNU[name]
+        g.add((service, RDF.type, SNU.MealService))
+        g.add((service, SNU.date, Literal(day, datatype=XSD.date)))
+        g.add((service, SNU.timeRange, Literal(time_range)))
+        if typed:
+            start, end = time_range.split("~")
+            g.add((service, SNU.timeStart, Literal(f"{start}:00", datatype=XSD.time)))
+            g.add((service, SNU.timeEnd, Literal(f"{end}:00", datatype=XSD.time)))
+        if crowd:
+            g.add((service, SNU.crowdTimeRange, Literal(crowd)))
+    return g
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("11:00~14:00", (660, 840)),
+    ("8:00 ~ 9:30", (480, 570)),
+    ("17:00", (1020, None)),
+    ("11", (660, None)),
+    ("", None),
+    (None, None),
+])
+def test_parse_time_range(text, expected):
+    assert parse_time_range(text) == expected
+
+
+def test_moment():
+    assert moment(Literal("18:30")) == (None, 1110)
+    assert moment(Literal("2026-01-15 08:30")) == (datetime.date(2026, 1, 15), 510)
+    # NOW() is an aware UTC dateTime; service hours are local (KST)
+    now = datetime.datetime(2026, 1, 14, 23, 40, tzinfo=datetime.timezone.utc)
+    assert moment(Literal(now)) == (datetime.date(2026, 1, 15), 520)
+    assert moment(Literal(datetime.time(12, 5))) == (None, 725)
+
+
+def test_interval_index_matches_brute_force():
+    rng = random.Random(3)
+    intervals = []
+    for key in range(200):
+        start = rng.randrange(0, 1400)
+        intervals.append((start, start + rng.randrange(1, 300), key))
+    index = IntervalIndex(intervals)
+    for t in range(0, 1700, 7):
+        assert index.at(t) == {key for start, end, key in intervals if start <= t < end}
+        assert index.ending_after(t) == {key for _, end, key in intervals if end > t}
+
+
+def test_service_hours():
+    index = time_index_for(make_graph())
+    day = datetime.date(2026, 1, 15)
+    assert index.open_at(day, 510) == {SNU.breakfast}
+    assert index.open_at(day, 570) == set()
+    # Start-only "17:00" is open for two hours
+    assert index.open_at(day, 1130) == {SNU.dinner, SNU.late}
+    assert index.open_at(None, 720) == {SNU.lunch, SNU.next_lunch}
+    assert index.open_after(day, 1110) == {SNU.dinner, SNU.late}
+    assert index.crowded_at(day, 740) == {SNU.lunch}
+
+
+def test_past_midnight_and_closing_time():
+    g = make_graph()
+    service = SNU.night
+    g.add((service, RDF.type, SNU.MealService))
+    g.add((service, SNU.date, Literal("2026-01-15", datatype=XSD.date)))
+    g.add((service, SNU.timeRange, Literal("22:00~02:00")))
+    index = time_index_for(g)
+    day, next_day = datetime.date(2026, 1, 15), datetime.date(2026, 1, 16)
+    assert index.open_at(day, 23 * 60) == {SNU.night}
+    # 00:30 the next morning is still the 15th's late service
+    assert index.open_at(next_day, 30) == {SNU.night}
+    assert index.open_at(None, 30) == {SNU.night}
+    assert index.open_at(next_day, 2 * 60) == set()
+    assert SNU.night in index.open_after(next_day, 60)
+    # A service closing at 19:00 is not open after 19:00
+    assert SNU.late not in index.open_after(day, 19 * 60)
+    assert SNU.late in index.open_after(day, 19 * 60 - 1)
+
+
+def test_sparql_functions():
+    g = make_graph()
+
+    def services(condition):
+        rows = execute_sparql(PREFIX + f"SELECT ?s WHERE {{ ?s a :MealService . FILTER({condition}) }}", g)
+        return sorted(row["s"].rsplit("/", 1)[1] for row in rows)
+
+    assert services(':openAt(?s, "2026-01-15 08:30")') == ["breakfast"]
+    assert services(':openAfter(?s, "18:30")') == ["dinner", "late"]
+    assert services(':openAt(?s, "12:00") && !:crowdedAt(?s, "12:00")') == ["next_lunch"]
+    assert services(':openAt(?s, "2026-01-15T18:00:00"^^<http://www.w3.org/2001/XMLSchema#dateTime>)') == ["dinner", "late"]
@@ -0,0 +1,73 @@
+import json
+import threading
+import urllib.request
+
+from app.services import tracing
+from app.services.tracing import span, annotate, record_cache, Metrics, JsonlSink
+from app.services.chat_pipeline import Stage, run_dag
+
+
+def test_spans_nest_and_feed_histograms(tmp_path):
+    tracing.metrics.reset()
+    sink = JsonlSink(tmp_path / "spans.jsonl")
+    tracing.add_sink(sink)
+    try:
+        with span("chat") as root:
+            with span("execute_sparql"):
+                annotate(rows=3)
+                record_cache("sparql_result", True)
+            with span("execute_sparql"):
+                annotate(rows=2)
+    finally:
+        tracing.remove_sink(sink)
+
+    spans = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    assert [s["name"] for s in spans] == ["execute_sparql", "execute_sparql", "chat"]
+    assert all(s["trace_id"] == root.trace_id for s in spans)
+    assert spans[0]["parent_id"] == root.span_id
+    assert spans[0]["attrs"] == {"rows": 3, "sparql_result_hit": True}
+
+    summary = tracing.metrics.summary()
+    assert summary["execute_sparql"]["count"] == 2
+    text = tracing.metrics.prometheus_text()
+    assert 'rag_stage_rows_total{stage="execute_sparql"} 5' in text
+    assert 'rag_cache_lookups_total{cache="sparql_result",result="hit"} 1' in text
+    assert 'rag_stage_duration_seconds_bucket{stage="chat",le="+Inf"} 1' in text
+
+
+def test_stage_spans_follow_the_dag_into_worker_threads():
+    finished = []
+    tracing.add_sink(finished.append)
+    try:
+        def stage(name):
+            def fn(**deps):
+                with span(name):
+                    return threading.get_ident()
+            return fn
+
+        with span("chat") as root:
+            run_dag([Stage("a", stage("a")), Stage("b", stage("b"), ("a",)), Stage("c", stage("c"), ("a",))])
+    finally:
+        tracing.remove_sink(finished.append)
+
+    children = [s for s in finished if s.name in ("a", "b", "c")]
+    assert len(children) == 3
+    assert all(s.parent_id == root.span_id for s in children)
+
+
+def test_errors_are_counted():
+    metrics = Metrics()
+    metrics.count("rag_stage_errors_total", stage="x", error="ValueError")
+    for value in (0.01, 0.02, 0.03, 1.5):
+        metrics.observe("rag_stage_duration_seconds", value, stage="x")
+    stats = metrics.summary()["x"]
+    assert stats["p50"] == 0.03 and stats["p99"] == 1.5
+    assert 'rag_stage_duration_seconds_bucket{stage="x",le="0.025"} 2' in metrics.prometheus_text()
+
+
+def test_metrics_endpoint():
+    server = tracing.start_metrics_server(0)
+    with span("schema_extraction"):
+        pass
+    body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read().decode()
+    assert "rag_stage_duration_seconds_count{stage=\"schema_extraction\"}" in body